@@ -0,0 +1,106 @@
+# Copyright 2021 The Meson development team
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Precompiled headers chosen from the dependencies of the previous build.
+
+The headers every object file used are known from the dependency
+information ninja recorded during the last build. The headers worth
+precompiling for a target are the ones most of its sources include with
+angle brackets and that come from outside of the source and build
+directories, so that they seldom change. The precompiled header is only
+used if the size of the headers it saves parsing over all the sources
+outweighs the cost of building and loading it.
+'''
+
+import os
+import re
+import typing as T
+
+from .mesonlib import replace_if_different
+
+# Targets with fewer sources don't get a precompiled header
+MIN_SOURCES = 3
+# Bytes of headers that are not parsed again, summed over the sources
+MIN_SAVED_BYTES = 4 * 1024 * 1024
+
+_INCLUDE_RE = re.compile(r'\s*#\s*include\s*<([^>]+)>')
+_DEFINE_RE = re.compile(r'\s*#\s*(define|undef)\b')
+
+def leading_includes(filename: str) -> T.Optional[T.List[str]]:
+    """Headers a source includes with angle brackets.
+
+    Returns None if the source can't be read or defines a macro before
+    including one of them, since including the headers first could then
+    change their meaning.
+    """
+    includes = []  # type: T.List[str]
+    defines = False
+    try:
+        with open(filename, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                m = _INCLUDE_RE.match(line)
+                if m:
+                    if defines:
+                        return None
+                    includes.append(m.group(1).strip())
+                elif _DEFINE_RE.match(line):
+                    defines = True
+    except OSError:
+        return None
+    return includes
+
+def select_headers(sources: T.Dict[str, T.List[str]], project_dirs: T.Sequence[str]) -> T.List[str]:
+    """Headers to precompile for sources, in the order they include them.
+
+    `sources` maps every source to the absolute paths of the headers its
+    object used in the previous build. An empty list is returned if a
+    precompiled header is not worth it.
+    """
+    if len(sources) < MIN_SOURCES:
+        return []
+    prefixes = tuple(os.path.join(d, '') for d in project_dirs)
+    threshold = len(sources) / 2
+    users = {}  # type: T.Dict[str, int]
+    header_users = {}  # type: T.Dict[str, int]
+    for src, deps in sources.items():
+        includes = leading_includes(src)
+        if includes is None:
+            return []
+        stable = [d for d in deps if not d.startswith(prefixes)]
+        for d in set(stable):
+            header_users[d] = header_users.get(d, 0) + 1
+        for name in includes:
+            tail = os.sep + os.path.normpath(name)
+            if any(d.endswith(tail) for d in stable):
+                users[name] = users.get(name, 0) + 1
+
+    headers = [name for name, count in users.items() if count >= threshold]
+    saved = 0
+    for d, count in header_users.items():
+        if count >= threshold:
+            try:
+                saved += os.path.getsize(d) * (count - 1)
+            except OSError:
+                pass
+    if not headers or saved < MIN_SAVED_BYTES:
+        return []
+    return headers
+
+def write_header(filename: str, headers: T.List[str]) -> None:
+    content = ''.join(f'#include <{h}>\n' for h in headers)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmp_file = filename + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(content)
+    replace_if_different(filename, tmp_file)
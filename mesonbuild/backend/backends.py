@@ -14,8 +14,9 @@
 
 from collections import OrderedDict
 from functools import lru_cache
-from itertools import chain
+from itertools import accumulate, chain, count
 from pathlib import Path
+import bisect
 import enum
 import json
 import os
@@ -29,6 +30,7 @@ from .. import dependencies
 from .. import programs
 from .. import mesonlib
 from .. import mlog
+from .. import ninjalog
 from ..compilers import LANGUAGES_USING_LDFLAGS, detect
 from ..mesonlib import (
     File, MachineChoice, MesonException, OptionType, OrderedSet, OptionOverrideProxy,
@@ -61,6 +63,55 @@ if T.TYPE_CHECKING:
 # Assembly files cannot be unitified and neither can LLVM IR files
 LANGS_CANT_UNITY = ('d', 'fortran', 'vala')
 
+def partition_unity_sources(sources: T.List[str], costs: T.List[float], number: int,
+                            previous: T.Optional[T.List[T.List[str]]] = None) -> T.List[T.List[str]]:
+    """Split sources in contiguous runs of about the same compilation cost.
+
+    The partition of the previous build is kept, with new sources added to
+    the unity file of the source preceding them, unless its most expensive
+    file costs over a quarter more than in a new partition. This way editing
+    or adding a source doesn't move all the others to other unity files.
+    """
+    if not sources:
+        return []
+    number = max(1, min(number, len(sources)))
+    cumulative = list(accumulate(costs))
+    total = cumulative[-1]
+    bounds = [0]
+    for i in range(1, number):
+        # Share what remains after the previous cut between the remaining files
+        done = cumulative[bounds[-1] - 1] if bounds[-1] else 0
+        goal = done + (total - done) / (number - i + 1)
+        end = bisect.bisect_left(cumulative, goal) + 1
+        if end > 1 and goal - cumulative[end - 2] < cumulative[end - 1] - goal:
+            end -= 1
+        end = min(max(end, bounds[-1] + 1), len(sources) - number + i)
+        bounds.append(end)
+    bounds.append(len(sources))
+    fresh = [sources[start:end] for start, end in zip(bounds, bounds[1:])]
+    if not previous or len(previous) != number:
+        return fresh
+
+    cost_of = dict(zip(sources, costs))
+    previous_index: T.Dict[str, int] = {}
+    for i, chunk in enumerate(previous):
+        for src in chunk:
+            previous_index.setdefault(src, i)
+    kept: T.List[T.List[str]] = [[] for _ in range(number)]
+    current = 0
+    for src in sources:
+        current = previous_index.get(src, current)
+        kept[current].append(src)
+    if not all(kept):
+        return fresh
+
+    def most_expensive(partition: T.List[T.List[str]]) -> float:
+        return max(sum(cost_of[s] for s in chunk) for chunk in partition)
+
+    if most_expensive(kept) > 1.25 * most_expensive(fresh):
+        return fresh
+    return kept
+
 class RegenInfo:
     def __init__(self, source_dir: str, build_dir: str, depfiles: T.List[str]):
         self.source_dir = source_dir
@@ -127,7 +178,28 @@ class InstallData:
         self.mesonintrospect = mesonintrospect
         self.version = version
 
-class TargetInstallData:
+class _SlottedRecord:
+
+    """Base class for records with __slots__ pickled to meson-private.
+
+    They are pickled as a dict of their attributes, like records without
+    __slots__, so that data pickled by either can be loaded.
+    """
+
+    __slots__ = ()
+
+    def __getstate__(self) -> T.Dict[str, T.Any]:
+        return {k: getattr(self, k) for c in type(self).__mro__ for k in getattr(c, '__slots__', ())}
+
+    def __setstate__(self, state: T.Dict[str, T.Any]) -> None:
+        for k, v in state.items():
+            setattr(self, k, v)
+
+class TargetInstallData(_SlottedRecord):
+
+    __slots__ = ['fname', 'outdir', 'out_name', 'aliases', 'strip', 'install_name_mappings',
+                 'rpath_dirs_to_remove', 'install_rpath', 'install_mode', 'subproject',
+                 'optional', 'tag']
 
     # TODO: install_mode should just always be a FileMode object
 
@@ -148,14 +220,19 @@ class TargetInstallData:
         self.optional = optional
         self.tag = tag
 
-class InstallEmptyDir:
+class InstallEmptyDir(_SlottedRecord):
+    __slots__ = ['path', 'install_mode', 'subproject', 'tag']
+
     def __init__(self, path: str, install_mode: 'FileMode', subproject: str, tag: T.Optional[str] = None):
         self.path = path
         self.install_mode = install_mode
         self.subproject = subproject
         self.tag = tag
 
-class InstallDataBase:
+class InstallDataBase(_SlottedRecord):
+    __slots__ = ['path', 'install_path', 'install_path_name', 'install_mode', 'subproject',
+                 'tag', 'data_type']
+
     def __init__(self, path: str, install_path: str, install_path_name: str,
                  install_mode: 'FileMode', subproject: str, tag: T.Optional[str] = None,
                  data_type: T.Optional[str] = None):
@@ -168,6 +245,8 @@ class InstallDataBase:
         self.data_type = data_type
 
 class SubdirInstallData(InstallDataBase):
+    __slots__ = ['exclude']
+
     def __init__(self, path: str, install_path: str, install_path_name: str,
                  install_mode: 'FileMode', exclude: T.Tuple[T.Set[str], T.Set[str]],
                  subproject: str, tag: T.Optional[str] = None, data_type: T.Optional[str] = None):
@@ -203,7 +282,12 @@ class ExecutableSerialisation:
         self.subproject = ''
         self.tag = tag
 
-class TestSerialisation:
+class TestSerialisation(_SlottedRecord):
+    __slots__ = ['name', 'project_name', 'suite', 'fname', 'is_cross_built', 'exe_runner',
+                 'is_parallel', 'cmd_args', 'env', 'should_fail', 'timeout', 'workdir',
+                 'extra_paths', 'protocol', 'priority', 'needs_exe_wrapper', 'cmd_is_built',
+                 'depends', 'version']
+
     def __init__(self, name: str, project: str, suite: T.List[str], fname: T.List[str],
                  is_cross_built: bool, exe_wrapper: T.Optional[programs.ExternalProgram],
                  needs_exe_wrapper: bool, is_parallel: bool, cmd_args: T.List[str],
@@ -273,7 +357,21 @@ class Backend:
 
     environment: T.Optional['Environment']
 
+    # Paths relative to the build directory, computed once per target and
+    # source. They belong to the backend rather than to method caches so
+    # that they are freed with it.
+    _target_dirs: T.Dict[T.Union[build.Target, build.CustomTargetIndex], str]
+    _target_private_dirs: T.Dict[build.Target, str]
+    _target_generated_dirs: T.Dict[T.Tuple[build.Target, T.Any, str], str]
+    _object_filenames: T.Dict[T.Tuple[build.BuildTarget, mesonlib.File], str]
+    _normpaths: T.Dict[str, str]
+
     def __init__(self, build: T.Optional[build.Build], interpreter: T.Optional['Interpreter']):
+        self._target_dirs = {}
+        self._target_private_dirs = {}
+        self._target_generated_dirs = {}
+        self._object_filenames = {}
+        self._normpaths = {}
         # Make it possible to construct a dummy backend
         # This is used for introspection without a build directory
         if build is None:
@@ -285,6 +383,7 @@ class Backend:
         self.processed_targets: T.Set[str] = set()
         self.name = '<UNKNOWN>'
         self.build_dir = self.environment.get_build_dir()
+        self._build_durations: T.Optional[T.Dict[str, int]] = None
         self.source_dir = self.environment.get_source_dir()
         self.build_to_src = mesonlib.relpath(self.environment.get_source_dir(),
                                              self.environment.get_build_dir())
@@ -371,8 +470,11 @@ class Backend:
                 return None
         raise AssertionError(f'BUG: Tried to link to {target!r} which is not linkable')
 
-    @lru_cache(maxsize=None)
     def get_target_dir(self, target: T.Union[build.Target, build.CustomTargetIndex]) -> str:
+        try:
+            return self._target_dirs[target]
+        except KeyError:
+            pass
         if isinstance(target, build.RunTarget):
             # this produces no output, only a dummy top-level name
             dirname = ''
@@ -380,6 +482,7 @@ class Backend:
             dirname = target.get_subdir()
         else:
             dirname = 'meson-out'
+        self._target_dirs[target] = dirname
         return dirname
 
     def get_target_dir_relative_to(self, t: build.Target, o: build.Target) -> str:
@@ -396,12 +499,17 @@ class Backend:
         return self.build_to_src
 
     def get_target_private_dir(self, target: build.Target) -> str:
-        return os.path.join(self.get_target_filename(target, warn_multi_output=False) + '.p')
+        try:
+            return self._target_private_dirs[target]
+        except KeyError:
+            pass
+        dirname = self.get_target_filename(target, warn_multi_output=False) + '.p'
+        self._target_private_dirs[target] = dirname
+        return dirname
 
     def get_target_private_dir_abs(self, target: build.Target) -> str:
         return os.path.join(self.environment.get_build_dir(), self.get_target_private_dir(target))
 
-    @lru_cache(maxsize=None)
     def get_target_generated_dir(
             self, target: build.Target,
             gensrc: T.Union[build.CustomTarget, build.CustomTargetIndex, build.GeneratedList],
@@ -411,12 +519,20 @@ class Backend:
         and a generated source filename.
         Returns the full path of the generated source relative to the build root
         """
-        # CustomTarget generators output to the build dir of the CustomTarget
+        key = (target, gensrc, src)
+        try:
+            return self._target_generated_dirs[key]
+        except KeyError:
+            pass
         if isinstance(gensrc, (build.CustomTarget, build.CustomTargetIndex)):
-            return os.path.join(self.get_target_dir(gensrc), src)
-        # GeneratedList generators output to the private build directory of the
-        # target that the GeneratedList is used in
-        return os.path.join(self.get_target_private_dir(target), src)
+            # CustomTarget generators output to the build dir of the CustomTarget
+            path = os.path.join(self.get_target_dir(gensrc), src)
+        else:
+            # GeneratedList generators output to the private build directory of the
+            # target that the GeneratedList is used in
+            path = os.path.join(self.get_target_private_dir(target), src)
+        self._target_generated_dirs[key] = path
+        return path
 
     def get_unity_source_file(self, target: build.Target, suffix: str, number: int) -> mesonlib.File:
         # There is a potential conflict here, but it is unlikely that
@@ -424,12 +540,79 @@ class Backend:
         osrc = f'{target.name}-unity{number}.{suffix}'
         return mesonlib.File.from_built_file(self.get_target_private_dir(target), osrc)
 
-    def generate_unity_files(self, target: build.BuildTarget, unity_src: str) -> T.List[mesonlib.File]:
+    def read_unity_files(self, target: build.BuildTarget, suffix: str) -> T.List[T.List[str]]:
+        """Sources included by the unity files written for the previous build."""
+        result: T.List[T.List[str]] = []
+        for number in count():
+            unity_src = self.get_unity_source_file(target, suffix, number)
+            try:
+                with open(unity_src.absolute_path(self.source_dir, self.build_dir), encoding='utf-8') as f:
+                    result.append([line[len('#include<'):-1] for line in f.read().splitlines()
+                                   if line.startswith('#include<') and line.endswith('>')])
+            except OSError:
+                break
+        return result
+
+    def get_build_durations(self) -> T.Dict[str, int]:
+        if self._build_durations is None:
+            log = ninjalog.read_log(ninjalog.get_log_file(self.build_dir))
+            self._build_durations = ninjalog.last_durations(log)
+        return self._build_durations
+
+    def estimate_unity_costs(self, target: build.BuildTarget, suffix: str, srcs: T.List[str],
+                             previous: T.List[T.List[str]]) -> T.List[float]:
+        sizes: T.Dict[str, float] = {}
+        for src in chain(srcs, chain.from_iterable(previous)):
+            if src not in sizes:
+                try:
+                    sizes[src] = float(os.path.getsize(src))
+                except OSError:
+                    # Generated sources don't exist before the first build
+                    sizes[src] = -1.0
+        known = [s for s in sizes.values() if s >= 0]
+        default = sum(known) / len(known) if known else 1.0
+        sizes = {src: size if size >= 0 else default for src, size in sizes.items()}
+        costs: T.Dict[str, float] = {src: sizes[src] for src in srcs}
+
+        # The time it took to compile the unity files of the previous build,
+        # shared between their sources in proportion of their size, tells
+        # apart the sources that include many or expensive headers.
+        durations = self.get_build_durations()
+        measured: T.Dict[str, float] = {}
+        for number, chunk in enumerate(previous):
+            unity_src = self.get_unity_source_file(target, suffix, number)
+            obj = os.path.join(self.get_target_private_dir(target),
+                               self.object_filename_from_source(target, unity_src))
+            duration = durations.get(obj)
+            if duration is None or not chunk:
+                continue
+            chunk_size = sum(sizes[src] for src in chunk)
+            for src in chunk:
+                if src in costs:
+                    measured[src] = duration * sizes[src] / chunk_size
+        total_measured = sum(measured.values())
+        if total_measured > 0:
+            # Costs of the sources without timings are their size, bring the
+            # timings to the same scale.
+            scale = sum(costs[src] for src in measured) / total_measured
+            for src, share in measured.items():
+                costs[src] = share * scale
+        return [costs[src] for src in srcs]
+
+    def get_unity_partition(self, target: build.BuildTarget, comp: 'Compiler', srcs: T.List[str]) -> T.List[T.List[str]]:
+        unity_size = self.get_option_for_target(OptionKey('unity_size'), target)
+        assert isinstance(unity_size, int), 'for mypy'
+        if self.get_option_for_target(OptionKey('unity_partition'), target) != 'cost':
+            return [srcs[i:i + unity_size] for i in range(0, len(srcs), unity_size)]
+        suffix = comp.get_default_suffix()
+        previous = self.read_unity_files(target, suffix)
+        costs = self.estimate_unity_costs(target, suffix, srcs, previous)
+        return partition_unity_sources(srcs, costs, -(-len(srcs) // unity_size), previous)
+
+    def generate_unity_files(self, target: build.BuildTarget, unity_src: T.List[str]) -> T.List[mesonlib.File]:
         abs_files: T.List[str] = []
         result: T.List[mesonlib.File] = []
         compsrcs = classify_unity_sources(target.compilers.values(), unity_src)
-        unity_size = self.get_option_for_target(OptionKey('unity_size'), target)
-        assert isinstance(unity_size, int), 'for mypy'
 
         def init_language_file(suffix: str, unity_file_number: int) -> T.TextIO:
             unity_src = self.get_unity_source_file(target, suffix, unity_file_number)
@@ -445,22 +628,13 @@ class Backend:
 
         # For each language, generate unity source files and return the list
         for comp, srcs in compsrcs.items():
-            files_in_current = unity_size + 1
-            unity_file_number = 0
-            # TODO: this could be simplified with an algorithm that pre-sorts
-            # the sources into the size of chunks we want
-            ofile = None
-            for src in srcs:
-                if files_in_current >= unity_size:
-                    if ofile:
-                        ofile.close()
-                    ofile = init_language_file(comp.get_default_suffix(), unity_file_number)
-                    unity_file_number += 1
-                    files_in_current = 0
-                ofile.write(f'#include<{src}>\n')
-                files_in_current += 1
-            if ofile:
-                ofile.close()
+            # The unity sources are absolute paths, classify_unity_sources()
+            # only keeps them in their order.
+            srcs_str = T.cast(T.List[str], srcs)
+            for unity_file_number, chunk in enumerate(self.get_unity_partition(target, comp, srcs_str)):
+                with init_language_file(comp.get_default_suffix(), unity_file_number) as ofile:
+                    for src in chunk:
+                        ofile.write(f'#include<{src}>\n')
 
         for x in abs_files:
             mesonlib.replace_if_different(x, x + '.tmp')
@@ -785,6 +959,16 @@ class Backend:
 
     def object_filename_from_source(self, target: build.BuildTarget, source: 'FileOrString') -> str:
         assert isinstance(source, mesonlib.File)
+        key = (target, source)
+        try:
+            return self._object_filenames[key]
+        except KeyError:
+            pass
+        filename = self._object_filename_from_source(target, source)
+        self._object_filenames[key] = filename
+        return filename
+
+    def _object_filename_from_source(self, target: build.BuildTarget, source: mesonlib.File) -> str:
         build_dir = self.environment.get_build_dir()
         rel_src = source.rel_to_builddir(self.build_to_src)
 
@@ -848,12 +1032,14 @@ class Backend:
             sources = []
             unity_size = self.get_option_for_target(OptionKey('unity_size'), extobj.target)
             assert isinstance(unity_size, int), 'for mypy'
+            by_cost = self.get_option_for_target(OptionKey('unity_partition'), extobj.target) == 'cost'
 
             for comp, srcs in compsrcs.items():
                 if comp.language in LANGS_CANT_UNITY:
                     sources += srcs
                     continue
-                for i in range(len(srcs) // unity_size + 1):
+                unity_files = -(-len(srcs) // unity_size) if by_cost else len(srcs) // unity_size + 1
+                for i in range(unity_files):
                     _src = self.get_unity_source_file(extobj.target,
                                                       comp.get_default_suffix(), i)
                     sources.append(_src)
@@ -865,11 +1051,14 @@ class Backend:
 
         return result
 
+    def get_target_pch(self, target: build.BuildTarget, lang: str) -> T.List[str]:
+        return target.get_pch(lang)
+
     def get_pch_include_args(self, compiler: 'Compiler', target: build.BuildTarget) -> T.List[str]:
         args: T.List[str] = []
         pchpath = self.get_target_private_dir(target)
         includeargs = compiler.get_include_args(pchpath, False)
-        p = target.get_pch(compiler.get_language())
+        p = self.get_target_pch(target, compiler.get_language())
         if p:
             args += compiler.get_pch_use_args(pchpath, p[0])
         return includeargs + args
@@ -1333,9 +1522,14 @@ class Backend:
         # ${BUILDDIR}/${BUILDTYPE} instead, this becomes unnecessary.
         return self.get_target_dir(target)
 
-    @lru_cache(maxsize=None)
     def get_normpath_target(self, source: str) -> str:
-        return os.path.normpath(source)
+        try:
+            return self._normpaths[source]
+        except KeyError:
+            pass
+        path = os.path.normpath(source)
+        self._normpaths[source] = path
+        return path
 
     def get_custom_target_dirs(self, target: build.CustomTarget, compiler: 'Compiler', *,
                                absolute_path: bool = False) -> T.List[str]:
@@ -19,17 +19,21 @@ from pathlib import PurePath, Path
 from textwrap import dedent
 import itertools
 import json
+import multiprocessing
 import os
 import pickle
 import re
 import shlex
+import shutil
 import subprocess
+import sys
+import tempfile
 import typing as T
 
 from . import backends
 from .. import modules
 from .. import environment, mesonlib
-from .. import build
+from .. import autopch, build, buildgraph
 from .. import mlog
 from .. import compilers
 from ..arglist import CompilerArgs
@@ -156,6 +160,8 @@ class Quoting(Enum):
     none = 3
 
 class NinjaCommandArg:
+    __slots__ = ['s', 'quoting']
+
     def __init__(self, s, quoting = Quoting.both):
         self.s = s
         self.quoting = quoting
@@ -168,6 +174,8 @@ class NinjaCommandArg:
         return [NinjaCommandArg(i, q) for i in l]
 
 class NinjaComment:
+    __slots__ = ['comment']
+
     def __init__(self, comment):
         self.comment = comment
 
@@ -179,6 +187,9 @@ class NinjaComment:
         outfile.write('\n')
 
 class NinjaRule:
+    __slots__ = ['name', 'command', 'args', 'description', 'deps', 'depfile', 'extra',
+                 'rspable', 'refcount', 'rsprefcount', 'rspfile_quote_style']
+
     def __init__(self, rule, command, args, description,
                  rspable = False, deps = None, depfile = None, extra = None,
                  rspfile_quote_style: RSPFileSyntax = RSPFileSyntax.GCC):
@@ -295,6 +306,9 @@ class NinjaRule:
         return estimate
 
 class NinjaBuildElement:
+    __slots__ = ['implicit_outfilenames', 'outfilenames', 'rulename', 'infilenames',
+                 'deps', 'orderdeps', 'elems', 'all_outputs', 'rule']
+
     def __init__(self, all_outputs, outfilenames, rulename, infilenames, implicit_outs=None):
         self.implicit_outfilenames = implicit_outs or []
         if isinstance(outfilenames, str):
@@ -351,13 +365,6 @@ class NinjaBuildElement:
                                          outfilenames,
                                          self.elems) >= rsp_threshold
 
-    def count_rule_references(self):
-        if self.rulename != 'phony':
-            if self._should_use_rspfile():
-                self.rule.rsprefcount += 1
-            else:
-                self.rule.refcount += 1
-
     def write(self, outfile):
         self.check_outputs()
         ins = ' '.join([ninja_quote(i, True) for i in self.infilenames])
@@ -369,8 +376,11 @@ class NinjaBuildElement:
         if use_rspfile:
             rulename = self.rulename + '_RSP'
             mlog.debug(f'Command line for building {self.outfilenames} is long, using a response file')
+            self.rule.rsprefcount += 1
         else:
             rulename = self.rulename
+            if rulename != 'phony':
+                self.rule.refcount += 1
         line = f'build {outs}{implicit_outs}: {rulename} {ins}'
         if len(self.deps) > 0:
             line += ' | ' + ' '.join([ninja_quote(x, True) for x in sorted(self.deps)])
@@ -421,6 +431,26 @@ class NinjaBuildElement:
                 raise MesonException(f'Multiple producers for Ninja target "{n}". Please rename your targets.')
             self.all_outputs[n] = True
 
+class TargetSliceResult(T.NamedTuple):
+
+    """What a worker process generated for a slice of the targets."""
+
+    build_elements: T.List[T.Union[NinjaBuildElement, NinjaComment]]
+    rules: T.List[T.Union[NinjaRule, NinjaComment]]
+    processed_targets: T.List[str]
+    introspection_data: T.Dict[str, T.Any]
+    rpath_dirs_to_remove: T.Dict[str, T.Set[bytes]]
+    created_llvm_ir_rule: T.List[bool]
+    warnings: int
+
+# Set in the parent before the worker processes are forked, see
+# NinjaBackend.generate_targets_in_workers()
+_worker_state = None  # type: T.Optional[T.Tuple[NinjaBackend, T.List[build.Target]]]
+
+def _generate_target_slice(bounds: T.Tuple[int, int]) -> TargetSliceResult:
+    backend, targets = _worker_state
+    return backend.generate_target_slice(targets, *bounds)
+
 class NinjaBackend(backends.Backend):
 
     def __init__(self, build: T.Optional[build.Build], interpreter: T.Optional[Interpreter]):
@@ -431,6 +461,10 @@ class NinjaBackend(backends.Backend):
         self.all_outputs = {}
         self.introspection_data = {}
         self.created_llvm_ir_rule = PerMachine(False, False)
+        # Precompiled headers generated for targets that don't have one,
+        # keyed by target id and language
+        self.auto_pch: T.Dict[T.Tuple[str, str], T.List[str]] = {}
+        self._ninja_deps: T.Optional[T.Dict[str, T.List[str]]] = None
 
     def create_target_alias(self, to_target):
         # We need to use aliases for targets that might be used as directory
@@ -543,14 +577,25 @@ class NinjaBackend(backends.Backend):
 
 ''')
 
-        with self.detect_vs_dep_prefix(tempfilename) as outfile:
+        # Build statements are written to a temporary file as soon as they
+        # are complete, and copied after the rules they use.
+        with self.detect_vs_dep_prefix(tempfilename) as outfile, \
+                tempfile.TemporaryFile('w+', encoding='utf-8', dir=self.environment.get_scratch_dir()) as buildsfile:
             self.generate_rules()
 
             self.build_elements = []
             self.generate_phony()
             self.add_build_comment(NinjaComment('Build rules for targets'))
-            for t in ProgressBar(self.build.get_targets().values(), desc='Generating targets'):
-                self.generate_target(t)
+            targets = list(self.build.get_targets().values())
+            if self.environment.coredata.options[OptionKey('backend_auto_pch')].value:
+                # Read before forking so that the workers share them
+                self.get_ninja_deps()
+            if self.generate_targets_in_workers(targets):
+                self.write_builds(buildsfile)
+            else:
+                for t in ProgressBar(targets, desc='Generating targets'):
+                    self.generate_target(t)
+                    self.write_builds(buildsfile)
             self.add_build_comment(NinjaComment('Test rules'))
             self.generate_tests()
             self.add_build_comment(NinjaComment('Install rules'))
@@ -571,8 +616,10 @@ class NinjaBackend(backends.Backend):
             self.generate_utils()
             self.generate_ending()
 
+            self.write_builds(buildsfile)
             self.write_rules(outfile)
-            self.write_builds(outfile)
+            buildsfile.seek(0)
+            shutil.copyfileobj(buildsfile, outfile)
 
             default = 'default all\n\n'
             outfile.write(default)
@@ -715,6 +762,107 @@ class NinjaBackend(backends.Backend):
         src_block['sources'] += sources
         src_block['generated_sources'] += generated_sources
 
+    def get_generate_jobs(self) -> int:
+        jobs = self.environment.coredata.options[OptionKey('backend_generate_jobs')].value
+        if jobs == 0:
+            jobs = multiprocessing.cpu_count()
+        return jobs
+
+    def can_generate_in_worker(self, target: build.Target) -> bool:
+        # Fortran module dependencies are shared between targets and Vala
+        # adds outputs to the target, which a worker cannot send back.
+        if isinstance(target, build.BuildTarget):
+            return not {'fortran', 'vala'}.intersection(target.compilers)
+        return True
+
+    def generate_targets_in_workers(self, targets: T.List[build.Target]) -> bool:
+        '''Generate the build statements of the targets in worker processes.
+
+        Each worker generates a contiguous slice of the targets, with the
+        targets before the slice marked as already generated, and the
+        results are merged in the order of the slices. This gives the same
+        build file as generating the targets one after the other, as long as
+        the targets a target depends on come before it. Returns False
+        without generating anything when that is not the case or when the
+        targets cannot be generated in parallel.
+        '''
+        global _worker_state
+        jobs = min(self.get_generate_jobs(), len(targets))
+        if (jobs < 2 or 'fork' not in multiprocessing.get_all_start_methods() or
+                not all(self.can_generate_in_worker(t) for t in targets)):
+            return False
+        # More slices than workers, so that slices of expensive targets do
+        # not keep a single worker busy until the end.
+        slice_size = -(-len(targets) // (jobs * 4))
+        slices = [(i, min(i + slice_size, len(targets))) for i in range(0, len(targets), slice_size)]
+        # Buffered output would be written again by every worker
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if mlog.log_file is not None:
+            mlog.log_file.flush()
+        _worker_state = (self, targets)
+        try:
+            with multiprocessing.get_context('fork').Pool(jobs) as pool:
+                results = []
+                progress = ProgressBar(total=len(targets), desc='Generating targets')
+                for (start, end), r in zip(slices, pool.imap(_generate_target_slice, slices)):
+                    results.append(r)
+                    progress.update(end - start)
+                progress.close()
+        finally:
+            _worker_state = None
+        generated = set(self.processed_targets)
+        for r in results:
+            if generated.intersection(r.processed_targets):
+                # A target was generated before one of its dependencies
+                return False
+            generated.update(r.processed_targets)
+        for r in results:
+            for rule in r.rules:
+                if isinstance(rule, NinjaComment):
+                    self.add_rule_comment(rule)
+                elif rule.name not in self.ruledict:
+                    self.add_rule(rule)
+            for elem in r.build_elements:
+                if isinstance(elem, NinjaBuildElement):
+                    elem.all_outputs = self.all_outputs
+                    if hasattr(elem, 'rule'):
+                        elem.rule = self.ruledict[elem.rulename]
+                self.build_elements.append(elem)
+            self.processed_targets.update(r.processed_targets)
+            self.introspection_data.update(r.introspection_data)
+            for tid, dirs in r.rpath_dirs_to_remove.items():
+                self.build.targets[tid].rpath_dirs_to_remove = dirs
+            for m, created in zip(MachineChoice, r.created_llvm_ir_rule):
+                if created:
+                    self.created_llvm_ir_rule[m] = True
+            mlog.log_warnings_counter += r.warnings
+        return True
+
+    def generate_target_slice(self, targets: T.List[build.Target], start: int, end: int) -> TargetSliceResult:
+        '''Generate targets[start:end] in a worker process.'''
+        self.processed_targets.update(t.get_id() for t in targets[:start])
+        already_processed = set(self.processed_targets)
+        num_rules = len(self.rules)
+        self.build_elements = []
+        warnings = mlog.log_warnings_counter
+        for t in targets[start:end]:
+            self.generate_target(t)
+        processed = [tid for tid in self.processed_targets if tid not in already_processed]
+        rpath_dirs = {}  # type: T.Dict[str, T.Set[bytes]]
+        for tid in processed:
+            target = self.build.targets[tid]
+            if isinstance(target, build.BuildTarget):
+                rpath_dirs[tid] = target.rpath_dirs_to_remove
+        sys.stdout.flush()
+        if mlog.log_file is not None:
+            mlog.log_file.flush()
+        return TargetSliceResult(self.build_elements, self.rules[num_rules:], processed,
+                                 {tid: self.introspection_data[tid] for tid in processed
+                                  if tid in self.introspection_data},
+                                 rpath_dirs, [self.created_llvm_ir_rule[m] for m in MachineChoice],
+                                 mlog.log_warnings_counter - warnings)
+
     def generate_target(self, target):
         try:
             if isinstance(target, build.BuildTarget):
@@ -786,6 +934,7 @@ class NinjaBackend(backends.Backend):
         unity_src = []
         unity_deps = [] # Generated sources that must be built before compiling a Unity target.
         header_deps += self.get_generated_headers(target)
+        self.generate_auto_pch(target, target_sources)
 
         if is_unity:
             # Warn about incompatible sources if a unity build is enabled
@@ -836,7 +985,7 @@ class NinjaBackend(backends.Backend):
             obj_list.append(o)
 
         use_pch = self.environment.coredata.options.get(OptionKey('b_pch'))
-        if use_pch and target.has_pch():
+        if use_pch and self.target_has_pch(target):
             pch_objects = self.generate_pch(target, header_deps=header_deps)
         else:
             pch_objects = []
@@ -1209,16 +1358,15 @@ class NinjaBackend(backends.Backend):
                 mlog.warning(f"build statement for {build.outfilenames} references non-existent rule {build.rulename}")
 
     def write_rules(self, outfile):
-        for b in self.build_elements:
-            if isinstance(b, NinjaBuildElement):
-                b.count_rule_references()
-
+        # Only rules used by the build statements written so far are written
         for r in self.rules:
             r.write(outfile)
 
     def write_builds(self, outfile):
-        for b in ProgressBar(self.build_elements, desc='Writing build.ninja'):
+        '''Write the pending build statements and forget them.'''
+        for b in self.build_elements:
             b.write(outfile)
+        self.build_elements = []
 
     def generate_phony(self):
         self.add_build_comment(NinjaComment('Phony build target, always out of date'))
@@ -2381,7 +2529,7 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
         # If you feel that the above is completely wrong and all of
         # this is actually doable, please send patches.
 
-        if target.has_pch():
+        if self.target_has_pch(target):
             tfilename = self.get_target_filename_abs(target)
             return compiler.get_compile_debugfile_args(tfilename, pch=True)
         else:
@@ -2576,7 +2724,7 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
 
         # PCH handling
         if self.environment.coredata.options.get(OptionKey('b_pch')):
-            pchlist = target.get_pch(compiler.language)
+            pchlist = self.get_target_pch(target, compiler.language)
         else:
             pchlist = []
         if not pchlist:
@@ -2689,7 +2837,7 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
         if len(pch) == 1:
             # Auto generate PCH.
             source = self.create_msvc_pch_implementation(target, compiler.get_language(), pch[0])
-            pch_header_dir = os.path.dirname(os.path.join(self.build_to_src, target.get_source_subdir(), header))
+            pch_header_dir = os.path.dirname(self.get_pch_header(target, compiler.get_language()))
             commands += compiler.get_include_args(pch_header_dir, False)
         else:
             source = os.path.join(self.build_to_src, target.get_source_subdir(), pch[1])
@@ -2713,26 +2861,76 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
         dep = dst + '.' + compiler.get_depfile_suffix()
         return commands, dep, dst, []  # Gcc does not create an object file during pch generation.
 
+    def get_target_pch(self, target: build.BuildTarget, lang: str) -> T.List[str]:
+        return target.get_pch(lang) or self.auto_pch.get((target.get_id(), lang), [])
+
+    def target_has_pch(self, target: build.BuildTarget) -> bool:
+        return target.has_pch() or any(self.get_target_pch(target, lang) for lang in ['c', 'cpp'])
+
+    def get_pch_header(self, target: build.BuildTarget, lang: str) -> str:
+        '''Path of the precompiled header of a target relative to the build directory'''
+        pch = target.get_pch(lang)
+        if pch:
+            return os.path.join(self.build_to_src, target.get_source_subdir(), pch[0])
+        return self.auto_pch[(target.get_id(), lang)][0]
+
+    def get_ninja_deps(self) -> T.Dict[str, T.List[str]]:
+        if self._ninja_deps is None:
+            self._ninja_deps = buildgraph.load_ninja_deps(self.environment.get_build_dir())
+        return self._ninja_deps
+
+    def generate_auto_pch(self, target: build.BuildTarget, target_sources: T.Dict[str, File]) -> None:
+        '''Precompile the headers most sources of the target used in the previous build
+
+        Only for languages the target has no precompiled header for.
+        '''
+        if not (self.environment.coredata.options[OptionKey('backend_auto_pch')].value and
+                self.environment.coredata.options.get(OptionKey('b_pch'))):
+            return
+        for lang in ['c', 'cpp']:
+            compiler = target.compilers.get(lang)
+            if compiler is None or target.get_pch(lang):
+                continue
+            if compiler.get_id() not in {'gcc', 'clang'} and not isinstance(compiler, VisualStudioLikeCompiler):
+                continue
+            private_dir = self.get_target_private_dir(target)
+            header = os.path.join(private_dir, f'meson-auto-pch-{lang}.h')
+            deps = self.get_ninja_deps()
+            # Objects built with the precompiled header of the previous build
+            # don't list the headers it includes as dependencies.
+            pch_deps = deps.get(os.path.join(private_dir, compiler.get_pch_name(header)), [])
+            used: T.Dict[str, T.List[str]] = {}
+            for src in target_sources.values():
+                if src.is_built or self.environment.is_header(src) or not compiler.can_compile(src):
+                    continue
+                obj = os.path.join(private_dir, self.object_filename_from_source(target, src))
+                if obj in deps:
+                    used[src.absolute_path(self.source_dir, self.build_dir)] = deps[obj] + pch_deps
+            headers = autopch.select_headers(used, [self.source_dir, self.build_dir])
+            if headers:
+                autopch.write_header(os.path.join(self.build_dir, header), headers)
+                self.auto_pch[(target.get_id(), lang)] = [header]
+
     def generate_pch(self, target, header_deps=None):
         header_deps = header_deps if header_deps is not None else []
         pch_objects = []
         for lang in ['c', 'cpp']:
-            pch = target.get_pch(lang)
+            pch = self.get_target_pch(target, lang)
             if not pch:
                 continue
-            if not has_path_sep(pch[0]) or not has_path_sep(pch[-1]):
+            if target.get_pch(lang) and (not has_path_sep(pch[0]) or not has_path_sep(pch[-1])):
                 msg = f'Precompiled header of {target.get_basename()!r} must not be in the same ' \
                       'directory as source, please put it in a subdirectory.'
                 raise InvalidArguments(msg)
             compiler = target.compilers[lang]
             if isinstance(compiler, VisualStudioLikeCompiler):
                 (commands, dep, dst, objs, src) = self.generate_msvc_pch_command(target, compiler, pch)
-                extradep = os.path.join(self.build_to_src, target.get_source_subdir(), pch[0])
+                extradep = self.get_pch_header(target, lang)
             elif compiler.id == 'intel':
                 # Intel generates on target generation
                 continue
             else:
-                src = os.path.join(self.build_to_src, target.get_source_subdir(), pch[0])
+                src = self.get_pch_header(target, lang)
                 (commands, dep, dst, objs) = self.generate_gcc_pch_command(target, compiler, pch[0])
                 extradep = None
             pch_objects += objs
@@ -684,6 +684,10 @@ class BuildTarget(Target):
 
     install_dir: T.List[T.Union[str, bool]]
 
+    # Incremented whenever a target gets a new link_with or link_whole
+    # target, which invalidates the results cached by get_dependencies().
+    link_graph_version = 0
+
     def __init__(self, name: str, subdir: str, subproject: str, for_machine: MachineChoice,
                  sources: T.List['SourceOutputs'], objects, environment: environment.Environment, kwargs):
         super().__init__(name, subdir, subproject, True, for_machine)
@@ -697,6 +701,7 @@ class BuildTarget(Target):
         self.link_language = kwargs.get('link_language')
         self.link_targets: T.List[BuildTarget] = []
         self.link_whole_targets = []
+        self._link_closure: T.Optional[T.Tuple[int, T.List[Target]]] = None
         self.link_depends = []
         self.added_deps = set()
         self.name_prefix_set = False
@@ -1251,17 +1256,49 @@ class BuildTarget(Target):
     def get_extra_args(self, language):
         return self.extra_args.get(language, [])
 
-    def get_dependencies(self, exclude=None):
-        transitive_deps = []
-        if exclude is None:
-            exclude = []
-        for t in itertools.chain(self.link_targets, self.link_whole_targets):
-            if t in transitive_deps or t in exclude:
+    def get_dependencies(self) -> 'ImmutableListProtocol[Target]':
+        """Targets this one links with, directly or through static libraries.
+
+        The link_with and link_whole targets of each static library are
+        included after it, recursively, keeping only the first occurrence
+        of every target. The result is cached until a link is added to any
+        target.
+        """
+        if not self._has_link_closure():
+            # Compute the closures of the static libraries first, without
+            # recursion so that deep stacks of static libraries do not hit
+            # the recursion limit.
+            pending: T.List[BuildTarget] = [self]
+            while pending:
+                t = pending[-1]
+                missing = [d for d in t._direct_link_deps()
+                           if isinstance(d, StaticLibrary) and not d._has_link_closure()]
+                if missing:
+                    pending.extend(missing)
+                    continue
+                pending.pop()
+                if not t._has_link_closure():
+                    t._compute_link_closure()
+        return self._link_closure[1]
+
+    def _direct_link_deps(self) -> T.Iterator[Target]:
+        return itertools.chain(self.link_targets, self.link_whole_targets)
+
+    def _has_link_closure(self) -> bool:
+        return self._link_closure is not None and self._link_closure[0] == BuildTarget.link_graph_version
+
+    def _compute_link_closure(self) -> None:
+        # A dict is used as an ordered set
+        closure: T.Dict[Target, None] = {}
+        for t in self._direct_link_deps():
+            if t in closure:
+                # Its own dependencies were added along with it
                 continue
-            transitive_deps.append(t)
+            closure[t] = None
             if isinstance(t, StaticLibrary):
-                transitive_deps += t.get_dependencies(transitive_deps + exclude)
-        return transitive_deps
+                for d in t._link_closure[1]:
+                    closure.setdefault(d)
+        self._link_closure = (BuildTarget.link_graph_version, list(closure))
 
     def get_source_subdir(self):
         return self.subdir
@@ -1365,6 +1402,7 @@ You probably should put it in link_with instead.''')
                 else:
                     mlog.warning(msg + ' This will fail in cross build.')
             self.link_targets.append(t)
+            BuildTarget.link_graph_version += 1
 
     def link_whole(self, target):
         for t in listify(target):
@@ -1393,6 +1431,7 @@ You probably should put it in link_with instead.''')
                 # library, we need to add that target's objects to ourselves.
                 self.objects += t.extract_all_objects_recurse()
             self.link_whole_targets.append(t)
+            BuildTarget.link_graph_version += 1
 
     def extract_all_objects_recurse(self) -> T.List[T.Union[str, 'ExtractedObjects']]:
         objs = [self.extract_all_objects()]
@@ -0,0 +1,235 @@
+# Copyright 2021 The Meson development team
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Reverse dependencies of the targets of a build directory.
+
+Finds the targets, tests and benchmarks affected by a change to some
+files. The files each target is built from and the targets it depends on
+are written to meson-private when the build directory is generated,
+along with the files the commands of tests and benchmarks use.
+Headers found by the compiler are not known to Meson, they are read from
+the dependency information ninja recorded during the last build, so a
+header is only attributed to the objects that were built at least once.
+Changing a build definition file affects everything.
+'''
+
+import json
+import os
+import typing as T
+
+from . import build, mesonlib, programs
+from .environment import detect_ninja
+from .mesonlib import File, MesonException
+
+if T.TYPE_CHECKING:
+    from .backend.backends import Backend
+    from .interpreter.interpreterobjects import Test
+
+GRAPH_VERSION = 2
+
+def get_graph_file(private_dir: str) -> str:
+    return os.path.join(private_dir, 'build-graph.json')
+
+class _TargetInputs:
+    def __init__(self, srcdir: str, builddir: str, subdir: str) -> None:
+        self.srcdir = srcdir
+        self.builddir = builddir
+        self.subdir = subdir
+        self.files = set()  # type: T.Set[str]
+        self.depends = set()  # type: T.Set[str]
+
+    def add(self, item: T.Any) -> None:
+        if isinstance(item, list):
+            for i in item:
+                self.add(i)
+        elif isinstance(item, File):
+            self.files.add(os.path.normpath(item.absolute_path(self.srcdir, self.builddir)))
+        elif isinstance(item, str):
+            self.files.add(os.path.normpath(os.path.join(self.srcdir, self.subdir, item)))
+        elif isinstance(item, build.Target):
+            self.depends.add(item.get_id())
+        elif isinstance(item, (build.CustomTargetIndex, build.ExtractedObjects)):
+            self.depends.add(item.target.get_id())
+        elif isinstance(item, build.GeneratedList):
+            self.add(item.infilelist)
+            self.add(list(item.depends))
+            self.add(item.extra_depends)
+            self.add(item.depend_files)
+            if isinstance(item.generator.exe, build.Target):
+                self.add(item.generator.exe)
+
+def _target_inputs(target: build.Target, srcdir: str, builddir: str) -> _TargetInputs:
+    inputs = _TargetInputs(srcdir, builddir, target.subdir)
+    if isinstance(target, build.BuildTarget):
+        inputs.add(target.sources)
+        inputs.add(target.generated)
+        inputs.add(target.objects)
+        inputs.add(target.link_targets)
+        inputs.add(target.link_whole_targets)
+        inputs.add(target.link_depends)
+        for pch in target.pch.values():
+            inputs.add(pch)
+    else:
+        inputs.add(getattr(target, 'sources', []))
+        inputs.add(getattr(target, 'extra_depends', []))
+        inputs.add(target.dependencies)
+        inputs.add(target.depend_files)
+    return inputs
+
+def _test_inputs(test: 'Test', srcdir: str, builddir: str) -> T.List[str]:
+    # Targets are already in the depends of the test, only the files the
+    # command runs or is given are left.
+    inputs = _TargetInputs(srcdir, builddir, '')
+    if isinstance(test.exe, programs.ExternalProgram):
+        inputs.add([c for c in test.exe.get_command() if os.path.isabs(c)])
+    inputs.add([a for a in test.cmd_args if isinstance(a, File)])
+    return sorted(inputs.files)
+
+def generate_graph(builddata: build.Build, backend: 'Backend') -> T.Dict[str, T.Any]:
+    srcdir = builddata.environment.get_source_dir()
+    builddir = builddata.environment.get_build_dir()
+    targets = {}  # type: T.Dict[str, T.Dict[str, T.Any]]
+    for tid, target in builddata.get_targets().items():
+        inputs = _target_inputs(target, srcdir, builddir)
+        outdir = backend.get_target_dir(target)
+        private_dir = None  # type: T.Optional[str]
+        if isinstance(target, build.BuildTarget):
+            private_dir = os.path.normpath(backend.get_target_private_dir(target))
+        targets[tid] = {
+            'name': target.get_basename(),
+            'type': target.get_typename(),
+            'subproject': target.subproject or None,
+            'inputs': sorted(inputs.files),
+            'depends': sorted(inputs.depends),
+            'outputs': [os.path.normpath(os.path.join(builddir, outdir, o)) for o in target.get_outputs()],
+            'private_dir': private_dir,
+        }
+    result = {'version': GRAPH_VERSION, 'targets': targets}  # type: T.Dict[str, T.Any]
+    for kind, tests in [('tests', builddata.get_tests()), ('benchmarks', builddata.get_benchmarks())]:
+        result[kind] = [{'name': t.get_name(),
+                         'project': t.project_name,
+                         'inputs': _test_inputs(t, srcdir, builddir)}
+                        for t in tests]
+    return result
+
+def write_graph(builddata: build.Build, backend: 'Backend') -> None:
+    graph_file = get_graph_file(builddata.environment.get_scratch_dir())
+    tmp_file = graph_file + '~'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(generate_graph(builddata, backend), f)
+    mesonlib.replace_if_different(graph_file, tmp_file)
+
+def load_ninja_deps(builddir: str) -> T.Dict[str, T.List[str]]:
+    """Headers every object file depends on, as recorded by the last build."""
+    ninja = detect_ninja()
+    if ninja is None or not os.path.exists(os.path.join(builddir, 'build.ninja')):
+        return {}
+    p, o, _ = mesonlib.Popen_safe(ninja + ['-C', builddir, '-t', 'deps'])
+    if p.returncode != 0:
+        return {}
+    deps = {}  # type: T.Dict[str, T.List[str]]
+    current = None  # type: T.Optional[T.List[str]]
+    for line in o.splitlines():
+        if not line.strip():
+            current = None
+        elif not line[0].isspace():
+            target, _, status = line.partition(': #deps')
+            current = [] if status.rstrip().endswith('(VALID)') else None
+            if current is not None:
+                deps[target] = current
+        elif current is not None:
+            current.append(os.path.normpath(os.path.join(builddir, line.strip())))
+    return deps
+
+class BuildGraph:
+
+    """Reverse dependencies of the targets of a build directory."""
+
+    def __init__(self, targets: T.Dict[str, T.Dict[str, T.Any]], build_files: T.Iterable[str],
+                 object_deps: T.Dict[str, T.List[str]],
+                 tests: T.Optional[T.Dict[str, T.List[T.Dict[str, T.Any]]]] = None) -> None:
+        self.targets = targets
+        self.tests = tests or {}
+        self.build_files = {os.path.normpath(f) for f in build_files}
+        # Targets using every file, and targets depending on every target
+        self.users = {}  # type: T.Dict[str, T.Set[str]]
+        self.dependents = {}  # type: T.Dict[str, T.Set[str]]
+        private_dirs = {}  # type: T.Dict[str, str]
+        for tid, t in targets.items():
+            # A target is affected by a change to its outputs too, since
+            # they have to be generated again.
+            for f in t['inputs'] + t['outputs']:
+                self.users.setdefault(f, set()).add(tid)
+            for d in t['depends']:
+                self.dependents.setdefault(d, set()).add(tid)
+            if t['private_dir'] is not None:
+                private_dirs[t['private_dir']] = tid
+        for obj, headers in object_deps.items():
+            tid = None
+            d = os.path.dirname(os.path.normpath(obj))
+            while d and tid is None:
+                tid = private_dirs.get(d)
+                d = os.path.dirname(d)
+            if tid is not None:
+                for h in headers:
+                    self.users.setdefault(h, set()).add(tid)
+
+    def affected_targets(self, files: T.Iterable[str]) -> T.List[str]:
+        """IDs of the targets affected by changes to the given absolute paths."""
+        # The source directory may have been given through a symlink
+        files = {p for f in files for p in (os.path.normpath(f), os.path.realpath(f))}
+        if files & self.build_files:
+            return list(self.targets)
+        todo = [tid for f in files for tid in self.users.get(f, ())]
+        seen = set(todo)
+        while todo:
+            for d in self.dependents.get(todo.pop(), ()):
+                if d not in seen:
+                    seen.add(d)
+                    todo.append(d)
+        return [tid for tid in self.targets if tid in seen]
+
+    def affected_tests(self, files: T.Iterable[str], kind: str = 'tests') -> T.List[T.Tuple[str, str]]:
+        """
+        Project and name of the tests or benchmarks whose command uses one of
+        the given absolute paths. Tests affected through the targets they
+        depend on are found with affected_targets().
+        """
+        files = {p for f in files for p in (os.path.normpath(f), os.path.realpath(f))}
+        everything = bool(files & self.build_files)
+        return [(t['project'], t['name']) for t in self.tests.get(kind, [])
+                if everything or files.intersection(t['inputs'])]
+
+def load_graph_data(builddir: str) -> T.Dict[str, T.Any]:
+    graph_file = get_graph_file(os.path.join(builddir, 'meson-private'))
+    try:
+        with open(graph_file, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        data = {}
+    if data.get('version') != GRAPH_VERSION:
+        raise MesonException(f'{graph_file} is missing or was written by another version of Meson, '
+                             'regenerate the build directory with `meson setup --reconfigure`.')
+    return data
+
+def load_targets(builddir: str) -> T.Dict[str, T.Dict[str, T.Any]]:
+    """Inputs, outputs and dependencies of the targets, by target ID."""
+    return load_graph_data(builddir)['targets']
+
+def load_graph(builddir: str) -> BuildGraph:
+    from . import mintro
+    data = load_graph_data(builddir)
+    build_files = mintro.load_info_file(mintro.get_infodir(builddir), 'buildsystem_files')
+    tests = {kind: data[kind] for kind in ['tests', 'benchmarks']}
+    return BuildGraph(data['targets'], build_files, load_ninja_deps(os.path.abspath(builddir)), tests)
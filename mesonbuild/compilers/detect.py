@@ -16,6 +16,7 @@ from ..mesonlib import (
     MachineChoice, MesonException, EnvironmentException,
     search_version, is_windows, Popen_safe, windows_proof_rm,
 )
+from ..detectcache import Popen_detect
 from ..envconfig import BinaryTable
 from .. import mlog
 
@@ -403,7 +404,7 @@ def _detect_c_or_cpp_compiler(env: 'Environment', lang: str, for_machine: Machin
             arg = '--version'
 
         try:
-            p, out, err = Popen_safe(compiler + [arg])
+            p, out, err = Popen_detect(compiler + [arg])
         except OSError as e:
             popen_exceptions[' '.join(compiler + [arg])] = e
             continue
@@ -487,7 +488,7 @@ def _detect_c_or_cpp_compiler(env: 'Environment', lang: str, for_machine: Machin
             # clang
             arg = '--version'
             try:
-                p, out, err = Popen_safe(compiler + [arg])
+                p, out, err = Popen_detect(compiler + [arg])
             except OSError as e:
                 popen_exceptions[' '.join(compiler + [arg])] = e
             version = search_version(out)
@@ -677,7 +678,7 @@ def detect_fortran_compiler(env: 'Environment', for_machine: MachineChoice) -> C
     for compiler in compilers:
         for arg in ['--version', '-V']:
             try:
-                p, out, err = Popen_safe(compiler + [arg])
+                p, out, err = Popen_detect(compiler + [arg])
             except OSError as e:
                 popen_exceptions[' '.join(compiler + [arg])] = e
                 continue
@@ -810,7 +811,7 @@ def _detect_objc_or_objcpp_compiler(env: 'Environment', for_machine: MachineChoi
     for compiler in compilers:
         arg = ['--version']
         try:
-            p, out, err = Popen_safe(compiler + arg)
+            p, out, err = Popen_detect(compiler + arg)
         except OSError as e:
             popen_exceptions[' '.join(compiler + arg)] = e
             continue
@@ -1183,7 +1184,7 @@ def _get_gnu_compiler_defines(compiler: T.List[str]) -> T.Dict[str, str]:
     # Arguments to output compiler pre-processor defines to stdout
     # gcc, g++, and gfortran all support these arguments
     args = compiler + ['-E', '-dM', '-']
-    p, output, error = Popen_safe(args, write='', stdin=subprocess.PIPE)
+    p, output, error = Popen_detect(args, write='')
     if p.returncode != 0:
         raise EnvironmentException('Unable to detect GNU compiler type:\n' + output + error)
     # Parse several lines of the type:
@@ -1207,7 +1208,7 @@ def _get_clang_compiler_defines(compiler: T.List[str]) -> T.Dict[str, str]:
     Get the list of Clang pre-processor defines
     """
     args = compiler + ['-E', '-dM', '-']
-    p, output, error = Popen_safe(args, write='', stdin=subprocess.PIPE)
+    p, output, error = Popen_detect(args, write='')
     if p.returncode != 0:
         raise EnvironmentException('Unable to get clang pre-processor defines:\n' + output + error)
     defines: T.Dict[str, str] = {}
@@ -604,6 +604,14 @@ class CoreData:
                 'Maximum number of linker processes to run or 0 for no '
                 'limit',
                 (0, None, 0))
+            self.options[OptionKey('backend_generate_jobs')] = UserIntegerOption(
+                'Number of processes generating the build file or 0 for one '
+                'per CPU',
+                (0, None, 1))
+            self.options[OptionKey('backend_auto_pch')] = UserBooleanOption(
+                'Precompile the system headers most sources of each target '
+                'used in the previous build',
+                False)
         elif backend_name.startswith('vs'):
             self.options[OptionKey('backend_startup_project')] = UserStringOption(
                 'Default project to execute in Visual Studio',
@@ -1211,10 +1219,12 @@ BUILTIN_CORE_OPTIONS: 'KeyedOptionDictType' = OrderedDict([
     (OptionKey('strip'),           BuiltinOption(UserBooleanOption, 'Strip targets on install', False)),
     (OptionKey('unity'),           BuiltinOption(UserComboOption, 'Unity build', 'off', choices=['on', 'off', 'subprojects'])),
     (OptionKey('unity_size'),      BuiltinOption(UserIntegerOption, 'Unity block size', (2, None, 4))),
+    (OptionKey('unity_partition'), BuiltinOption(UserComboOption, 'Split sources between unity files by count or by estimated compilation cost', 'count', choices=['count', 'cost'])),
     (OptionKey('warning_level'),   BuiltinOption(UserComboOption, 'Compiler warning level to use', '1', choices=['0', '1', '2', '3'], yielding=False)),
     (OptionKey('werror'),          BuiltinOption(UserBooleanOption, 'Treat warnings as errors', False, yielding=False)),
     (OptionKey('wrap_mode'),       BuiltinOption(UserComboOption, 'Wrap mode', 'default', choices=['default', 'nofallback', 'nodownload', 'forcefallback', 'nopromote'])),
     (OptionKey('force_fallback_for'), BuiltinOption(UserArrayOption, 'Force fallback for those subprojects', [])),
+    (OptionKey('wrap_prefetch'),   BuiltinOption(UserIntegerOption, 'Number of wraps to fetch concurrently ahead of use (0 to disable)', (0, None, 0))),
 
     # Python module
     (OptionKey('platlibdir', module='python'),
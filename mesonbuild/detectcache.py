@@ -0,0 +1,155 @@
+# Copyright 2021 The Meson development team
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''User-wide cache of the output of compiler and linker detection probes.
+
+Detecting a toolchain runs the compiler several times: to get its version,
+its predefined macros and the linker it uses. The output of these runs
+only depends on the binaries involved and on a few environment variables,
+so it is stored in the user cache directory and shared by every build
+directory. The detection logic itself still runs every time on the cached
+output, so it detects the same compiler class, version, defines and linker
+as it would have without the cache.
+
+A probe is keyed by its command line and input, the path, size and
+modification time of every program in the command line, so that the
+compiler behind a wrapper like ccache is covered, of the linker the
+compiler runs and of the linkers found in PATH, and the environment
+variables that change what compilers print. Setting
+MESON_NO_DETECTION_CACHE disables the cache.
+'''
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import typing as T
+import uuid
+
+from . import mesonlib
+
+# Compilers pick these up from the environment, or print in the user's
+# language.
+_ENV_VARS = ('PATH', 'LANG', 'LANGUAGE', 'LC_ALL', 'LC_MESSAGES', 'SDKROOT',
+             'MACOSX_DEPLOYMENT_TARGET', 'DEVELOPER_DIR', 'INCLUDE', 'LIB',
+             'COMPILER_PATH', 'LIBRARY_PATH', 'CPATH', 'C_INCLUDE_PATH',
+             'CPLUS_INCLUDE_PATH', 'OBJC_INCLUDE_PATH')
+_ENV_PREFIXES = ('GCC_', 'CCC_', 'VSCMD_', 'VCTOOLS', 'WINDOWSSDK')
+
+# Linkers compilers may run when asked for their version
+_LINKERS = ('ld', 'ld.bfd', 'ld.gold', 'ld.lld', 'ld64.lld', 'lld-link', 'link')
+
+# Symlinks selecting the toolchain shims like /usr/bin/cc run
+_TOOLCHAIN_SELECTORS = ('/var/db/xcode_select_link',)
+
+_memory_cache = {}  # type: T.Dict[str, T.Tuple[int, str, str]]
+
+def _stamp(path: T.Optional[str]) -> T.Optional[T.List[T.Union[str, int]]]:
+    if path is None:
+        return None
+    try:
+        real = os.path.realpath(path)
+        st = os.stat(real)
+    except OSError:
+        return None
+    return [real, st.st_size, st.st_mtime_ns]
+
+def _programs(cmd: T.List[str]) -> T.List[T.List[T.Union[str, int]]]:
+    """Stamps of the programs in a command line.
+
+    Wrappers like ccache or distcc take the compiler they run as an
+    argument, and -fuse-ld= names the linker the compiler runs.
+    """
+    names = []  # type: T.List[str]
+    for arg in cmd[1:]:
+        if arg.startswith(('-fuse-ld=', '--ld-path=')):
+            name = arg.split('=', 1)[1]
+            names += [name, f'ld.{name}']
+        elif not arg.startswith('-'):
+            names.append(arg)
+    stamps = []  # type: T.List[T.List[T.Union[str, int]]]
+    for name in names:
+        stamp = _stamp(shutil.which(name))
+        if stamp is not None:
+            stamps.append(stamp)
+    return stamps
+
+def _key(cmd: T.List[str], write: T.Optional[str], linker_of: T.Optional[T.List[str]]) -> T.Optional[str]:
+    from .coredata import version
+    program = _stamp(shutil.which(cmd[0]))
+    if program is None:
+        return None
+    env = {k: v for k, v in os.environ.items()
+           if k.upper() in _ENV_VARS or k.upper().startswith(_ENV_PREFIXES)}
+    linkers = {l: _stamp(shutil.which(l)) for l in _LINKERS}
+    if linker_of is not None:
+        # The linker the compiler runs, which is not in PATH for cross
+        # toolchains. Asking for it is a probe of the compiler itself.
+        p, out, _ = Popen_detect(linker_of + ['-print-prog-name=ld'])
+        name = out.strip()
+        if p.returncode == 0 and name and '\n' not in name:
+            linkers[name] = _stamp(shutil.which(name))
+    selectors = [os.path.realpath(s) for s in _TOOLCHAIN_SELECTORS if os.path.lexists(s)]
+    data = json.dumps([version, sorted(env.items()), linkers, selectors, program, _programs(cmd), cmd, write])
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def cache_dir() -> str:
+    return os.path.join(mesonlib.user_cache_dir(), 'detect')
+
+def _load(key: str) -> T.Optional[T.Tuple[int, str, str]]:
+    try:
+        with open(os.path.join(cache_dir(), key + '.json'), encoding='utf-8') as f:
+            data = json.load(f)
+        return int(data['returncode']), str(data['stdout']), str(data['stderr'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _store(key: str, cmd: T.List[str], result: T.Tuple[int, str, str]) -> None:
+    dirname = cache_dir()
+    tmpname = os.path.join(dirname, f'.tmp-{uuid.uuid4().hex}')
+    try:
+        os.makedirs(dirname, exist_ok=True)
+        with open(tmpname, 'w', encoding='utf-8') as f:
+            json.dump({'command': cmd, 'returncode': result[0],
+                       'stdout': result[1], 'stderr': result[2]}, f)
+        os.replace(tmpname, os.path.join(dirname, key + '.json'))
+    except OSError:
+        # The cache is only an optimization
+        if os.path.exists(tmpname):
+            os.unlink(tmpname)
+
+def Popen_detect(cmd: T.List[str], write: T.Optional[str] = None, *,
+                 linker_of: T.Optional[T.List[str]] = None) -> T.Tuple[subprocess.CompletedProcess, str, str]:
+    '''Run a detection probe like Popen_safe(), reusing a cached output.
+
+    Like Popen_safe(), raises OSError if the program cannot be run. Only
+    the return code of the returned process is meaningful. Probes whose
+    output comes from the linker run by a GCC compatible compiler pass
+    that compiler as `linker_of`.
+    '''
+    key = None if os.environ.get('MESON_NO_DETECTION_CACHE') else _key(cmd, write, linker_of)
+    if key is not None:
+        result = _memory_cache.get(key) or _load(key)
+        if result is not None:
+            _memory_cache[key] = result
+            return subprocess.CompletedProcess(cmd, result[0]), result[1], result[2]
+    if write is not None:
+        p, out, err = mesonlib.Popen_safe(cmd, write=write, stdin=subprocess.PIPE)
+    else:
+        p, out, err = mesonlib.Popen_safe(cmd)
+    if key is not None:
+        _memory_cache[key] = (p.returncode, out, err)
+        _store(key, cmd, _memory_cache[key])
+    return subprocess.CompletedProcess(cmd, p.returncode), out, err
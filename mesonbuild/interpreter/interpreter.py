@@ -31,7 +31,7 @@ from ..interpreterbase import noPosargs, noKwargs, permittedKwargs, noArgsFlatte
 from ..interpreterbase import InterpreterException, InvalidArguments, InvalidCode, SubdirDoneRequest
 from ..interpreterbase import Disabler, disablerIfNotFound
 from ..interpreterbase import FeatureNew, FeatureDeprecated, FeatureNewKwargs, FeatureDeprecatedKwargs
-from ..interpreterbase import ObjectHolder
+from ..interpreterbase import ObjectHolder, fold_constants
 from ..interpreterbase.baseobjects import TYPE_nkwargs, TYPE_nvar, TYPE_var, TYPE_kwargs
 from ..modules import ExtensionModule, ModuleObject, MutableModuleObject, NewExtensionModule, NotFoundExtensionModule
 from ..cmake import CMakeInterpreter
@@ -267,9 +267,11 @@ class Interpreter(InterpreterBase, HoldableObject):
         if not mock and ast is None:
             self.load_root_meson_file()
             self.sanity_check_ast()
+            fold_constants(self.ast)
         elif ast is not None:
             self.ast = ast
             self.sanity_check_ast()
+            fold_constants(self.ast)
         self.builtin.update({'meson': MesonMain(self.build, self)})
         self.generators: T.List[build.Generator] = []
         self.processed_buildfiles = set() # type: T.Set[str]
@@ -1119,6 +1121,9 @@ external dependencies (including libraries) must go to "dependencies".''')
                 self.environment.wrap_resolver.merge_wraps(r)
             else:
                 self.environment.wrap_resolver = r
+            prefetch_workers = self.coredata.get_option(OptionKey('wrap_prefetch'))
+            if prefetch_workers and wrap_mode not in {WrapMode.nofallback, WrapMode.nodownload}:
+                self.environment.wrap_resolver.prefetch(prefetch_workers)
 
         self.build.projects[self.subproject] = proj_name
         mlog.log('Project name:', mlog.bold(proj_name))
@@ -1972,6 +1977,7 @@ This will become a hard error in the future.''', location=self.current_node)
         except mesonlib.MesonException as me:
             me.file = absname
             raise me
+        fold_constants(codeblock)
         try:
             self.evaluate_codeblock(codeblock)
         except SubdirDoneRequest:
@@ -2494,6 +2500,8 @@ This will become a hard error in the future.''', location=self.current_node)
         FeatureDeprecated.report(self.subproject)
         if not self.is_subproject():
             self.print_extra_warnings()
+            if self.environment.wrap_resolver:
+                self.environment.wrap_resolver.finish_prefetch()
         if self.subproject == '':
             self._print_summary()
 
@@ -2656,15 +2664,17 @@ Try setting b_lundef to false instead.'''.format(self.coredata.options[OptionKey
         else:
             raise InterpreterException(f'Unknown default_library value: {default_library}.')
 
+    # Decorated once here rather than inside build_target(), which is called
+    # for every target.
+    @FeatureNewKwargs('build target', '0.42.0', ['rust_crate_type', 'build_rpath', 'implicit_include_directories'])
+    @FeatureNewKwargs('build target', '0.41.0', ['rust_args'])
+    @FeatureNewKwargs('build target', '0.40.0', ['build_by_default'])
+    @FeatureNewKwargs('build target', '0.48.0', ['gnu_symbol_visibility'])
+    def build_target_decorator_caller(self, node, args, kwargs):
+        return True
+
     def build_target(self, node, args, kwargs, targetclass):
-        @FeatureNewKwargs('build target', '0.42.0', ['rust_crate_type', 'build_rpath', 'implicit_include_directories'])
-        @FeatureNewKwargs('build target', '0.41.0', ['rust_args'])
-        @FeatureNewKwargs('build target', '0.40.0', ['build_by_default'])
-        @FeatureNewKwargs('build target', '0.48.0', ['gnu_symbol_visibility'])
-        def build_target_decorator_caller(self, node, args, kwargs):
-            return True
-
-        build_target_decorator_caller(self, node, args, kwargs)
+        self.build_target_decorator_caller(node, args, kwargs)
 
         if not args:
             raise InterpreterException('Target does not have a name.')
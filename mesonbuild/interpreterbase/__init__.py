@@ -57,6 +57,8 @@ __all__ = [
 
     'InterpreterBase',
 
+    'fold_constants',
+
     'TV_fw_var',
     'TV_fw_args',
     'TV_fw_kwargs',
@@ -126,6 +128,7 @@ from .exceptions import (
 )
 
 from .disabler import Disabler, is_disabled
+from .folding import fold_constants
 from .helpers import default_resolve_key, flatten, resolve_second_level_holders
 from .interpreterbase import InterpreterBase
 from .operator import MesonOperator
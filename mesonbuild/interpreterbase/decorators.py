@@ -19,9 +19,8 @@ from .exceptions import InterpreterException, InvalidArguments
 from .operator import MesonOperator
 from ._unholder import _unholder
 
-from functools import wraps
+from functools import lru_cache, wraps
 import abc
-import itertools
 import copy
 import typing as T
 if T.TYPE_CHECKING:
@@ -208,6 +207,21 @@ def typed_pos_args(name: str, *types: T.Union[T.Type, T.Tuple[T.Type, ...]],
     argument is something else the it should be separated.
     """
     def inner(f: TV_func) -> TV_func:
+        # Everything that only depends on the signature is computed once
+        # here, the wrapper runs for every call of the function.
+        num_types = len(types)
+        num_optargs = len(optargs) if optargs else 0
+        if varargs:
+            min_args = num_types + min_varargs
+            max_args = num_types + max_varargs
+        all_types = list(types) + list(optargs or [])
+
+        def type_error(i: int, arg: T.Any, type_: T.Union[T.Type, T.Tuple[T.Type, ...]]) -> InvalidArguments:
+            if isinstance(type_, tuple):
+                shouldbe = 'one of: {}'.format(", ".join(f'"{t.__name__}"' for t in type_))
+            else:
+                shouldbe = f'"{type_.__name__}"'
+            return InvalidArguments(f'{name} argument {i} was of type "{type(arg).__name__}" but should have been {shouldbe}')
 
         @wraps(f)
         def wrapper(*wrapped_args: T.Any, **wrapped_kwargs: T.Any) -> T.Any:
@@ -221,12 +235,8 @@ def typed_pos_args(name: str, *types: T.Union[T.Type, T.Tuple[T.Type, ...]],
                 'varargs and optargs not supported together as this would be ambiguous'
 
             num_args = len(args)
-            num_types = len(types)
-            a_types = types
 
             if varargs:
-                min_args = num_types + min_varargs
-                max_args = num_types + max_varargs
                 if max_varargs == 0 and num_args < min_args:
                     raise InvalidArguments(f'{name} takes at least {min_args} arguments, but got {num_args}.')
                 elif max_varargs != 0 and (num_args < min_args or num_args > max_args):
@@ -234,45 +244,39 @@ def typed_pos_args(name: str, *types: T.Union[T.Type, T.Tuple[T.Type, ...]],
             elif optargs:
                 if num_args < num_types:
                     raise InvalidArguments(f'{name} takes at least {num_types} arguments, but got {num_args}.')
-                elif num_args > num_types + len(optargs):
-                    raise InvalidArguments(f'{name} takes at most {num_types + len(optargs)} arguments, but got {num_args}.')
-                # Add the number of positional arguments required
-                if num_args > num_types:
-                    diff = num_args - num_types
-                    a_types = tuple(list(types) + list(optargs[:diff]))
+                elif num_args > num_types + num_optargs:
+                    raise InvalidArguments(f'{name} takes at most {num_types + num_optargs} arguments, but got {num_args}.')
             elif num_args != num_types:
                 raise InvalidArguments(f'{name} takes exactly {num_types} arguments, but got {num_args}.')
 
-            for i, (arg, type_) in enumerate(itertools.zip_longest(args, a_types, fillvalue=varargs), start=1):
+            # The argument counts have been checked above, all_types covers
+            # every non variadic argument.
+            for i, arg in enumerate(args):
+                type_ = all_types[i] if i < len(all_types) else varargs
                 if not isinstance(arg, type_):
-                    if isinstance(type_, tuple):
-                        shouldbe = 'one of: {}'.format(", ".join(f'"{t.__name__}"' for t in type_))
-                    else:
-                        shouldbe = f'"{type_.__name__}"'
-                    raise InvalidArguments(f'{name} argument {i} was of type "{type(arg).__name__}" but should have been {shouldbe}')
+                    raise type_error(i + 1, arg, type_)
 
             # Ensure that we're actually passing a tuple.
             # Depending on what kind of function we're calling the length of
-            # wrapped_args can vary.
+            # wrapped_args can vary, but args are always second to last.
             nargs = list(wrapped_args)
-            i = nargs.index(args)
             if varargs:
                 # if we have varargs we need to split them into a separate
                 # tuple, as python's typing doesn't understand tuples with
                 # fixed elements and variadic elements, only one or the other.
                 # so in that case we need T.Tuple[int, str, float, T.Tuple[str, ...]]
-                pos = args[:len(types)]
-                var = list(args[len(types):])
+                pos = args[:num_types]
+                var = list(args[num_types:])
                 pos.append(var)
-                nargs[i] = tuple(pos)
+                nargs[-2] = tuple(pos)
             elif optargs:
-                if num_args < num_types + len(optargs):
-                    diff = num_types + len(optargs) - num_args
-                    nargs[i] = tuple(list(args) + [None] * diff)
+                if num_args < num_types + num_optargs:
+                    diff = num_types + num_optargs - num_args
+                    nargs[-2] = tuple(list(args) + [None] * diff)
                 else:
-                    nargs[i] = args
+                    nargs[-2] = args
             else:
-                nargs[i] = tuple(args)
+                nargs[-2] = tuple(args)
             return f(*nargs, **wrapped_kwargs)
 
         return T.cast(TV_func, wrapper)
@@ -439,6 +443,99 @@ class KwargInfo(T.Generic[_T]):
         )
 
 
+class _KwargChecker:
+
+    """Validator for a single keyword argument, built once per decorated function.
+
+    This is an implementation detail of :func:typed_kwargs.
+    """
+
+    def __init__(self, func_name: str, info: KwargInfo):
+        self.func_name = func_name
+        self.info = info
+        self.name = info.name
+        types_tuple = info.types if isinstance(info.types, tuple) else (info.types,)
+        self.types_tuple = types_tuple
+        self.plain_types = tuple(t for t in types_tuple if not isinstance(t, ContainerTypeInfo))
+        self.container_types = tuple(t for t in types_tuple if isinstance(t, ContainerTypeInfo))
+        self.feature_name = info.name + ' arg in ' + func_name
+        self.default_checked = False
+
+    def check_value_type(self, value: T.Any) -> bool:
+        if isinstance(value, self.plain_types):
+            return True
+        return any(t.check(value) for t in self.container_types)
+
+    def types_description(self) -> str:
+        candidates = []
+        for t in self.types_tuple:
+            if isinstance(t, ContainerTypeInfo):
+                candidates.append(t.description())
+            else:
+                candidates.append(t.__name__)
+        shouldbe = 'one of: ' if len(candidates) > 1 else ''
+        shouldbe += ', '.join(candidates)
+        return shouldbe
+
+    def __call__(self, kwargs: T.Dict[str, object], subproject: str, node: 'mparser.BaseNode') -> None:
+        info = self.info
+        name = self.func_name
+        value = kwargs.get(self.name)
+        if value is not None:
+            if info.since:
+                FeatureNew.single_use(self.feature_name, info.since, subproject, location=node)
+            if info.deprecated:
+                FeatureDeprecated.single_use(self.feature_name, info.deprecated, subproject, location=node)
+            if info.listify:
+                kwargs[self.name] = value = mesonlib.listify(value)
+            if not self.check_value_type(value):
+                shouldbe = self.types_description()
+                raise InvalidArguments(f'{name} keyword argument {info.name!r} was of type {type(value).__name__!r} but should have been {shouldbe}')
+
+            if info.validator is not None:
+                msg = info.validator(value)
+                if msg is not None:
+                    raise InvalidArguments(f'{name} keyword argument "{info.name}" {msg}')
+
+            warn: bool
+            if info.deprecated_values is not None:
+                for n, version in info.deprecated_values.items():
+                    if isinstance(value, (dict, list)):
+                        warn = n in value
+                    else:
+                        warn = n == value
+
+                    if warn:
+                        FeatureDeprecated.single_use(f'"{name}" keyword argument "{info.name}" value "{n}"', version, subproject, location=node)
+
+            if info.since_values is not None:
+                for n, version in info.since_values.items():
+                    if isinstance(value, (dict, list)):
+                        warn = n in value
+                    else:
+                        warn = n == value
+
+                    if warn:
+                        FeatureNew.single_use(f'"{name}" keyword argument "{info.name}" value "{n}"', version, subproject, location=node)
+
+        elif info.required:
+            raise InvalidArguments(f'{name} is missing required keyword argument "{info.name}"')
+        else:
+            # set the value to the default, this ensuring all kwargs are present
+            # This both simplifies the typing checking and the usage
+            if not self.default_checked:
+                assert self.check_value_type(info.default), f'In funcion {name} default value of {info.name} is not a valid type, got {type(info.default)} expected {self.types_description()}'
+                self.default_checked = True
+            # Create a shallow copy of the container. This allows mutable
+            # types to be used safely as default values
+            kwargs[self.name] = copy.copy(info.default)
+            if info.not_set_warning:
+                mlog.warning(info.not_set_warning)
+
+        if info.convertor:
+            kwargs[self.name] = info.convertor(kwargs[self.name])
+
+
 def typed_kwargs(name: str, *types: KwargInfo) -> T.Callable[..., T.Any]:
     """Decorator for type checking keyword arguments.
 
@@ -455,6 +552,10 @@ def typed_kwargs(name: str, *types: KwargInfo) -> T.Callable[..., T.Any]:
     :param *types: KwargInfo entries for each keyword argument.
     """
     def inner(f: TV_func) -> TV_func:
+        # Compile the signature once, instead of walking the KwargInfo list
+        # and building the type checks on every call.
+        all_names = frozenset(t.name for t in types)
+        checkers = [_KwargChecker(name, info) for info in types]
 
         @wraps(f)
         def wrapper(*wrapped_args: T.Any, **wrapped_kwargs: T.Any) -> T.Any:
@@ -462,86 +563,13 @@ def typed_kwargs(name: str, *types: KwargInfo) -> T.Callable[..., T.Any]:
             # Cast here, as the convertor function may place something other than a TYPE_var in the kwargs
             kwargs = T.cast(T.Dict[str, object], _kwargs)
 
-            all_names = {t.name for t in types}
-            unknowns = set(kwargs).difference(all_names)
-            if unknowns:
+            if not all_names.issuperset(kwargs):
+                unknowns = set(kwargs).difference(all_names)
                 ustr = ', '.join([f'"{u}"' for u in sorted(unknowns)])
                 raise InvalidArguments(f'{name} got unknown keyword arguments {ustr}')
 
-            for info in types:
-                types_tuple = info.types if isinstance(info.types, tuple) else (info.types,)
-                def check_value_type(value: T.Any) -> bool:
-                    for t in types_tuple:
-                        if isinstance(t, ContainerTypeInfo):
-                            if t.check(value):
-                                return True
-                        elif isinstance(value, t):
-                            return True
-                    return False
-                def types_description() -> str:
-                    candidates = []
-                    for t in types_tuple:
-                        if isinstance(t, ContainerTypeInfo):
-                            candidates.append(t.description())
-                        else:
-                            candidates.append(t.__name__)
-                    shouldbe = 'one of: ' if len(candidates) > 1 else ''
-                    shouldbe += ', '.join(candidates)
-                    return shouldbe
-                value = kwargs.get(info.name)
-                if value is not None:
-                    if info.since:
-                        feature_name = info.name + ' arg in ' + name
-                        FeatureNew.single_use(feature_name, info.since, subproject, location=node)
-                    if info.deprecated:
-                        feature_name = info.name + ' arg in ' + name
-                        FeatureDeprecated.single_use(feature_name, info.deprecated, subproject, location=node)
-                    if info.listify:
-                        kwargs[info.name] = value = mesonlib.listify(value)
-                    if not check_value_type(value):
-                        shouldbe = types_description()
-                        raise InvalidArguments(f'{name} keyword argument {info.name!r} was of type {type(value).__name__!r} but should have been {shouldbe}')
-
-                    if info.validator is not None:
-                        msg = info.validator(value)
-                        if msg is not None:
-                            raise InvalidArguments(f'{name} keyword argument "{info.name}" {msg}')
-
-                    warn: bool
-                    if info.deprecated_values is not None:
-                        for n, version in info.deprecated_values.items():
-                            if isinstance(value, (dict, list)):
-                                warn = n in value
-                            else:
-                                warn = n == value
-
-                            if warn:
-                                FeatureDeprecated.single_use(f'"{name}" keyword argument "{info.name}" value "{n}"', version, subproject, location=node)
-
-                    if info.since_values is not None:
-                        for n, version in info.since_values.items():
-                            if isinstance(value, (dict, list)):
-                                warn = n in value
-                            else:
-                                warn = n == value
-
-                            if warn:
-                                FeatureNew.single_use(f'"{name}" keyword argument "{info.name}" value "{n}"', version, subproject, location=node)
-
-                elif info.required:
-                    raise InvalidArguments(f'{name} is missing required keyword argument "{info.name}"')
-                else:
-                    # set the value to the default, this ensuring all kwargs are present
-                    # This both simplifies the typing checking and the usage
-                    assert check_value_type(info.default), f'In funcion {name} default value of {info.name} is not a valid type, got {type(info.default)} expected {types_description()}'
-                    # Create a shallow copy of the container. This allows mutable
-                    # types to be used safely as default values
-                    kwargs[info.name] = copy.copy(info.default)
-                    if info.not_set_warning:
-                        mlog.warning(info.not_set_warning)
-
-                if info.convertor:
-                    kwargs[info.name] = info.convertor(kwargs[info.name])
+            for checker in checkers:
+                checker(kwargs, subproject, node)
 
             return f(*wrapped_args, **wrapped_kwargs)
         return T.cast(TV_func, wrapper)
@@ -655,6 +683,7 @@ class FeatureNew(FeatureCheckBase):
     feature_registry = {}  # type: T.ClassVar[T.Dict[str, T.Dict[str, T.Set[T.Tuple[str, T.Optional[mparser.BaseNode]]]]]]
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def check_version(target_version: str, feature_version: str) -> bool:
         return mesonlib.version_compare_condition_with_min(target_version, feature_version)
 
@@ -687,6 +716,7 @@ class FeatureDeprecated(FeatureCheckBase):
     emit_notice = True
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def check_version(target_version: str, feature_version: str) -> bool:
         # For deprecation checks we need to return the inverse of FeatureNew checks
         return not mesonlib.version_compare_condition_with_min(target_version, feature_version)
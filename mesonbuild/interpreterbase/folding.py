@@ -0,0 +1,126 @@
+# Copyright 2021 The Meson development team
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Constant folding of literal-only subtrees of the AST.
+
+This runs once after a build file has been parsed, before it is evaluated,
+so that expressions such as `'foo' / 'bar'` or `['a', 'b']` inside large
+foreach loops are not recomputed on every iteration.
+
+Only operations that can never fail are folded. Version checks that the
+interpreter would have done while evaluating the original expression are
+recorded on the folded node and done when it is evaluated, so folding does
+not change the warnings a project gets.
+"""
+
+import os
+import typing as T
+
+from .. import mparser
+
+# (feature name, version) pairs checked with FeatureNew when a folded node
+# is evaluated.
+FeatureList = T.Tuple[T.Tuple[str, str], ...]
+
+
+class FoldedStringNode(mparser.StringNode):
+
+    """A string computed from literal strings at parse time."""
+
+    __slots__ = ['features']
+
+    def __init__(self, node: mparser.BaseNode, value: str, features: FeatureList):
+        token = mparser.Token('string', node.filename, 0, node.lineno, node.colno, (0, 0), value)
+        super().__init__(token)
+        self.end_lineno = node.end_lineno
+        self.end_colno = node.end_colno
+        self.features = features
+
+
+class FoldedArrayNode(mparser.ArrayNode):
+
+    """An array whose elements are all literals.
+
+    The original arguments are kept, only evaluation uses the folded value.
+    """
+
+    __slots__ = ['value', 'features']
+
+    def __init__(self, node: mparser.ArrayNode, value: T.List[T.Union[str, int, bool]], features: FeatureList):
+        super().__init__(node.args, node.lineno, node.colno, node.end_lineno, node.end_colno)
+        self.value = value
+        self.features = features
+
+
+_LITERALS = (mparser.StringNode, mparser.NumberNode, mparser.BooleanNode)
+
+def _features(node: mparser.BaseNode) -> FeatureList:
+    return getattr(node, 'features', ())
+
+def _fold_arithmetic(node: mparser.ArithmeticNode) -> mparser.BaseNode:
+    left, right = node.left, node.right
+    if not isinstance(left, mparser.StringNode) or not isinstance(right, mparser.StringNode):
+        return node
+    features = _features(left) + _features(right)
+    if node.operation == 'add':
+        return FoldedStringNode(node, left.value + right.value, features)
+    if node.operation == 'div':
+        # Same as str.op_div() in the interpreter
+        value = os.path.join(left.value, right.value).replace('\\', '/')
+        return FoldedStringNode(node, value, features + (('/ with string arguments', '0.49.0'),))
+    return node
+
+def _fold_array(node: mparser.ArrayNode) -> mparser.BaseNode:
+    args = node.args
+    if args.kwargs or args.incorrect_order():
+        return node
+    values = []  # type: T.List[T.Union[str, int, bool]]
+    features = ()  # type: FeatureList
+    for a in args.arguments:
+        if not isinstance(a, _LITERALS):
+            return node
+        values.append(a.value)
+        features += _features(a)
+    return FoldedArrayNode(node, values, features)
+
+def _attributes(node: mparser.BaseNode) -> T.Iterator[T.Tuple[str, T.Any]]:
+    seen = set()  # type: T.Set[str]
+    for cls in type(node).__mro__:
+        for attr in getattr(cls, '__slots__', ()):
+            if attr not in seen:
+                seen.add(attr)
+                yield attr, getattr(node, attr)
+
+def _fold(node: mparser.BaseNode) -> mparser.BaseNode:
+    for attr, value in list(_attributes(node)):
+        if isinstance(value, mparser.BaseNode):
+            setattr(node, attr, _fold(value))
+        elif isinstance(value, list):
+            for i, v in enumerate(value):
+                if isinstance(v, mparser.BaseNode):
+                    value[i] = _fold(v)
+        elif isinstance(value, dict):
+            # Only values are folded, keys of keyword arguments are names
+            for k, v in value.items():
+                if isinstance(v, mparser.BaseNode):
+                    value[k] = _fold(v)
+    if isinstance(node, mparser.ArithmeticNode):
+        return _fold_arithmetic(node)
+    if isinstance(node, mparser.ArrayNode) and not isinstance(node, FoldedArrayNode):
+        return _fold_array(node)
+    return node
+
+def fold_constants(codeblock: mparser.CodeBlockNode) -> None:
+    """Fold literal-only subtrees of a parsed build file, in place."""
+    _fold(codeblock)
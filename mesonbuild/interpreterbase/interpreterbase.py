@@ -16,7 +16,7 @@
 # or an interpreter-based tool.
 
 from .. import mparser, mesonlib
-from .. import environment
+from .. import environment, profiler
 
 from .baseobjects import (
     InterpreterObject,
@@ -43,6 +43,7 @@ from .exceptions import (
 
 from .decorators import FeatureNew
 from .disabler import Disabler, is_disabled
+from .folding import FoldedArrayNode, FoldedStringNode
 from .helpers import default_resolve_key, flatten, resolve_second_level_holders
 from .operator import MesonOperator
 from ._unholder import _unholder
@@ -72,6 +73,57 @@ FunctionType = T.Dict[
     T.Callable[[mparser.BaseNode, T.List[TYPE_var], T.Dict[str, TYPE_var]], TYPE_var]
 ]
 
+COMPARISON_OPERATORS: T.Dict[str, MesonOperator] = {
+    'in': MesonOperator.IN,
+    'notin': MesonOperator.NOT_IN,
+    '==': MesonOperator.EQUALS,
+    '!=': MesonOperator.NOT_EQUALS,
+    '>': MesonOperator.GREATER,
+    '<': MesonOperator.LESS,
+    '>=': MesonOperator.GREATER_EQUALS,
+    '<=': MesonOperator.LESS_EQUALS,
+}
+
+ARITHMETIC_OPERATORS: T.Dict[str, MesonOperator] = {
+    'add': MesonOperator.PLUS,
+    'sub': MesonOperator.MINUS,
+    'mul': MesonOperator.TIMES,
+    'div': MesonOperator.DIV,
+    'mod': MesonOperator.MOD,
+}
+
+FSTRING_VARIABLE_RE = re.compile(r'@([_a-zA-Z][_0-9a-zA-Z]*)@')
+VARIABLE_NAME_RE = re.compile('[_a-zA-Z][_0-9a-zA-Z]*$')
+
+# Name of the InterpreterBase method evaluating each type of node
+STATEMENT_EVALUATORS: T.Dict[T.Type[mparser.BaseNode], str] = {
+    mparser.FunctionNode: 'function_call',
+    mparser.AssignmentNode: 'assignment',
+    mparser.MethodNode: 'method_call',
+    mparser.StringNode: 'evaluate_literal',
+    mparser.BooleanNode: 'evaluate_literal',
+    mparser.NumberNode: 'evaluate_literal',
+    FoldedStringNode: 'evaluate_folded',
+    FoldedArrayNode: 'evaluate_folded',
+    mparser.IfClauseNode: 'evaluate_if',
+    mparser.IdNode: 'get_variable_node',
+    mparser.ComparisonNode: 'evaluate_comparison',
+    mparser.ArrayNode: 'evaluate_arraystatement',
+    mparser.DictNode: 'evaluate_dictstatement',
+    mparser.AndNode: 'evaluate_andstatement',
+    mparser.OrNode: 'evaluate_orstatement',
+    mparser.NotNode: 'evaluate_notstatement',
+    mparser.UMinusNode: 'evaluate_uminusstatement',
+    mparser.ArithmeticNode: 'evaluate_arithmeticstatement',
+    mparser.ForeachClauseNode: 'evaluate_foreach',
+    mparser.PlusAssignmentNode: 'evaluate_plusassign',
+    mparser.IndexNode: 'evaluate_indexing',
+    mparser.TernaryNode: 'evaluate_ternary',
+    mparser.FormatStringNode: 'evaluate_fstring',
+    mparser.ContinueNode: 'evaluate_continue',
+    mparser.BreakNode: 'evaluate_break',
+}
+
 class InterpreterBase:
     def __init__(self, source_root: str, subdir: str, subproject: str):
         self.source_root = source_root
@@ -84,6 +136,7 @@ class InterpreterBase:
         self.root_subdir = subdir
         self.subproject = subproject
         self.variables: T.Dict[str, InterpreterObject] = {}
+        self.statement_evaluators: T.Dict[T.Type[mparser.BaseNode], T.Callable[[T.Any], T.Optional[InterpreterObject]]] = {}
         self.argument_depth = 0
         self.current_lineno = -1
         # Current node set during a function call. This can be used as location
@@ -163,7 +216,11 @@ class InterpreterBase:
             cur = statements[i]
             try:
                 self.current_lineno = cur.lineno
-                self.evaluate_statement(cur)
+                if profiler.current is None:
+                    self.evaluate_statement(cur)
+                else:
+                    with profiler.current.frame(self._profile_location(cur), 'line'):
+                        self.evaluate_statement(cur)
             except Exception as e:
                 if getattr(e, 'lineno', None) is None:
                     # We are doing the equivalent to setattr here and mypy does not like it
@@ -175,55 +232,39 @@ class InterpreterBase:
 
     def evaluate_statement(self, cur: mparser.BaseNode) -> T.Optional[InterpreterObject]:
         self.current_node = cur
-        if isinstance(cur, mparser.FunctionNode):
-            return self.function_call(cur)
-        elif isinstance(cur, mparser.AssignmentNode):
-            self.assignment(cur)
-        elif isinstance(cur, mparser.MethodNode):
-            return self.method_call(cur)
-        elif isinstance(cur, mparser.StringNode):
-            return self._holderify(cur.value)
-        elif isinstance(cur, mparser.BooleanNode):
-            return self._holderify(cur.value)
-        elif isinstance(cur, mparser.IfClauseNode):
-            return self.evaluate_if(cur)
-        elif isinstance(cur, mparser.IdNode):
-            return self.get_variable(cur.value)
-        elif isinstance(cur, mparser.ComparisonNode):
-            return self.evaluate_comparison(cur)
-        elif isinstance(cur, mparser.ArrayNode):
-            return self.evaluate_arraystatement(cur)
-        elif isinstance(cur, mparser.DictNode):
-            return self.evaluate_dictstatement(cur)
-        elif isinstance(cur, mparser.NumberNode):
-            return self._holderify(cur.value)
-        elif isinstance(cur, mparser.AndNode):
-            return self.evaluate_andstatement(cur)
-        elif isinstance(cur, mparser.OrNode):
-            return self.evaluate_orstatement(cur)
-        elif isinstance(cur, mparser.NotNode):
-            return self.evaluate_notstatement(cur)
-        elif isinstance(cur, mparser.UMinusNode):
-            return self.evaluate_uminusstatement(cur)
-        elif isinstance(cur, mparser.ArithmeticNode):
-            return self.evaluate_arithmeticstatement(cur)
-        elif isinstance(cur, mparser.ForeachClauseNode):
-            self.evaluate_foreach(cur)
-        elif isinstance(cur, mparser.PlusAssignmentNode):
-            self.evaluate_plusassign(cur)
-        elif isinstance(cur, mparser.IndexNode):
-            return self.evaluate_indexing(cur)
-        elif isinstance(cur, mparser.TernaryNode):
-            return self.evaluate_ternary(cur)
-        elif isinstance(cur, mparser.FormatStringNode):
-            return self.evaluate_fstring(cur)
-        elif isinstance(cur, mparser.ContinueNode):
-            raise ContinueRequest()
-        elif isinstance(cur, mparser.BreakNode):
-            raise BreakRequest()
-        else:
-            raise InvalidCode("Unknown statement.")
-        return None
+        try:
+            evaluator = self.statement_evaluators[type(cur)]
+        except KeyError:
+            evaluator = self._lookup_statement_evaluator(type(cur))
+        return evaluator(cur)
+
+    def _lookup_statement_evaluator(self, node_type: T.Type[mparser.BaseNode]) -> T.Callable[[T.Any], T.Optional[InterpreterObject]]:
+        # Subclasses of node types are evaluated like their closest base
+        # class in STATEMENT_EVALUATORS. Bound methods are looked up once per
+        # node class, so that subclasses of the interpreter can override them.
+        for t in node_type.__mro__:
+            if t in STATEMENT_EVALUATORS:
+                evaluator = T.cast(T.Callable[[T.Any], T.Optional[InterpreterObject]],
+                                   getattr(self, STATEMENT_EVALUATORS[t]))
+                self.statement_evaluators[node_type] = evaluator
+                return evaluator
+        raise InvalidCode("Unknown statement.")
+
+    def evaluate_literal(self, cur: mparser.ElementaryNode) -> InterpreterObject:
+        return self._holderify(cur.value)
+
+    def evaluate_folded(self, cur: T.Union[FoldedStringNode, FoldedArrayNode]) -> InterpreterObject:
+        for feature, version in cur.features:
+            FeatureNew.single_use(feature, version, self.subproject, location=cur)
+        value = cur.value
+        # Lists are mutable, every evaluation gets its own copy
+        return self._holderify(list(value) if isinstance(value, list) else value)
+
+    def evaluate_continue(self, cur: mparser.ContinueNode) -> None:
+        raise ContinueRequest()
+
+    def evaluate_break(self, cur: mparser.BreakNode) -> None:
+        raise BreakRequest()
 
     def evaluate_arraystatement(self, cur: mparser.ArrayNode) -> InterpreterObject:
         (arguments, kwargs) = self.reduce_arguments(cur.args)
@@ -286,16 +327,7 @@ class InterpreterBase:
             return val2
 
         # New code based on InterpreterObjects
-        operator = {
-            'in': MesonOperator.IN,
-            'notin': MesonOperator.NOT_IN,
-            '==': MesonOperator.EQUALS,
-            '!=': MesonOperator.NOT_EQUALS,
-            '>': MesonOperator.GREATER,
-            '<': MesonOperator.LESS,
-            '>=': MesonOperator.GREATER_EQUALS,
-            '<=': MesonOperator.LESS_EQUALS,
-        }[node.ctype]
+        operator = COMPARISON_OPERATORS[node.ctype]
 
         # Check if the arguments should be reversed for simplicity (this essentially converts `in` to `contains`)
         if operator in (MesonOperator.IN, MesonOperator.NOT_IN):
@@ -343,15 +375,8 @@ class InterpreterBase:
         if isinstance(r, Disabler):
             return r
 
-        mapping: T.Dict[str, MesonOperator] = {
-            'add': MesonOperator.PLUS,
-            'sub': MesonOperator.MINUS,
-            'mul': MesonOperator.TIMES,
-            'div': MesonOperator.DIV,
-            'mod': MesonOperator.MOD,
-        }
         l.current_node = cur
-        res = l.operator_call(mapping[cur.operation], _unholder(r))
+        res = l.operator_call(ARITHMETIC_OPERATORS[cur.operation], _unholder(r))
         return self._holderify(res)
 
     def evaluate_ternary(self, node: mparser.TernaryNode) -> T.Optional[InterpreterObject]:
@@ -382,7 +407,7 @@ class InterpreterBase:
             except KeyError:
                 raise InvalidCode(f'Identifier "{var}" does not name a variable.')
 
-        res = re.sub(r'@([_a-zA-Z][_0-9a-zA-Z]*)@', replace, node.value)
+        res = FSTRING_VARIABLE_RE.sub(replace, node.value)
         return self._holderify(res)
 
     def evaluate_foreach(self, node: mparser.ForeachClauseNode) -> None:
@@ -451,7 +476,12 @@ class InterpreterBase:
                 func_args = flatten(posargs)
             if not getattr(func, 'no-second-level-holder-flattening', False):
                 func_args, kwargs = resolve_second_level_holders(func_args, kwargs)
-            res = func(node, func_args, kwargs)
+            if profiler.current is None:
+                res = func(node, func_args, kwargs)
+            else:
+                with profiler.current.frame(profiler.call_name(func_name, func_args), 'call',
+                                            {'location': self._profile_location(node)}):
+                    res = func(node, func_args, kwargs)
             return self._holderify(res) if res is not None else None
         else:
             self.unknown_function_called(func_name)
@@ -479,9 +509,18 @@ class InterpreterBase:
             elif not isinstance(obj, Disabler):
                 raise InvalidArguments(f'Invalid operation "extract_objects" on variable "{object_name}" of type {type(obj).__name__}')
         obj.current_node = node
-        res = obj.method_call(method_name, args, kwargs)
+        if profiler.current is None:
+            res = obj.method_call(method_name, args, kwargs)
+        else:
+            name = invokable.value if isinstance(invokable, mparser.IdNode) else type(obj).__name__
+            with profiler.current.frame(profiler.call_name(f'{name}.{method_name}', args), 'call',
+                                        {'location': self._profile_location(node)}):
+                res = obj.method_call(method_name, args, kwargs)
         return self._holderify(res) if res is not None else None
 
+    def _profile_location(self, node: mparser.BaseNode) -> str:
+        return f'{os.path.join(self.subdir, environment.build_filename)}:{node.lineno}'
+
     def _holderify(self, res: T.Union[TYPE_var, InterpreterObject]) -> InterpreterObject:
         if isinstance(res, HoldableTypes):
             # Always check for an exact match first.
@@ -581,12 +620,15 @@ class InterpreterBase:
                 raise mesonlib.MesonBugException(f'set_variable in InterpreterBase called with a non InterpreterObject {variable} of type {type(variable).__name__}')
         if not isinstance(varname, str):
             raise InvalidCode('First argument to set_variable must be a string.')
-        if re.match('[_a-zA-Z][_0-9a-zA-Z]*$', varname) is None:
+        if VARIABLE_NAME_RE.match(varname) is None:
             raise InvalidCode('Invalid variable name: ' + varname)
         if varname in self.builtin:
             raise InvalidCode(f'Tried to overwrite internal variable "{varname}"')
         self.variables[varname] = variable
 
+    def get_variable_node(self, node: mparser.IdNode) -> InterpreterObject:
+        return self.get_variable(node.value)
+
     def get_variable(self, varname: str) -> InterpreterObject:
         if varname in self.builtin:
             return self.builtin[varname]
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from ..detectcache import Popen_detect
 from ..mesonlib import (
     EnvironmentException, MachineChoice, OptionKey,
     Popen_safe, search_version
@@ -78,7 +79,7 @@ def guess_win_linker(env: 'Environment', compiler: T.List[str], comp_class: T.Ty
     if extra_args is not None:
         check_args.extend(extra_args)
 
-    p, o, _ = Popen_safe(compiler + check_args)
+    p, o, _ = Popen_detect(compiler + check_args)
     if 'LLD' in o.split('\n')[0]:
         if '(compatible with GNU linkers)' in o:
             return LLVMDynamicLinker(
@@ -93,7 +94,7 @@ def guess_win_linker(env: 'Environment', compiler: T.List[str], comp_class: T.Ty
         compiler = value
         # We've already hanedled the non-direct case above
 
-    p, o, e = Popen_safe(compiler + check_args)
+    p, o, e = Popen_detect(compiler + check_args)
     if 'LLD' in o.split('\n')[0]:
         return ClangClDynamicLinker(
             for_machine, [],
@@ -148,7 +149,7 @@ def guess_nix_linker(env: 'Environment', compiler: T.List[str], comp_class: T.Ty
         override = comp_class.use_linker_args(value[0])
         check_args += override
 
-    _, o, e = Popen_safe(compiler + check_args)
+    _, o, e = Popen_detect(compiler + check_args, linker_of=compiler)
     v = search_version(o + e)
     linker: DynamicLinker
     if 'LLD' in o.split('\n')[0]:
@@ -163,7 +164,7 @@ def guess_nix_linker(env: 'Environment', compiler: T.List[str], comp_class: T.Ty
         # files were specified), instead of printing the version number.
         # Let's try to extract the linker invocation command to grab the version.
 
-        _, o, e = Popen_safe(compiler + check_args + ['-v'])
+        _, o, e = Popen_detect(compiler + check_args + ['-v'], linker_of=compiler)
 
         try:
             linker_cmd = re.match(r'.*\n(.*?)\nlld-link: ', e, re.DOTALL).group(1)
@@ -178,9 +179,9 @@ def guess_nix_linker(env: 'Environment', compiler: T.List[str], comp_class: T.Ty
     # first is for apple clang, second is for real gcc, the third is icc
     elif e.endswith('(use -v to see invocation)\n') or 'macosx_version' in e or 'ld: unknown option:' in e:
         if isinstance(comp_class.LINKER_PREFIX, str):
-            _, _, e = Popen_safe(compiler + [comp_class.LINKER_PREFIX + '-v'] + extra_args)
+            _, _, e = Popen_detect(compiler + [comp_class.LINKER_PREFIX + '-v'] + extra_args, linker_of=compiler)
         else:
-            _, _, e = Popen_safe(compiler + comp_class.LINKER_PREFIX + ['-v'] + extra_args)
+            _, _, e = Popen_detect(compiler + comp_class.LINKER_PREFIX + ['-v'] + extra_args, linker_of=compiler)
         for line in e.split('\n'):
             if 'PROJECT:ld' in line:
                 v = line.split('-')[1]
@@ -207,9 +208,9 @@ def guess_nix_linker(env: 'Environment', compiler: T.List[str], comp_class: T.Ty
             version=v)
     elif 'ld: 0706-012 The -- flag is not recognized' in e:
         if isinstance(comp_class.LINKER_PREFIX, str):
-            _, _, e = Popen_safe(compiler + [comp_class.LINKER_PREFIX + '-V'] + extra_args)
+            _, _, e = Popen_detect(compiler + [comp_class.LINKER_PREFIX + '-V'] + extra_args, linker_of=compiler)
         else:
-            _, _, e = Popen_safe(compiler + comp_class.LINKER_PREFIX + ['-V'] + extra_args)
+            _, _, e = Popen_detect(compiler + comp_class.LINKER_PREFIX + ['-V'] + extra_args, linker_of=compiler)
         linker = AIXDynamicLinker(
             compiler, for_machine, comp_class.LINKER_PREFIX, override,
             version=search_version(e))
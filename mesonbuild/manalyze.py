@@ -0,0 +1,246 @@
+# Copyright 2021 The Meson development team
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Where the time of the last build went.
+
+Reads the commands ninja ran during its last run from .ninja_log and maps
+their outputs back to the targets that produced them, using the build
+graph written to meson-private when the build directory is generated.
+The critical path is estimated from the timings: going back from the
+last command, the previous step is the one of the same target or of a
+target it depends on that finished last before it started.
+'''
+
+import argparse
+import bisect
+import json
+import os
+import typing as T
+
+from . import buildgraph, ninjalog
+from .mesonlib import MesonException, RealPathAction
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('-C', dest='wd', action=RealPathAction,
+                        help='directory to cd into before running')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Number of targets and commands to list (default: %(default)s).')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the analysis as JSON.')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='Write the commands of the build to FILE in the Chrome trace event format.')
+
+class Step(T.NamedTuple):
+
+    start: int
+    end: int
+    outputs: T.List[str]
+    # ID of the target the outputs belong to, None for the commands of Meson
+    target: T.Optional[str]
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+class TargetMapper:
+
+    """Finds the target an output of the build belongs to."""
+
+    def __init__(self, builddir: str, targets: T.Dict[str, T.Dict[str, T.Any]]) -> None:
+        self.builddir = os.path.realpath(builddir)
+        self.outputs = {}  # type: T.Dict[str, str]
+        self.private_dirs = {}  # type: T.Dict[str, str]
+        for tid, t in targets.items():
+            for o in t['outputs']:
+                self.outputs[os.path.realpath(o)] = tid
+            if t['private_dir'] is not None:
+                self.private_dirs[t['private_dir']] = tid
+
+    def get_target(self, output: str) -> T.Optional[str]:
+        output = os.path.normpath(output)
+        tid = self.outputs.get(os.path.join(self.builddir, output))
+        d = os.path.dirname(output)
+        while d and tid is None:
+            tid = self.private_dirs.get(d)
+            d = os.path.dirname(d)
+        return tid
+
+def get_steps(builddir: str, targets: T.Dict[str, T.Dict[str, T.Any]]) -> T.List[Step]:
+    entries = ninjalog.read_log(ninjalog.get_log_file(builddir))
+    if not entries:
+        raise MesonException(f'No build log found in {builddir!r}, build the project first.')
+    mapper = TargetMapper(builddir, targets)
+    steps = []
+    for s in ninjalog.get_steps(ninjalog.last_build(entries)):
+        steps.append(Step(s.start, s.end, s.outputs, mapper.get_target(s.outputs[0])))
+    steps.sort(key=lambda s: (s.end, s.start))
+    return steps
+
+def get_wall_time(steps: T.List[Step]) -> int:
+    return max(s.end for s in steps) - min(s.start for s in steps)
+
+def get_parallelism(steps: T.List[Step]) -> T.Tuple[float, int]:
+    """Average and highest number of commands running at the same time."""
+    wall = get_wall_time(steps)
+    events = sorted([(s.start, 1) for s in steps] + [(s.end, -1) for s in steps])
+    running = highest = 0
+    for _, change in events:
+        running += change
+        highest = max(highest, running)
+    total = sum(s.duration for s in steps)
+    return (total / wall if wall else float(highest)), highest
+
+def get_critical_path(steps: T.List[Step], targets: T.Dict[str, T.Dict[str, T.Any]]) -> T.List[Step]:
+    """Steps the end of the build waited for, first to last.
+
+    `steps` must be sorted by end time.
+    """
+    closures = {}  # type: T.Dict[str, T.Set[str]]
+
+    def depends(tid: str) -> T.Set[str]:
+        if tid not in closures:
+            closure = {tid}
+            todo = [tid]
+            while todo:
+                for d in targets.get(todo.pop(), {}).get('depends', []):
+                    if d not in closure:
+                        closure.add(d)
+                        todo.append(d)
+            closures[tid] = closure
+        return closures[tid]
+
+    ends = [s.end for s in steps]
+    path = [steps[-1]]
+    while True:
+        current = path[-1]
+        allowed = depends(current.target) if current.target is not None else None
+        previous = None
+        for i in range(bisect.bisect_right(ends, current.start) - 1, -1, -1):
+            if allowed is None or steps[i].target in allowed:
+                previous = steps[i]
+                break
+        if previous is None:
+            break
+        path.append(previous)
+    path.reverse()
+    return path
+
+def get_trace(steps: T.List[Step], targets: T.Dict[str, T.Dict[str, T.Any]]) -> T.Dict[str, T.Any]:
+    """The steps in the Chrome trace event format, one row per job."""
+    events = []  # type: T.List[T.Dict[str, T.Any]]
+    rows = []  # type: T.List[int]
+    for s in sorted(steps, key=lambda s: (s.start, s.end)):
+        for row, end in enumerate(rows):
+            if end <= s.start:
+                rows[row] = s.end
+                break
+        else:
+            row = len(rows)
+            rows.append(s.end)
+        t = targets.get(s.target or '')
+        events.append({
+            'name': ' '.join(s.outputs),
+            'cat': t['name'] if t else 'meson',
+            'ph': 'X',
+            'ts': s.start * 1000,
+            'dur': s.duration * 1000,
+            'pid': 0,
+            'tid': row,
+            'args': {'target': s.target, 'subproject': t['subproject'] if t else None},
+        })
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+def analyze(steps: T.List[Step], targets: T.Dict[str, T.Dict[str, T.Any]], top: int) -> T.Dict[str, T.Any]:
+    per_target = {}  # type: T.Dict[T.Optional[str], T.List[int]]
+    per_subproject = {}  # type: T.Dict[T.Optional[str], int]
+    for s in steps:
+        times = per_target.setdefault(s.target, [0, 0])
+        times[0] += s.duration
+        times[1] += 1
+        subproject = targets[s.target]['subproject'] if s.target is not None else None
+        per_subproject[subproject] = per_subproject.get(subproject, 0) + s.duration
+
+    def target_info(tid: T.Optional[str]) -> T.Dict[str, T.Any]:
+        if tid is None:
+            return {'id': None, 'name': None, 'type': None, 'subproject': None}
+        t = targets[tid]
+        return {'id': tid, 'name': t['name'], 'type': t['type'], 'subproject': t['subproject']}
+
+    def step_info(s: Step) -> T.Dict[str, T.Any]:
+        return {'outputs': s.outputs, 'start': s.start / 1000, 'time': s.duration / 1000,
+                'target': s.target}
+
+    average, highest = get_parallelism(steps)
+    return {
+        'wall_time': get_wall_time(steps) / 1000,
+        'total_time': sum(s.duration for s in steps) / 1000,
+        'steps': len(steps),
+        'parallelism': {'average': average, 'highest': highest},
+        'critical_path': [step_info(s) for s in get_critical_path(steps, targets)],
+        'targets': [dict(target_info(tid), time=t / 1000, steps=n)
+                    for tid, (t, n) in sorted(per_target.items(), key=lambda i: -i[1][0])],
+        'subprojects': [{'name': sp, 'time': t / 1000}
+                        for sp, t in sorted(per_subproject.items(), key=lambda i: -i[1])],
+        'slowest_steps': [step_info(s) for s in sorted(steps, key=lambda s: -s.duration)[:top]],
+    }
+
+def print_report(report: T.Dict[str, T.Any], targets: T.Dict[str, T.Dict[str, T.Any]], top: int) -> None:
+    def target_name(tid: T.Optional[str]) -> str:
+        if tid is None:
+            return '(meson)'
+        t = targets[tid]
+        name = f'{t["name"]} ({t["type"]})'
+        return f'{t["subproject"]}:{name}' if t['subproject'] else name
+
+    wall = report['wall_time']
+    parallelism = report['parallelism']
+    print(f'{report["steps"]} commands ran in {wall:.2f} s, taking {report["total_time"]:.2f} s in total')
+    print(f'Parallelism: {parallelism["average"]:.1f} on average, {parallelism["highest"]} at most '
+          f'({100 * parallelism["average"] / max(parallelism["highest"], 1):.0f}% utilization)')
+
+    path = report['critical_path']
+    print(f'\nCritical path ({sum(s["time"] for s in path):.2f} s):')
+    for s in path:
+        print(f'{s["time"]:9.2f} s  {target_name(s["target"])}: {s["outputs"][0]}')
+
+    print('\nSlowest targets:')
+    for t in report['targets'][:top]:
+        share = 100 * t['time'] / report['total_time'] if report['total_time'] else 0
+        commands = 'command' if t['steps'] == 1 else 'commands'
+        print(f'{t["time"]:9.2f} s {share:4.0f}%  {target_name(t["id"])}, {t["steps"]} {commands}')
+
+    if any(sp['name'] is not None for sp in report['subprojects']):
+        print('\nSubprojects:')
+        for sp in report['subprojects'][:top]:
+            print(f'{sp["time"]:9.2f} s  {sp["name"] or "(main project)"}')
+
+    print('\nSlowest commands:')
+    for s in report['slowest_steps']:
+        print(f'{s["time"]:9.2f} s  {target_name(s["target"])}: {s["outputs"][0]}')
+
+def run(options: argparse.Namespace) -> int:
+    builddir = options.wd
+    if not os.path.isfile(os.path.join(builddir, 'meson-private', 'build.dat')):
+        raise MesonException(f'Directory {builddir!r} does not seem to be a Meson build directory.')
+    targets = buildgraph.load_targets(builddir)
+    steps = get_steps(builddir, targets)
+    if options.trace:
+        with open(options.trace, 'w', encoding='utf-8') as f:
+            json.dump(get_trace(steps, targets), f)
+    report = analyze(steps, targets, options.top)
+    if options.json:
+        print(json.dumps(report))
+    else:
+        print_report(report, targets, options.top)
+    return 0
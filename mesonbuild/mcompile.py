@@ -15,7 +15,6 @@
 """Entrypoint script for backend agnostic compile."""
 
 import os
-import json
 import re
 import sys
 import shutil
@@ -26,6 +25,7 @@ from pathlib import Path
 from . import mlog
 from . import mesonlib
 from . import coredata
+from . import mintro
 from .mesonlib import MesonException, RealPathAction, setup_vsenv
 from mesonbuild.environment import detect_ninja
 from mesonbuild.coredata import UserArrayOption
@@ -44,15 +44,19 @@ def validate_builddir(builddir: Path) -> None:
                              'It is also possible that the build directory was generated with an old\n'
                              'meson version. Please regenerate it in this case.')
 
-def parse_introspect_data(builddir: Path) -> T.Dict[str, T.List[dict]]:
+def parse_introspect_data(builddir: Path, names: T.Optional[T.Iterable[str]] = None) -> T.Dict[str, T.List[dict]]:
     """
     Converts a List of name-to-dict to a dict of name-to-dicts (since names are not unique)
+
+    If names is given, only the targets with one of these names are loaded.
     """
     path_to_intro = builddir / 'meson-info' / 'intro-targets.json'
     if not path_to_intro.exists():
         raise MesonException(f'`{path_to_intro.name}` is missing! Directory is not configured yet?')
-    with path_to_intro.open(encoding='utf-8') as f:
-        schema = json.load(f)
+    if names is None:
+        schema = mintro.load_targets(str(builddir))
+    else:
+        schema = [t for name in set(names) for t in mintro.load_targets(str(builddir), name)]
 
     parsed_data = defaultdict(list) # type: T.Dict[str, T.List[dict]]
     for target in schema:
@@ -153,7 +157,7 @@ def get_parsed_args_ninja(options: 'argparse.Namespace', builddir: Path) -> T.Tu
 
     # operands must be processed after options/option-arguments
     if options.targets:
-        intro_data = parse_introspect_data(builddir)
+        intro_data = parse_introspect_data(builddir, [ParsedTargetName(t).name for t in options.targets])
         for t in options.targets:
             cmd.extend(generate_target_names_ninja(ParsedTargetName(t), builddir, intro_data))
     if options.clean:
@@ -182,7 +186,7 @@ def get_parsed_args_vs(options: 'argparse.Namespace', builddir: Path) -> T.Tuple
     cmd = ['msbuild']
 
     if options.targets:
-        intro_data = parse_introspect_data(builddir)
+        intro_data = parse_introspect_data(builddir, [ParsedTargetName(t).name for t in options.targets])
         has_run_target = any(map(
             lambda t:
                 get_target_from_intro_data(ParsedTargetName(t), builddir, intro_data)['type'] == 'run',
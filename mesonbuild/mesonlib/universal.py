@@ -30,7 +30,7 @@ import uuid
 import textwrap
 import copy
 
-from mesonbuild import mlog
+from mesonbuild import mlog, profiler
 
 if T.TYPE_CHECKING:
     from .._typing import ImmutableListProtocol
@@ -74,6 +74,7 @@ __all__ = [
     'Version',
     'check_direntry_issues',
     'classify_unity_sources',
+    'copyfile_cow',
     'current_vs_supports_modules',
     'darwin_get_object_archs',
     'default_libdir',
@@ -132,6 +133,7 @@ __all__ = [
     'substitute_values',
     'substring_is_in_list',
     'typeslistify',
+    'user_cache_dir',
     'verbose_git',
     'version_compare',
     'version_compare_condition_with_min',
@@ -268,6 +270,8 @@ class HoldableObject(metaclass=abc.ABCMeta):
     ''' Dummy base class for all objects that can be
         held by an interpreter.baseobjects.ObjectHolder '''
 
+    __slots__ = ()
+
 class SecondLevelHolder(HoldableObject, metaclass=abc.ABCMeta):
     ''' A second level object holder. The primary purpose
         of such objects is to hold multiple objects with one
@@ -374,13 +378,32 @@ dot_C_dot_H_warning = """You are using .C or .H files in your project. This is d
          the /TP compiler flag, but this is unreliable.
          See https://github.com/mesonbuild/meson/pull/8747 for the discussions."""
 class File(HoldableObject):
+    __slots__ = ['is_built', 'subdir', 'fname', 'hash', '_relative_name', '_rel_to_builddir', '_absolute_path']
+
     def __init__(self, is_built: bool, subdir: str, fname: str):
         if fname.endswith(".C") or fname.endswith(".H"):
             mlog.warning(dot_C_dot_H_warning, once=True)
+        self._set_path(is_built, subdir, fname)
+
+    def _set_path(self, is_built: bool, subdir: str, fname: str) -> None:
         self.is_built = is_built
         self.subdir = subdir
         self.fname = fname
         self.hash = hash((is_built, subdir, fname))
+        self._relative_name = os.path.join(subdir, fname)
+        # The paths last returned by rel_to_builddir() and absolute_path(),
+        # with the directories they were computed for. They are the same
+        # for every call during a configuration.
+        self._rel_to_builddir = None  # type: T.Optional[T.Tuple[str, str]]
+        self._absolute_path = None  # type: T.Optional[T.Tuple[str, str, str]]
+
+    def __getstate__(self) -> T.Dict[str, T.Any]:
+        return {'is_built': self.is_built, 'subdir': self.subdir, 'fname': self.fname}
+
+    def __setstate__(self, state: T.Dict[str, T.Any]) -> None:
+        # String hashes differ between processes, so the hash is not
+        # pickled. Files pickled with it are still loaded.
+        self._set_path(state['is_built'], state['subdir'], state['fname'])
 
     def __str__(self) -> str:
         return self.relative_name()
@@ -407,19 +430,20 @@ class File(HoldableObject):
     def from_absolute_file(fname: str) -> 'File':
         return File(False, '', fname)
 
-    @lru_cache(maxsize=None)
     def rel_to_builddir(self, build_to_src: str) -> str:
         if self.is_built:
-            return self.relative_name()
-        else:
-            return os.path.join(build_to_src, self.subdir, self.fname)
+            return self._relative_name
+        cached = self._rel_to_builddir
+        if cached is None or cached[0] != build_to_src:
+            cached = self._rel_to_builddir = (build_to_src, os.path.join(build_to_src, self._relative_name))
+        return cached[1]
 
-    @lru_cache(maxsize=None)
     def absolute_path(self, srcdir: str, builddir: str) -> str:
-        absdir = srcdir
-        if self.is_built:
-            absdir = builddir
-        return os.path.join(absdir, self.relative_name())
+        cached = self._absolute_path
+        if cached is None or cached[0] != srcdir or cached[1] != builddir:
+            absdir = builddir if self.is_built else srcdir
+            cached = self._absolute_path = (srcdir, builddir, os.path.join(absdir, self._relative_name))
+        return cached[2]
 
     @property
     def suffix(self) -> str:
@@ -444,9 +468,8 @@ class File(HoldableObject):
     def __hash__(self) -> int:
         return self.hash
 
-    @lru_cache(maxsize=None)
     def relative_name(self) -> str:
-        return os.path.join(self.subdir, self.fname)
+        return self._relative_name
 
 
 def get_compiler_for_source(compilers: T.Iterable['Compiler'], src: 'FileOrString') -> 'Compiler':
@@ -1179,61 +1202,134 @@ def get_variable_regex(variable_format: str = 'meson') -> T.Pattern[str]:
         raise MesonException(f'Format "{variable_format}" not handled')
     return regex
 
-def do_conf_str(src: str, data: list, confdata: 'ConfigurationData', variable_format: str,
-                encoding: str = 'utf-8') -> T.Tuple[T.List[str], T.Set[str], bool]:
-    def line_is_valid(line: str, variable_format: str) -> bool:
-        if variable_format == 'meson':
-            if '#cmakedefine' in line:
-                return False
-        else: # cmake format
-            if '#mesondefine' in line:
-                return False
-        return True
+@lru_cache(maxsize=None)
+def _get_conf_regex(variable_format: str, check_format: bool) -> T.Pattern[str]:
+    # Matches, in a single pass over a template, everything do_conf_str()
+    # handles: define lines, escapes, variables and, if check_format is
+    # true, lines using the define of the other format.
+    if variable_format == 'meson':
+        define, other = '#mesondefine', '#cmakedefine'
+    else:
+        define, other = '#cmakedefine', '#mesondefine'
+    if variable_format in ['meson', 'cmake@']:
+        variables = r'(?P<escapes>(?:\\\\)+(?=\\?@))|\\@|@(?P<name>[-a-zA-Z0-9_]+)@'
+    elif variable_format == 'cmake':
+        variables = r'(?P<escapes>(?:\\\\)+(?=\\?\$))|\\\${|\${(?P<name>[-a-zA-Z0-9_]+)}'
+    else:
+        raise MesonException(f'Format "{variable_format}" not handled')
+    invalid = rf'|^(?P<invalid>(?!{define})[^\n]*{other}[^\n]*)' if check_format else ''
+    return re.compile(rf'^(?P<define>{define}[^\n]*\n?){invalid}|{variables}', re.MULTILINE)
 
-    regex = get_variable_regex(variable_format)
-
-    search_token = '#mesondefine'
-    if variable_format != 'meson':
-        search_token = '#cmakedefine'
-
-    result = []
-    missing_variables = set()
-    # Detect when the configuration data is empty and no tokens were found
-    # during substitution so we can warn the user to use the `copy:` kwarg.
-    confdata_useless = not confdata.keys()
-    for line in data:
-        if line.startswith(search_token):
-            confdata_useless = False
-            line = do_define(regex, line, confdata, variable_format)
-        else:
-            if not line_is_valid(line, variable_format):
-                raise MesonException(f'Format error in {src}: saw "{line.strip()}" when format set to "{variable_format}"')
-            line, missing = do_replacement(regex, line, variable_format, confdata)
-            missing_variables.update(missing)
-            if missing:
-                confdata_useless = False
-        result.append(line)
+class _ConfSubstitution:
 
-    return result, missing_variables, confdata_useless
+    """Substitute configure_file() templates with a single regex pass.
+
+    The values of the configuration data are converted to strings once,
+    instead of once per occurrence.
+    """
+
+    def __init__(self, src: str, confdata: 'ConfigurationData', variable_format: str):
+        self.src = src
+        self.confdata = confdata
+        self.variable_format = variable_format
+        self.variable_regex = get_variable_regex(variable_format)
+        self.start_tag = '${' if variable_format == 'cmake' else '@'
+        self.other_token = '#cmakedefine' if variable_format == 'meson' else '#mesondefine'
+        self.values = confdata.values
+        self.strings = {k: v if isinstance(v, str) else str(v)
+                        for k, (v, _) in self.values.items() if isinstance(v, (str, int))}
+        self.missing_variables = set()  # type: T.Set[str]
+        # Detect when the configuration data is empty and no tokens were found
+        # during substitution so we can warn the user to use the `copy:` kwarg.
+        self.confdata_useless = not self.values
+
+    def _replace(self, match: T.Match[str]) -> str:
+        kind = match.lastgroup
+        if kind == 'name':
+            varname = match.group('name')
+            try:
+                return self.strings[varname]
+            except KeyError:
+                pass
+            if varname in self.values:
+                var = self.values[varname][0]
+                raise MesonException(f'Tried to replace variable {varname!r} value with '
+                                     f'something other than a string or int: {var!r}')
+            self.missing_variables.add(varname)
+            self.confdata_useless = False
+            return ''
+        elif kind == 'escapes':
+            # Pairs of escape characters before '@' or '\@'
+            return '\\' * ((match.end() - match.start()) // 2)
+        elif kind == 'define':
+            self.confdata_useless = False
+            return self._define(match.group())
+        elif kind == 'invalid':
+            raise MesonException(f'Format error in {self.src}: saw "{match.group().strip()}" '
+                                 f'when format set to "{self.variable_format}"')
+        # Single escape character and '@'
+        return self.start_tag
+
+    def _define(self, line: str) -> str:
+        # Fast path for the common forms of #mesondefine, everything else
+        # goes through do_define().
+        arr = line.split()
+        if self.variable_format == 'meson' and len(arr) == 2:
+            varname = arr[1]
+            if varname not in self.values:
+                return f'/* #undef {varname} */\n'
+            v = self.values[varname][0]
+            if v is True:
+                return f'#define {varname}\n'
+            elif v is False:
+                return f'#undef {varname}\n'
+            elif isinstance(v, str) and '@' not in v and '\\' not in v:
+                return f'#define {varname} {v}\n'
+        return do_define(self.variable_regex, line, self.confdata, self.variable_format)
+
+    def substitute(self, text: str) -> str:
+        regex = _get_conf_regex(self.variable_format, self.other_token in text)
+        return regex.sub(self._replace, text)
+
+    def substitute_lines(self, lines: T.List[str]) -> str:
+        text = ''.join(lines)
+        if text.count('\r') != text.count('\r\n'):
+            # Lines ending with a lone carriage return are not seen as lines
+            # by the regex, substitute them one by one.
+            return ''.join(self.substitute(line) for line in lines)
+        return self.substitute(text)
+
+def do_conf_str(src: str, data: list, confdata: 'ConfigurationData', variable_format: str,
+                encoding: str = 'utf-8') -> T.Tuple[T.List[str], T.Set[str], bool]:
+    subst = _ConfSubstitution(src, confdata, variable_format)
+    result = [subst.substitute(line) for line in data]
+    return result, subst.missing_variables, subst.confdata_useless
 
 def do_conf_file(src: str, dst: str, confdata: 'ConfigurationData', variable_format: str,
                  encoding: str = 'utf-8') -> T.Tuple[T.Set[str], bool]:
+    subst = _ConfSubstitution(src, confdata, variable_format)
     try:
-        with open(src, encoding=encoding, newline='') as f:
-            data = f.readlines()
+        fin = open(src, encoding=encoding, newline='')
     except Exception as e:
         raise MesonException(f'Could not read input file {src}: {e!s}')
-
-    (result, missing_variables, confdata_useless) = do_conf_str(src, data, confdata, variable_format, encoding)
+    # The template is substituted and written a chunk of whole lines at a
+    # time, so that large templates are never held in memory.
     dst_tmp = dst + '~'
     try:
-        with open(dst_tmp, 'w', encoding=encoding, newline='') as f:
-            f.writelines(result)
+        with fin, open(dst_tmp, 'w', encoding=encoding, newline='') as fout:
+            for lines in iter(lambda: fin.readlines(1 << 16), []):
+                fout.write(subst.substitute_lines(lines))
     except Exception as e:
+        if os.path.exists(dst_tmp):
+            os.unlink(dst_tmp)
+        if isinstance(e, MesonException):
+            raise
+        elif isinstance(e, UnicodeDecodeError):
+            raise MesonException(f'Could not read input file {src}: {e!s}')
         raise MesonException(f'Could not write output file {dst}: {e!s}')
-    shutil.copymode(src, dst_tmp)
     replace_if_different(dst, dst_tmp)
-    return missing_variables, confdata_useless
+    shutil.copymode(src, dst)
+    return subst.missing_variables, subst.confdata_useless
 
 CONF_C_PRELUDE = '''/*
  * Autogenerated by the Meson build system.
@@ -1295,9 +1391,15 @@ def replace_if_different(dst: str, dst_tmp: str) -> None:
     # unnecessary rebuilds.
     different = True
     try:
-        with open(dst, 'rb') as f1, open(dst_tmp, 'rb') as f2:
-            if f1.read() == f2.read():
-                different = False
+        if os.path.getsize(dst) == os.path.getsize(dst_tmp):
+            with open(dst, 'rb') as f1, open(dst_tmp, 'rb') as f2:
+                while True:
+                    chunk = f1.read(1 << 16)
+                    if chunk != f2.read(1 << 16):
+                        break
+                    if not chunk:
+                        different = False
+                        break
     except FileNotFoundError:
         pass
     if different:
@@ -1389,6 +1491,16 @@ def Popen_safe(args: T.List[str], write: T.Optional[str] = None,
                stdout: T.Union[T.TextIO, T.BinaryIO, int] = subprocess.PIPE,
                stderr: T.Union[T.TextIO, T.BinaryIO, int] = subprocess.PIPE,
                **kwargs: T.Any) -> T.Tuple['subprocess.Popen[str]', str, str]:
+    if profiler.current is not None:
+        with profiler.current.frame(os.path.basename(str(args[0])), 'command', {'command': join_args(str(a) for a in args)}):
+            return _Popen_safe(args, write=write, stdout=stdout, stderr=stderr, **kwargs)
+    return _Popen_safe(args, write=write, stdout=stdout, stderr=stderr, **kwargs)
+
+
+def _Popen_safe(args: T.List[str], write: T.Optional[str] = None,
+                stdout: T.Union[T.TextIO, T.BinaryIO, int] = subprocess.PIPE,
+                stderr: T.Union[T.TextIO, T.BinaryIO, int] = subprocess.PIPE,
+                **kwargs: T.Any) -> T.Tuple['subprocess.Popen[str]', str, str]:
     import locale
     encoding = locale.getpreferredencoding()
     # Redirect stdin to DEVNULL otherwise the command run by us here might mess
@@ -1659,6 +1771,34 @@ def windows_proof_rm(fpath: str) -> None:
     os.unlink(fpath)
 
 
+def user_cache_dir() -> str:
+    """Directory for data Meson shares between all projects and build dirs."""
+    if os.environ.get('MESON_CACHE_DIR'):
+        return os.environ['MESON_CACHE_DIR']
+    if is_windows() and 'LOCALAPPDATA' in os.environ:
+        return os.path.join(os.environ['LOCALAPPDATA'], 'meson', 'cache')
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache_home, 'meson')
+
+
+# From linux/fs.h
+_FICLONE = 0x40049409
+
+def copyfile_cow(src: str, dst: str) -> None:
+    """Like shutil.copy2, but shares the data blocks of src with dst when the
+    filesystem supports copy-on-write clones (btrfs, xfs, ...)."""
+    if is_linux():
+        import fcntl
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+
+
 class TemporaryDirectoryWinProof(TemporaryDirectory):
     """
     Like TemporaryDirectory, but cleans things up using
@@ -2015,10 +2155,12 @@ _BUILTIN_NAMES = {
     'strip',
     'unity',
     'unity_size',
+    'unity_partition',
     'warning_level',
     'werror',
     'wrap_mode',
     'force_fallback_for',
+    'wrap_prefetch',
     'pkg_config_path',
     'cmake_prefix_path',
 }
@@ -21,7 +21,7 @@ project files and don't need this info."""
 
 import collections
 import json
-from . import build, coredata as cdata
+from . import build, buildgraph, coredata as cdata
 from . import mesonlib
 from .ast import IntrospectionInterpreter, build_target_functions, AstConditionLevel, AstIDGenerator, AstIndentationGenerator, AstJSONPrinter
 from . import mlog
@@ -47,7 +47,7 @@ def get_meson_introspection_required_version() -> T.List[str]:
 class IntroCommand:
     def __init__(self,
                  desc: str,
-                 func: T.Optional[T.Callable[[], T.Union[dict, list]]] = None,
+                 func: T.Optional[T.Callable[[], T.Union[dict, list, T.Iterator[T.Any]]]] = None,
                  no_bd: T.Optional[T.Callable[[IntrospectionInterpreter], T.Union[dict, list]]] = None) -> None:
         self.desc = desc + '.'
         self.func = func
@@ -76,7 +76,7 @@ def get_meson_introspection_types(coredata: T.Optional[cdata.CoreData] = None,
         ('installed', IntroCommand('List all installed files and directories', func=lambda: list_installed(installdata))),
         ('install_plan', IntroCommand('List all installed files and directories with their details', func=lambda: list_install_plan(installdata))),
         ('projectinfo', IntroCommand('Information about projects', func=lambda: list_projinfo(builddata), no_bd=list_projinfo_from_source)),
-        ('targets', IntroCommand('List top level targets', func=lambda: list_targets(builddata, installdata, backend), no_bd=list_targets_from_source)),
+        ('targets', IntroCommand('List top level targets', func=lambda: iter_targets(builddata, installdata, backend), no_bd=list_targets_from_source)),
         ('tests', IntroCommand('List all unit tests', func=lambda: list_tests(testdata))),
     ])
 
@@ -94,6 +94,17 @@ def add_arguments(parser: argparse.ArgumentParser) -> None:
                         help='Enable pretty printed JSON.')
     parser.add_argument('-f', '--force-object-output', action='store_true', dest='force_dict', default=False,
                         help='Always use the new JSON format for multiple entries (even for 0 and 1 introspection commands)')
+    parser.add_argument('--name', dest='target_name', metavar='NAME', default=None,
+                        help='Only list targets with this name (implies --targets).')
+    parser.add_argument('--type', dest='target_type', metavar='TYPE', default=None,
+                        help='Only list targets of this type, such as executable or shared_library (implies --targets).')
+    parser.add_argument('--subproject', dest='subproject', metavar='NAME', default=None,
+                        help='Only list targets of this subproject, an empty name selects the main project (implies --targets).')
+    parser.add_argument('--fields', dest='fields', type=lambda x: [f.strip() for f in x.split(',') if f.strip()], default=None,
+                        help='Comma separated list of the keys to print for each target (implies --targets).')
+    parser.add_argument('--affected', dest='affected', metavar='FILE', nargs='+', type=os.path.abspath, default=None,
+                        help='List the targets, tests and benchmarks affected by changes to the given files, '
+                             'which must come after the build directory.')
     parser.add_argument('builddir', nargs='?', default='.', help='The build directory')
 
 def dump_ast(intr: IntrospectionInterpreter) -> T.Dict[str, T.Any]:
@@ -209,7 +220,9 @@ def list_targets_from_source(intr: IntrospectionInterpreter) -> T.List[T.Dict[st
     return tlist
 
 def list_targets(builddata: build.Build, installdata: backends.InstallData, backend: backends.Backend) -> T.List[T.Any]:
-    tlist = []  # type: T.List[T.Any]
+    return list(iter_targets(builddata, installdata, backend))
+
+def iter_targets(builddata: build.Build, installdata: backends.InstallData, backend: backends.Backend) -> T.Iterator[T.Dict[str, T.Any]]:
     build_dir = builddata.environment.get_build_dir()
     src_dir = builddata.environment.get_source_dir()
 
@@ -243,8 +256,7 @@ def list_targets(builddata: build.Build, installdata: backends.InstallData, back
             t['install_filename'] = [x for sublist in ifn for x in sublist]  # flatten the list
         else:
             t['installed'] = False
-        tlist.append(t)
-    return tlist
+        yield t
 
 def list_buildoptions_from_source(intr: IntrospectionInterpreter) -> T.List[T.Dict[str, T.Union[str, bool, int, T.List[str]]]]:
     subprojects = [i['name'] for i in intr.project_data['subprojects']]
@@ -375,6 +387,28 @@ def list_tests(testdata: T.List[backends.TestSerialisation]) -> T.List[T.Dict[st
 def list_benchmarks(benchdata: T.List[backends.TestSerialisation]) -> T.List[T.Dict[str, T.Union[str, int, T.List[str], T.Dict[str, str]]]]:
     return get_test_list(benchdata)
 
+def list_affected(builddir: str, files: T.List[str]) -> T.Dict[str, T.List[T.Any]]:
+    graph = buildgraph.load_graph(builddir)
+    target_ids = graph.affected_targets(files)
+    affected = set(target_ids)
+    result = {
+        'targets': [{'id': tid,
+                     'name': graph.targets[tid]['name'],
+                     'type': graph.targets[tid]['type'],
+                     'subproject': graph.targets[tid]['subproject']}
+                    for tid in target_ids]
+    }  # type: T.Dict[str, T.List[T.Any]]
+    for kind in ('tests', 'benchmarks'):
+        # A dict is used as an ordered set, tests of subprojects can share names
+        names = {}  # type: T.Dict[str, None]
+        # Tests affected through the files their command uses
+        by_file = {name for _, name in graph.affected_tests(files, kind)}
+        for t in load_info_file(get_infodir(builddir), kind):
+            if affected.intersection(t['depends']) or t['name'] in by_file:
+                names[t['name']] = None
+        result[kind] = list(names)
+    return result
+
 def list_projinfo(builddata: build.Build) -> T.Dict[str, T.Union[str, T.List[T.Dict[str, str]]]]:
     result = {'version': builddata.project_version,
               'descriptive_name': builddata.project_name,
@@ -430,6 +464,68 @@ def load_info_file(infodir: str, kind: T.Optional[str] = None) -> T.Any:
     with open(get_info_file(infodir, kind), encoding='utf-8') as fp:
         return json.load(fp)
 
+TARGETS_INDEX_VERSION = 1
+
+def get_targets_index_file(private_dir: str) -> str:
+    return os.path.join(private_dir, 'intro-targets-index.json')
+
+def write_targets_index(targets_file: str, index_file: str, entries: T.List[T.Dict[str, T.Any]]) -> None:
+    """Write where every target is stored in intro-targets.json.
+
+    The index records the size and modification time of the targets file
+    it describes, so that a stale index is never used.
+    """
+    st = os.stat(targets_file)
+    data = {
+        'version': TARGETS_INDEX_VERSION,
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'targets': entries,
+    }
+    write_if_changed(index_file, index_file + '~', [json.dumps(data)])
+
+def target_matches(target: T.Dict[str, T.Any], name: T.Optional[str] = None,
+                   target_type: T.Optional[str] = None, subproject: T.Optional[str] = None) -> bool:
+    # Types are accepted with underscores too, as in `meson compile`
+    return ((name is None or target['name'] == name) and
+            (target_type is None or target['type'].replace(' ', '_') == target_type.replace(' ', '_')) and
+            (subproject is None or (target['subproject'] or '') == subproject))
+
+def load_targets(builddir: str, name: T.Optional[str] = None, target_type: T.Optional[str] = None,
+                 subproject: T.Optional[str] = None) -> T.List[T.Dict[str, T.Any]]:
+    """Load the targets matching all of the given filters.
+
+    Only the matching targets are read from intro-targets.json when its
+    index is up to date, otherwise the whole file is parsed. An empty
+    subproject selects the targets of the main project.
+    """
+    targets_file = get_info_file(get_infodir(builddir), 'targets')
+    try:
+        with open(get_targets_index_file(os.path.join(builddir, 'meson-private')), encoding='utf-8') as fp:
+            index = json.load(fp)
+        st = os.stat(targets_file)
+        valid = (index['version'] == TARGETS_INDEX_VERSION and index['size'] == st.st_size
+                 and index['mtime_ns'] == st.st_mtime_ns)
+    except (OSError, ValueError, KeyError, TypeError):
+        valid = False
+
+    if not valid:
+        with open(targets_file, encoding='utf-8') as fp:
+            return [t for t in json.load(fp) if target_matches(t, name, target_type, subproject)]
+
+    result = []  # type: T.List[T.Dict[str, T.Any]]
+    with open(targets_file, 'rb') as f:
+        for entry in index['targets']:
+            if target_matches(entry, name, target_type, subproject):
+                f.seek(entry['offset'])
+                result.append(json.loads(f.read(entry['length']).decode('utf-8')))
+    return result
+
+def select_fields(targets: T.List[T.Dict[str, T.Any]], fields: T.Optional[T.List[str]]) -> T.List[T.Dict[str, T.Any]]:
+    if not fields:
+        return targets
+    return [{k: v for k, v in t.items() if k in fields} for t in targets]
+
 def run(options: argparse.Namespace) -> int:
     datadir = 'meson-private'
     infodir = get_infodir(options.builddir)
@@ -439,8 +535,14 @@ def run(options: argparse.Namespace) -> int:
     results = []  # type: T.List[T.Tuple[str, T.Union[dict, T.List[T.Any]]]]
     sourcedir = '.' if options.builddir == 'meson.build' else options.builddir[:-11]
     intro_types = get_meson_introspection_types(sourcedir=sourcedir)
+    target_filters = (options.target_name, options.target_type, options.subproject)
+    if options.fields or any(f is not None for f in target_filters):
+        options.targets = True
 
     if 'meson.build' in [os.path.basename(options.builddir), options.builddir]:
+        if options.affected:
+            print('--affected needs a configured build directory.')
+            return 1
         # Make sure that log entries in other parts of meson don't interfere with the JSON output
         mlog.disable()
         backend = backends.get_backend_from_name(options.backend)
@@ -452,7 +554,10 @@ def run(options: argparse.Namespace) -> int:
         for key, val in intro_types.items():
             if (not options.all and not getattr(options, key, False)) or not val.no_bd:
                 continue
-            results += [(key, val.no_bd(intr))]
+            data = val.no_bd(intr)
+            if key == 'targets':
+                data = select_fields([t for t in data if target_matches(t, *target_filters)], options.fields)
+            results += [(key, data)]
         return print_results(options, results, indent)
 
     try:
@@ -483,37 +588,136 @@ def run(options: argparse.Namespace) -> int:
         if not options.all and not getattr(options, i, False):
             continue
         try:
-            results += [(i, load_info_file(infodir, i))]
+            if i == 'targets' and any(f is not None for f in target_filters):
+                results += [(i, select_fields(load_targets(options.builddir, *target_filters), options.fields))]
+            elif i == 'targets' and options.fields:
+                results += [(i, select_fields(load_info_file(infodir, i), options.fields))]
+            else:
+                results += [(i, load_info_file(infodir, i))]
         except FileNotFoundError:
             print('Introspection file {} does not exist.'.format(get_info_file(infodir, i)))
             return 1
 
+    if options.affected:
+        results += [('affected', list_affected(options.builddir, options.affected))]
+
     return print_results(options, results, indent)
 
 updated_introspection_files = []  # type: T.List[str]
 
-def write_intro_info(intro_info: T.Sequence[T.Tuple[str, T.Union[dict, T.List[T.Any]]]], info_dir: str) -> None:
+def encode_intro_data(data: T.Union[dict, T.List[T.Any], T.Iterator[T.Any]],
+                      on_item: T.Optional[T.Callable[[T.Any, int, int], None]] = None) -> T.Iterator[str]:
+    """Encode introspection data as JSON, in chunks.
+
+    Lists and dicts are encoded at once. Iterators, such as the one
+    returned by iter_targets(), are encoded one element at a time so that
+    the whole section never has to be held in memory. The output is the
+    same as json.dumps() of the equivalent list.
+
+    For iterators, on_item is called with every element and the offset and
+    length of its encoding in the output, in bytes.
+    """
+    if isinstance(data, (dict, list)):
+        yield json.dumps(data)
+        return
+    sep = '['
+    offset = 0
+    for item in data:
+        # json.dumps() escapes all non-ASCII characters, so the length of
+        # the string is its length in bytes.
+        encoded = json.dumps(item)
+        if on_item is not None:
+            on_item(item, offset + len(sep), len(encoded))
+        offset += len(sep) + len(encoded)
+        yield sep + encoded
+        sep = ', '
+    yield '[]' if sep == '[' else ']'
+
+def write_if_changed(out_file: str, tmp_file: str, chunks: T.Iterable[str]) -> bool:
+    """Write chunks to out_file, unless it already has exactly this content.
+
+    The new content is compared with the existing file while it is being
+    generated, and nothing is written at all as long as they match. An
+    unchanged file keeps its modification time, so that tools watching the
+    build directory do not reload it.
+
+    Returns whether the file was written.
+    """
+    try:
+        old = open(out_file, 'rb')  # type: T.Optional[T.BinaryIO]
+    except FileNotFoundError:
+        old = None
+    fp = None  # type: T.Optional[T.BinaryIO]
+    matched = 0
+
+    def start_writing() -> T.BinaryIO:
+        f = open(tmp_file, 'wb')
+        if old is not None and matched:
+            # Copy the part that was identical so far
+            old.seek(0)
+            remaining = matched
+            while remaining:
+                block = old.read(min(remaining, 1024 * 1024))
+                f.write(block)
+                remaining -= len(block)
+        return f
+
+    try:
+        for chunk in chunks:
+            data = chunk.encode('utf-8')
+            if fp is None:
+                if old is not None and old.read(len(data)) == data:
+                    matched += len(data)
+                    continue
+                fp = start_writing()
+            fp.write(data)
+        if fp is None:
+            if old is not None and not old.read(1):
+                return False
+            fp = start_writing()
+    finally:
+        if old is not None:
+            old.close()
+        if fp is not None:
+            fp.close()
+    os.replace(tmp_file, out_file)
+    return True
+
+def write_intro_info(intro_info: T.Sequence[T.Tuple[str, T.Union[dict, T.List[T.Any], T.Iterator[T.Any]]]], info_dir: str,
+                     private_dir: T.Optional[str] = None) -> None:
     global updated_introspection_files
     for kind, data in intro_info:
         out_file = os.path.join(info_dir, f'intro-{kind}.json')
         tmp_file = os.path.join(info_dir, 'tmp_dump.json')
-        with open(tmp_file, 'w', encoding='utf-8') as fp:
-            json.dump(data, fp)
-            fp.flush() # Not sure if this is needed
-        os.replace(tmp_file, out_file)
-        updated_introspection_files += [kind]
+        entries = []  # type: T.List[T.Dict[str, T.Any]]
+
+        def add_entry(target: T.Dict[str, T.Any], offset: int, length: int) -> None:
+            entries.append({
+                'name': target['name'],
+                'type': target['type'],
+                'subproject': target['subproject'],
+                'offset': offset,
+                'length': length,
+            })
+
+        index = private_dir is not None and kind == 'targets' and not isinstance(data, (dict, list))
+        if write_if_changed(out_file, tmp_file, encode_intro_data(data, add_entry if index else None)):
+            updated_introspection_files += [kind]
+        if index:
+            write_targets_index(out_file, get_targets_index_file(private_dir), entries)
 
 def generate_introspection_file(builddata: build.Build, backend: backends.Backend) -> None:
     coredata = builddata.environment.get_coredata()
     intro_types = get_meson_introspection_types(coredata=coredata, builddata=builddata, backend=backend)
-    intro_info = []  # type: T.List[T.Tuple[str, T.Union[dict, T.List[T.Any]]]]
+    intro_info = []  # type: T.List[T.Tuple[str, T.Union[dict, T.List[T.Any], T.Iterator[T.Any]]]]
 
     for key, val in intro_types.items():
         if not val.func:
             continue
         intro_info += [(key, val.func())]
 
-    write_intro_info(intro_info, builddata.environment.info_dir)
+    write_intro_info(intro_info, builddata.environment.info_dir, builddata.environment.get_scratch_dir())
+    buildgraph.write_graph(builddata, backend)
 
 def update_build_options(coredata: cdata.CoreData, info_dir: str) -> None:
     intro_info = [
@@ -21,6 +21,7 @@ import os
 import subprocess
 import textwrap
 import typing as T
+import xml.etree.ElementTree as ET
 
 from . import ExtensionModule
 from . import GResourceTarget, GResourceHeaderTarget, GirTarget, TypelibTarget, VapiTarget
@@ -160,6 +161,49 @@ gresource_dep_needed_version = '>= 2.51.1'
 
 native_glib_version = None
 
+# Values of the "preprocess" attribute of <file> elements that do not change
+# the list of files a resource manifest depends on.
+GRESOURCE_PREPROCESS_OPTIONS = {'xml-stripblanks', 'json-stripblanks', 'to-pixdata'}
+
+# Files listed by a resource manifest, keyed by its path and cached as long
+# as its modification time and size do not change.
+_gresource_manifests: T.Dict[str, T.Tuple[T.Tuple[int, int], T.Optional[T.List[str]]]] = {}
+
+def parse_gresource_manifest(path: str) -> T.Optional[T.List[str]]:
+    """Return the files listed in a .gresource.xml manifest, in order.
+
+    None is returned when a file uses a preprocessing option this parser does
+    not know about, glib-compile-resources must then be used instead.
+    """
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        raise MesonException(f'Could not read resource manifest "{path}": {e.strerror}')
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _gresource_manifests.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    try:
+        root = ET.parse(path).getroot()
+    except ET.ParseError as e:
+        raise MesonException(f'Could not parse resource manifest "{path}": {e}')
+    if root.tag != 'gresources':
+        raise MesonException(f'Resource manifest "{path}" does not have a <gresources> root element')
+
+    files: T.List[str] = []
+    for element in root.iterfind('gresource/file'):
+        preprocess = {o.strip() for o in element.get('preprocess', '').split(',')} - {''}
+        if not preprocess <= GRESOURCE_PREPROCESS_OPTIONS:
+            _gresource_manifests[path] = (stamp, None)
+            return None
+        fname = (element.text or '').strip()
+        if fname and fname not in files:
+            files.append(fname)
+
+    _gresource_manifests[path] = (stamp, files)
+    return files
+
 class GnomeModule(ExtensionModule):
     def __init__(self, interpreter: 'Interpreter') -> None:
         super().__init__(interpreter)
@@ -423,22 +467,16 @@ class GnomeModule(ExtensionModule):
         rv = [target_c, target_h]
         return ModuleReturnValue(rv, rv)
 
-    def _get_gresource_dependencies(
-            self, state: 'ModuleState', input_file: str, source_dirs: T.List[str],
-            dependencies: T.Sequence[T.Union[mesonlib.File, build.CustomTarget, build.CustomTargetIndex]]
-            ) -> T.Tuple[T.List[mesonlib.FileOrString], T.List[T.Union[build.CustomTarget, build.CustomTargetIndex]], T.List[str]]:
-
+    @staticmethod
+    def _run_gresource_dependencies(input_file: str, sourcedirs: T.List[str], srcdir: str) -> T.List[str]:
         cmd = ['glib-compile-resources',
                input_file,
                '--generate-dependencies']
-
-        # Prefer generated files over source files
-        cmd += ['--sourcedir', state.subdir] # Current build dir
-        for source_dir in source_dirs:
-            cmd += ['--sourcedir', os.path.join(state.subdir, source_dir)]
+        for source_dir in sourcedirs:
+            cmd += ['--sourcedir', source_dir]
 
         try:
-            pc, stdout, stderr = Popen_safe(cmd, cwd=state.environment.get_source_dir())
+            pc, stdout, stderr = Popen_safe(cmd, cwd=srcdir)
         except (FileNotFoundError, PermissionError):
             raise MesonException('Could not execute glib-compile-resources.')
         if pc.returncode != 0:
@@ -446,7 +484,32 @@ class GnomeModule(ExtensionModule):
             mlog.warning(m)
             raise subprocess.CalledProcessError(pc.returncode, cmd)
 
-        raw_dep_files: T.List[str] = stdout.split('\n')[:-1]
+        return stdout.split('\n')[:-1]
+
+    def _get_gresource_dependencies(
+            self, state: 'ModuleState', input_file: str, source_dirs: T.List[str],
+            dependencies: T.Sequence[T.Union[mesonlib.File, build.CustomTarget, build.CustomTargetIndex]]
+            ) -> T.Tuple[T.List[mesonlib.FileOrString], T.List[T.Union[build.CustomTarget, build.CustomTargetIndex]], T.List[str]]:
+
+        # Prefer generated files over source files
+        sourcedirs = [state.subdir] # Current build dir
+        sourcedirs += [os.path.join(state.subdir, d) for d in source_dirs]
+
+        srcdir = state.environment.get_source_dir()
+        listed = parse_gresource_manifest(os.path.join(srcdir, input_file))
+        if listed is not None:
+            raw_dep_files: T.List[str] = []
+            for name in listed:
+                # Like glib-compile-resources, use the first source dir the
+                # file exists in, or the name as listed if there is none.
+                for d in sourcedirs:
+                    candidate = os.path.join(d, name)
+                    if os.path.exists(os.path.join(srcdir, candidate)):
+                        name = candidate
+                        break
+                raw_dep_files.append(name)
+        else:
+            raw_dep_files = self._run_gresource_dependencies(input_file, sourcedirs, srcdir)
 
         depends: T.List[T.Union[build.CustomTarget, build.CustomTargetIndex]] = []
         subdirs: T.List[str] = []
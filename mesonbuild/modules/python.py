@@ -13,7 +13,9 @@
 # limitations under the License.
 
 from pathlib import Path
+import copy
 import functools
+import hashlib
 import json
 import os
 import shutil
@@ -334,6 +336,74 @@ print(json.dumps({
 }))
 '''
 
+# Modules may print when they are imported, only the result goes to stdout.
+MODULES_COMMAND = '''\
+import importlib
+import json
+import sys
+
+stdout, sys.stdout = sys.stdout, sys.stderr
+found = []
+for mod in sys.argv[1:]:
+    try:
+        importlib.import_module(mod)
+    except BaseException:
+        continue
+    found.append(mod)
+stdout.write(json.dumps(found))
+'''
+
+# Introspection results by installation key, shared by all subprojects. They
+# are also saved in the private directory to be reused on reconfigure.
+_INTROSPECTION_CACHE = {}  # type: T.Dict[str, PythonIntrospectionDict]
+INTROSPECTION_CACHE_FILE = 'python-introspection.json'
+
+def introspection_key(command: T.List[str]) -> T.Optional[str]:
+    '''
+    Identify a python installation without running it. Returns None if the
+    interpreter cannot be found.
+    '''
+    exe = command[0] if os.path.isabs(command[0]) else shutil.which(command[0])
+    if not exe:
+        return None
+    try:
+        st = os.stat(exe)
+    except OSError:
+        return None
+    # A virtualenv interpreter is usually a symlink to the base one, it is
+    # told apart by the configuration file next to it.
+    venv_cfgs = []
+    for d in (os.path.dirname(exe), os.path.dirname(os.path.dirname(exe))):
+        cfg = os.path.join(d, 'pyvenv.cfg')
+        if os.path.isfile(cfg):
+            venv_cfgs.append([cfg, os.stat(cfg).st_mtime_ns])
+    # Cross builds pick the sysconfig data with _PYTHON_SYSCONFIGDATA_NAME
+    # and _PYTHON_HOST_PLATFORM.
+    env = sorted((k, v) for k, v in os.environ.items()
+                 if k.startswith(('PYTHON', '_PYTHON', 'DEB_PYTHON', 'SETUPTOOLS_')))
+    data = json.dumps([command, exe, st.st_mtime_ns, st.st_size, venv_cfgs, env])
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def _read_introspection_cache(filename: str) -> T.Dict[str, 'PythonIntrospectionDict']:
+    try:
+        with open(filename, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+def _write_introspection_cache(filename: str, key: str, info: 'PythonIntrospectionDict') -> None:
+    cache = _read_introspection_cache(filename)
+    cache[key] = info
+    tempfilename = filename + '~'
+    try:
+        with open(tempfilename, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tempfilename, filename)
+    except OSError as e:
+        mlog.debug(f'Could not save python introspection cache: {e}')
+
+
 if T.TYPE_CHECKING:
     class PythonIntrospectionDict(TypedDict):
 
@@ -378,30 +448,67 @@ class PythonExternalProgram(ExternalProgram):
             return mesonlib.version_compare(version, '>= 3.0')
         return True
 
-    def sanity(self, state: T.Optional['ModuleState'] = None) -> bool:
-        # Sanity check, we expect to have something that at least quacks in tune
+    def _introspect(self) -> T.Optional['PythonIntrospectionDict']:
         cmd = self.get_command() + ['-c', INTROSPECT_COMMAND]
         p, stdout, stderr = mesonlib.Popen_safe(cmd)
         try:
             info = json.loads(stdout)
         except json.JSONDecodeError:
-            info = None
             mlog.debug('Could not introspect Python (%s): exit code %d' % (str(p.args), p.returncode))
             mlog.debug('Program stdout:\n')
             mlog.debug(stdout)
             mlog.debug('Program stderr:\n')
             mlog.debug(stderr)
+            return None
+        variables = info['variables']
+        info['suffix'] = variables.get('EXT_SUFFIX') or variables.get('SO') or variables.get('.so')
+        return T.cast('PythonIntrospectionDict', info)
+
+    def _cached_introspect(self, state: T.Optional['ModuleState']) -> T.Optional['PythonIntrospectionDict']:
+        key = introspection_key(self.get_command())
+        if key is None:
+            return self._introspect()
+        info = _INTROSPECTION_CACHE.get(key)
+        if info is not None:
+            return copy.deepcopy(info)
+        cache_file = None
+        if state is not None:
+            cache_file = os.path.join(state.environment.get_scratch_dir(), INTROSPECTION_CACHE_FILE)
+            info = _read_introspection_cache(cache_file).get(key)
+        if info is None:
+            info = self._introspect()
+            if info is None:
+                return None
+            if cache_file is not None:
+                _write_introspection_cache(cache_file, key, info)
+        _INTROSPECTION_CACHE[key] = info
+        return copy.deepcopy(info)
 
+    def sanity(self, state: T.Optional['ModuleState'] = None) -> bool:
+        # Sanity check, we expect to have something that at least quacks in tune
+        info = self._cached_introspect(state)
         if info is not None and self._check_version(info['version']):
-            variables = info['variables']
-            info['suffix'] = variables.get('EXT_SUFFIX') or variables.get('SO') or variables.get('.so')
-            self.info = T.cast('PythonIntrospectionDict', info)
+            self.info = info
             self.platlib = self._get_path(state, 'platlib')
             self.purelib = self._get_path(state, 'purelib')
             return True
         else:
             return False
 
+    def find_modules(self, modules: T.List[str]) -> T.List[str]:
+        """Return the modules that can be imported, checked in a single process."""
+        p, stdout, _ = mesonlib.Popen_safe(self.get_command() + ['-c', MODULES_COMMAND] + modules)
+        try:
+            found = json.loads(stdout)
+        except json.JSONDecodeError:
+            found = None
+        if p.returncode == 0 and isinstance(found, list):
+            return found
+        # Importing one of the modules killed the interpreter, check them
+        # one by one.
+        return [mod for mod in modules
+                if mesonlib.Popen_safe(self.get_command() + ['-c', f'import {mod}'])[0].returncode == 0]
+
     def _get_path(self, state: T.Optional['ModuleState'], key: str) -> None:
         rel_path = self.info['install_paths'][key][1:]
         if not state:
@@ -677,14 +784,12 @@ class PythonModule(ExtensionModule):
                 python = PythonExternalProgram('python')
 
         if python.found() and want_modules:
+            importable = python.find_modules(want_modules)
             for mod in want_modules:
-                p, *_ = mesonlib.Popen_safe(
-                    python.command +
-                    ['-c', f'import {mod}'])
-                if p.returncode != 0:
-                    missing_modules.append(mod)
-                else:
+                if mod in importable:
                     found_modules.append(mod)
+                else:
+                    missing_modules.append(mod)
 
         msg: T.List['mlog.TV_Loggable'] = ['Program', python.name]
         if want_modules:
@@ -88,6 +88,8 @@ class BlockParseException(MesonException):
 TV_TokenTypes = T.TypeVar('TV_TokenTypes', int, str, bool)
 
 class Token(T.Generic[TV_TokenTypes]):
+    __slots__ = ['tid', 'filename', 'line_start', 'lineno', 'colno', 'bytespan', 'value']
+
     def __init__(self, tid: str, filename: str, line_start: int, lineno: int, colno: int, bytespan: T.Tuple[int, int], value: TV_TokenTypes):
         self.tid = tid                # type: str
         self.filename = filename      # type: str
@@ -238,6 +240,8 @@ class Lexer:
                 raise ParseException('lexer', self.getline(line_start), lineno, col)
 
 class BaseNode:
+    __slots__ = ['lineno', 'colno', 'filename', 'end_lineno', 'end_colno', 'level', 'ast_id', 'condition_level']
+
     def __init__(self, lineno: int, colno: int, filename: str, end_lineno: T.Optional[int] = None, end_colno: T.Optional[int] = None):
         self.lineno = lineno      # type: int
         self.colno = colno        # type: int
@@ -258,17 +262,23 @@ class BaseNode:
                 func(self)
 
 class ElementaryNode(T.Generic[TV_TokenTypes], BaseNode):
+    __slots__ = ['value', 'bytespan']
+
     def __init__(self, token: Token[TV_TokenTypes]):
         super().__init__(token.lineno, token.colno, token.filename)
         self.value = token.value        # type: TV_TokenTypes
         self.bytespan = token.bytespan  # type: T.Tuple[int, int]
 
 class BooleanNode(ElementaryNode[bool]):
+    __slots__ = []
+
     def __init__(self, token: Token[bool]):
         super().__init__(token)
         assert isinstance(self.value, bool)
 
 class IdNode(ElementaryNode[str]):
+    __slots__ = []
+
     def __init__(self, token: Token[str]):
         super().__init__(token)
         assert isinstance(self.value, str)
@@ -277,11 +287,15 @@ class IdNode(ElementaryNode[str]):
         return "Id node: '%s' (%d, %d)." % (self.value, self.lineno, self.colno)
 
 class NumberNode(ElementaryNode[int]):
+    __slots__ = []
+
     def __init__(self, token: Token[int]):
         super().__init__(token)
         assert isinstance(self.value, int)
 
 class StringNode(ElementaryNode[str]):
+    __slots__ = []
+
     def __init__(self, token: Token[str]):
         super().__init__(token)
         assert isinstance(self.value, str)
@@ -290,6 +304,8 @@ class StringNode(ElementaryNode[str]):
         return "String node: '%s' (%d, %d)." % (self.value, self.lineno, self.colno)
 
 class FormatStringNode(ElementaryNode[str]):
+    __slots__ = []
+
     def __init__(self, token: Token[str]):
         super().__init__(token)
         assert isinstance(self.value, str)
@@ -298,12 +314,14 @@ class FormatStringNode(ElementaryNode[str]):
         return "Format string node: '{self.value}' ({self.lineno}, {self.colno})."
 
 class ContinueNode(ElementaryNode):
-    pass
+    __slots__ = []
 
 class BreakNode(ElementaryNode):
-    pass
+    __slots__ = []
 
 class ArgumentNode(BaseNode):
+    __slots__ = ['arguments', 'commas', 'kwargs', 'order_error']
+
     def __init__(self, token: Token[TV_TokenTypes]):
         super().__init__(token.lineno, token.colno, token.filename)
         self.arguments = []  # type: T.List[BaseNode]
@@ -345,33 +363,45 @@ class ArgumentNode(BaseNode):
         return self.num_args() # Fixme
 
 class ArrayNode(BaseNode):
+    __slots__ = ['args']
+
     def __init__(self, args: ArgumentNode, lineno: int, colno: int, end_lineno: int, end_colno: int):
         super().__init__(lineno, colno, args.filename, end_lineno=end_lineno, end_colno=end_colno)
         self.args = args              # type: ArgumentNode
 
 class DictNode(BaseNode):
+    __slots__ = ['args']
+
     def __init__(self, args: ArgumentNode, lineno: int, colno: int, end_lineno: int, end_colno: int):
         super().__init__(lineno, colno, args.filename, end_lineno=end_lineno, end_colno=end_colno)
         self.args = args
 
 class EmptyNode(BaseNode):
+    __slots__ = ['value']
+
     def __init__(self, lineno: int, colno: int, filename: str):
         super().__init__(lineno, colno, filename)
         self.value = None
 
 class OrNode(BaseNode):
+    __slots__ = ['left', 'right']
+
     def __init__(self, left: BaseNode, right: BaseNode):
         super().__init__(left.lineno, left.colno, left.filename)
         self.left = left    # type: BaseNode
         self.right = right  # type: BaseNode
 
 class AndNode(BaseNode):
+    __slots__ = ['left', 'right']
+
     def __init__(self, left: BaseNode, right: BaseNode):
         super().__init__(left.lineno, left.colno, left.filename)
         self.left = left    # type: BaseNode
         self.right = right  # type: BaseNode
 
 class ComparisonNode(BaseNode):
+    __slots__ = ['left', 'right', 'ctype']
+
     def __init__(self, ctype: str, left: BaseNode, right: BaseNode):
         super().__init__(left.lineno, left.colno, left.filename)
         self.left = left    # type: BaseNode
@@ -379,6 +409,8 @@ class ComparisonNode(BaseNode):
         self.ctype = ctype  # type: str
 
 class ArithmeticNode(BaseNode):
+    __slots__ = ['left', 'right', 'operation']
+
     def __init__(self, operation: str, left: BaseNode, right: BaseNode):
         super().__init__(left.lineno, left.colno, left.filename)
         self.left = left            # type: BaseNode
@@ -386,22 +418,30 @@ class ArithmeticNode(BaseNode):
         self.operation = operation  # type: str
 
 class NotNode(BaseNode):
+    __slots__ = ['value']
+
     def __init__(self, token: Token[TV_TokenTypes], value: BaseNode):
         super().__init__(token.lineno, token.colno, token.filename)
         self.value = value  # type: BaseNode
 
 class CodeBlockNode(BaseNode):
+    __slots__ = ['lines']
+
     def __init__(self, token: Token[TV_TokenTypes]):
         super().__init__(token.lineno, token.colno, token.filename)
         self.lines = []  # type: T.List[BaseNode]
 
 class IndexNode(BaseNode):
+    __slots__ = ['iobject', 'index']
+
     def __init__(self, iobject: BaseNode, index: BaseNode):
         super().__init__(iobject.lineno, iobject.colno, iobject.filename)
         self.iobject = iobject  # type: BaseNode
         self.index = index      # type: BaseNode
 
 class MethodNode(BaseNode):
+    __slots__ = ['source_object', 'name', 'args']
+
     def __init__(self, filename: str, lineno: int, colno: int, source_object: BaseNode, name: str, args: ArgumentNode):
         super().__init__(lineno, colno, filename)
         self.source_object = source_object  # type: BaseNode
@@ -410,6 +450,8 @@ class MethodNode(BaseNode):
         self.args = args                    # type: ArgumentNode
 
 class FunctionNode(BaseNode):
+    __slots__ = ['func_name', 'args']
+
     def __init__(self, filename: str, lineno: int, colno: int, end_lineno: int, end_colno: int, func_name: str, args: ArgumentNode):
         super().__init__(lineno, colno, filename, end_lineno=end_lineno, end_colno=end_colno)
         self.func_name = func_name  # type: str
@@ -417,6 +459,8 @@ class FunctionNode(BaseNode):
         self.args = args  # type: ArgumentNode
 
 class AssignmentNode(BaseNode):
+    __slots__ = ['var_name', 'value']
+
     def __init__(self, filename: str, lineno: int, colno: int, var_name: str, value: BaseNode):
         super().__init__(lineno, colno, filename)
         self.var_name = var_name  # type: str
@@ -424,6 +468,8 @@ class AssignmentNode(BaseNode):
         self.value = value  # type: BaseNode
 
 class PlusAssignmentNode(BaseNode):
+    __slots__ = ['var_name', 'value']
+
     def __init__(self, filename: str, lineno: int, colno: int, var_name: str, value: BaseNode):
         super().__init__(lineno, colno, filename)
         self.var_name = var_name  # type: str
@@ -431,6 +477,8 @@ class PlusAssignmentNode(BaseNode):
         self.value = value  # type: BaseNode
 
 class ForeachClauseNode(BaseNode):
+    __slots__ = ['varnames', 'items', 'block']
+
     def __init__(self, token: Token, varnames: T.List[str], items: BaseNode, block: CodeBlockNode):
         super().__init__(token.lineno, token.colno, token.filename)
         self.varnames = varnames  # type: T.List[str]
@@ -438,23 +486,31 @@ class ForeachClauseNode(BaseNode):
         self.block = block        # type: CodeBlockNode
 
 class IfNode(BaseNode):
+    __slots__ = ['condition', 'block']
+
     def __init__(self, linenode: BaseNode, condition: BaseNode, block: CodeBlockNode):
         super().__init__(linenode.lineno, linenode.colno, linenode.filename)
         self.condition = condition  # type: BaseNode
         self.block = block          # type: CodeBlockNode
 
 class IfClauseNode(BaseNode):
+    __slots__ = ['ifs', 'elseblock']
+
     def __init__(self, linenode: BaseNode):
         super().__init__(linenode.lineno, linenode.colno, linenode.filename)
         self.ifs = []          # type: T.List[IfNode]
         self.elseblock = None  # type: T.Union[EmptyNode, CodeBlockNode]
 
 class UMinusNode(BaseNode):
+    __slots__ = ['value']
+
     def __init__(self, current_location: Token, value: BaseNode):
         super().__init__(current_location.lineno, current_location.colno, current_location.filename)
         self.value = value  # type: BaseNode
 
 class TernaryNode(BaseNode):
+    __slots__ = ['condition', 'trueblock', 'falseblock']
+
     def __init__(self, condition: BaseNode, trueblock: BaseNode, falseblock: BaseNode):
         super().__init__(condition.lineno, condition.colno, condition.filename)
         self.condition = condition    # type: BaseNode
@@ -19,6 +19,7 @@ import datetime
 import os.path
 import platform
 import cProfile as profile
+from contextlib import contextmanager
 import argparse
 import tempfile
 import shutil
@@ -26,7 +27,7 @@ import glob
 
 from . import environment, interpreter, mesonlib
 from . import build
-from . import mlog, coredata
+from . import mlog, coredata, profiler
 from . import mintro
 from .mesonlib import MesonException
 
@@ -58,6 +59,9 @@ def add_arguments(parser: argparse.ArgumentParser) -> None:
                         version=coredata.version)
     parser.add_argument('--profile-self', action='store_true', dest='profile',
                         help=argparse.SUPPRESS)
+    parser.add_argument('--profile-build-files', action='store_true',
+                        help='Record where the time of evaluating the build files went and write it to '
+                             'the log directory as a flame graph and a Chrome trace.')
     parser.add_argument('--fatal-meson-warnings', action='store_true', dest='fatal_warnings',
                         help='Make all Meson warnings fatal')
     parser.add_argument('--reconfigure', action='store_true',
@@ -184,6 +188,26 @@ class MesonApp:
         with mesonlib.BuildDirLock(self.build_dir):
             self._generate(env)
 
+    @contextmanager
+    def profile_build_files(self, env: environment.Environment) -> T.Iterator[None]:
+        if not self.options.profile_build_files:
+            yield
+            return
+        profiler.start()
+        try:
+            yield
+        finally:
+            prof = profiler.stop()
+            assert prof is not None
+            folded = os.path.join(env.get_log_dir(), 'profile-build-files.folded')
+            trace = os.path.join(env.get_log_dir(), 'profile-build-files.json')
+            profiler.write_folded(folded, prof.events)
+            profiler.write_trace(trace, prof.events)
+            mlog.log('Slowest calls in build files:')
+            for e in profiler.slowest_calls(prof.events, 10):
+                mlog.log(f'{e.duration:9.3f} s ', e.args['location'], mlog.bold(e.stack[-1]))
+            mlog.log('Profile of the build files written to', mlog.bold(folded), 'and', mlog.bold(trace))
+
     def _generate(self, env: environment.Environment) -> None:
         # Get all user defined options, including options that have been defined
         # during a previous invocation or using meson configure.
@@ -204,32 +228,33 @@ class MesonApp:
             mlog.log('Build type:', mlog.bold('native build'))
         b = build.Build(env)
 
-        intr = interpreter.Interpreter(b, user_defined_options=user_defined_options)
-        if env.is_cross_build():
-            logger_fun = mlog.log
-        else:
-            logger_fun = mlog.debug
-        build_machine = intr.builtin['build_machine']
-        host_machine = intr.builtin['host_machine']
-        target_machine = intr.builtin['target_machine']
-        assert isinstance(build_machine, interpreter.MachineHolder)
-        assert isinstance(host_machine, interpreter.MachineHolder)
-        assert isinstance(target_machine, interpreter.MachineHolder)
-        logger_fun('Build machine cpu family:', mlog.bold(build_machine.cpu_family_method([], {})))
-        logger_fun('Build machine cpu:', mlog.bold(build_machine.cpu_method([], {})))
-        mlog.log('Host machine cpu family:', mlog.bold(host_machine.cpu_family_method([], {})))
-        mlog.log('Host machine cpu:', mlog.bold(host_machine.cpu_method([], {})))
-        logger_fun('Target machine cpu family:', mlog.bold(target_machine.cpu_family_method([], {})))
-        logger_fun('Target machine cpu:', mlog.bold(target_machine.cpu_method([], {})))
-        try:
-            if self.options.profile:
-                fname = os.path.join(self.build_dir, 'meson-private', 'profile-interpreter.log')
-                profile.runctx('intr.run()', globals(), locals(), filename=fname)
+        with self.profile_build_files(env):
+            intr = interpreter.Interpreter(b, user_defined_options=user_defined_options)
+            if env.is_cross_build():
+                logger_fun = mlog.log
             else:
-                intr.run()
-        except Exception as e:
-            mintro.write_meson_info_file(b, [e])
-            raise
+                logger_fun = mlog.debug
+            build_machine = intr.builtin['build_machine']
+            host_machine = intr.builtin['host_machine']
+            target_machine = intr.builtin['target_machine']
+            assert isinstance(build_machine, interpreter.MachineHolder)
+            assert isinstance(host_machine, interpreter.MachineHolder)
+            assert isinstance(target_machine, interpreter.MachineHolder)
+            logger_fun('Build machine cpu family:', mlog.bold(build_machine.cpu_family_method([], {})))
+            logger_fun('Build machine cpu:', mlog.bold(build_machine.cpu_method([], {})))
+            mlog.log('Host machine cpu family:', mlog.bold(host_machine.cpu_family_method([], {})))
+            mlog.log('Host machine cpu:', mlog.bold(host_machine.cpu_method([], {})))
+            logger_fun('Target machine cpu family:', mlog.bold(target_machine.cpu_family_method([], {})))
+            logger_fun('Target machine cpu:', mlog.bold(target_machine.cpu_method([], {})))
+            try:
+                if self.options.profile:
+                    fname = os.path.join(self.build_dir, 'meson-private', 'profile-interpreter.log')
+                    profile.runctx('intr.run()', globals(), locals(), filename=fname)
+                else:
+                    intr.run()
+            except Exception as e:
+                mintro.write_meson_info_file(b, [e])
+                raise
         try:
             dumpfile = os.path.join(env.get_scratch_dir(), 'build.dat')
             # We would like to write coredata as late as possible since we use the existence of
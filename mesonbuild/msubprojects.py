@@ -1,9 +1,11 @@
-import os, subprocess
+import os, sys, re
 import argparse
 import asyncio
 import threading
 import copy
+import locale
 import shutil
+import urllib.parse
 from concurrent.futures.thread import ThreadPoolExecutor
 from pathlib import Path
 import typing as T
@@ -11,8 +13,8 @@ import tarfile
 import zipfile
 
 from . import mlog
-from .mesonlib import quiet_git, GitException, Popen_safe, MesonException, windows_proof_rmtree
-from .wrap.wrap import PackageDefinition, Resolver, WrapException, ALL_TYPES
+from .mesonlib import GIT, GitException, MesonException, windows_proof_rmtree
+from .wrap.wrap import PackageDefinition, Resolver, WrapException, ALL_TYPES, read_stamp
 from .wrap import wraptool
 
 ALL_TYPES_STRING = ', '.join(ALL_TYPES)
@@ -26,12 +28,43 @@ def read_archive_files(path: Path, base_path: Path):
             archive_files = set(base_path / i.name for i in archive)
     return archive_files
 
+def url_host(url: T.Optional[str]) -> T.Optional[str]:
+    '''Host name of a remote URL, None for local paths.'''
+    if not url:
+        return None
+    if '://' in url:
+        return urllib.parse.urlparse(url).hostname
+    # scp-like syntax understood by git: [user@]host:path
+    m = re.match(r'^(?:[^@/]+@)?([^:/\\]+):', url)
+    # A single letter is a Windows drive, not a host.
+    if m and len(m.group(1)) > 1:
+        return m.group(1)
+    return None
+
+class Limits:
+    '''
+    Bounds the work done concurrently: the number of subprojects processed at
+    once, and the number of network operations per remote host.
+    '''
+    def __init__(self, num_tasks: int, max_per_host: int, executor: ThreadPoolExecutor) -> None:
+        self.tasks = asyncio.Semaphore(num_tasks)
+        self.max_per_host = max_per_host
+        self.hosts = {}  # type: T.Dict[str, asyncio.Semaphore]
+        self.executor = executor
+
+    def host(self, url: T.Optional[str]) -> asyncio.Semaphore:
+        host = url_host(url)
+        if host is None:
+            # Nothing to bound, a fresh semaphore never blocks.
+            return asyncio.Semaphore()
+        return self.hosts.setdefault(host, asyncio.Semaphore(self.max_per_host))
+
 class Logger:
     def __init__(self, total_tasks: int) -> None:
         self.lock = threading.Lock()
         self.total_tasks = total_tasks
         self.completed_tasks = 0
-        self.running_tasks = set()
+        self.running_tasks = {}  # type: T.Dict[str, str]
         self.should_erase_line = ''
 
     def flush(self) -> None:
@@ -42,7 +75,7 @@ class Logger:
     def print_progress(self) -> None:
         line = f'Progress: {self.completed_tasks} / {self.total_tasks}'
         max_len = shutil.get_terminal_size().columns - len(line)
-        running = ', '.join(self.running_tasks)
+        running = ', '.join(f'{name} ({step})' if step else name for name, step in self.running_tasks.items())
         if len(running) + 3 > max_len:
             running = running[:max_len - 6] + '...'
         line = line + f' ({running})'
@@ -51,21 +84,27 @@ class Logger:
 
     def start(self, wrap_name: str) -> None:
         with self.lock:
-            self.running_tasks.add(wrap_name)
+            self.running_tasks[wrap_name] = ''
             self.print_progress()
 
+    def step(self, wrap_name: str, step: str) -> None:
+        with self.lock:
+            if wrap_name in self.running_tasks:
+                self.running_tasks[wrap_name] = step
+                self.print_progress()
+
     def done(self, wrap_name: str, log_queue: T.List[T.Tuple[mlog.TV_LoggableList, T.Any]]) -> None:
         with self.lock:
             self.flush()
             for args, kwargs in log_queue:
                 mlog.log(*args, **kwargs)
-            self.running_tasks.remove(wrap_name)
+            del self.running_tasks[wrap_name]
             self.completed_tasks += 1
             self.print_progress()
 
 
 class Runner:
-    def __init__(self, logger: Logger, r: Resolver, wrap: PackageDefinition, repo_dir: str, options: argparse.Namespace) -> None:
+    def __init__(self, logger: Logger, limits: Limits, r: Resolver, wrap: PackageDefinition, repo_dir: str, options: argparse.Namespace) -> None:
         # FIXME: Do a copy because Resolver.resolve() is stateful method that
         # cannot be called from multiple threads.
         self.wrap_resolver = copy.copy(r)
@@ -77,20 +116,73 @@ class Runner:
         self.run_method = options.subprojects_func.__get__(self)
         self.log_queue = []
         self.logger = logger
+        self.limits = limits
 
     def log(self, *args, **kwargs):
         self.log_queue.append((args, kwargs))
 
-    def run(self):
-        self.logger.start(self.wrap.name)
-        try:
-            result = self.run_method()
-        except MesonException as e:
-            self.log(mlog.red('Error:'), str(e))
-            result = False
-        self.logger.done(self.wrap.name, self.log_queue)
+    async def run(self):
+        async with self.limits.tasks:
+            self.logger.start(self.wrap.name)
+            try:
+                if asyncio.iscoroutinefunction(self.run_method):
+                    result = await self.run_method()
+                else:
+                    result = await self.run_in_thread(self.run_method)
+            except MesonException as e:
+                self.log(mlog.red('Error:'), str(e))
+                result = False
+            except asyncio.CancelledError:
+                self.log('  ->', mlog.yellow('Cancelled'))
+                raise
+            finally:
+                self.logger.done(self.wrap.name, self.log_queue)
         return result
 
+    @property
+    def url(self) -> T.Optional[str]:
+        return self.wrap.values.get('url') or self.wrap.values.get('source_url')
+
+    async def run_in_thread(self, func: T.Callable[[], T.Any], network: bool = False) -> T.Any:
+        '''
+        Call a blocking function in a worker thread. Network accesses are
+        limited per host, like commands run with run_cmd().
+        '''
+        async with self.limits.host(self.url if network else None):
+            return await asyncio.get_event_loop().run_in_executor(self.limits.executor, func)
+
+    async def run_cmd(self, cmd: T.List[str], network: bool = False,
+                      stderr: int = asyncio.subprocess.PIPE) -> T.Tuple[int, str, str]:
+        '''
+        Run a command in the subproject directory without blocking other
+        subprojects. When cancelled, commands accessing the network are
+        killed, other commands could leave the repository in an inconsistent
+        state and run to completion.
+        '''
+        async with self.limits.host(self.url if network else None):
+            if network:
+                self.logger.step(self.wrap.name, os.path.basename(cmd[0]) + ' ' + cmd[1])
+            p = await asyncio.create_subprocess_exec(*cmd, cwd=self.repo_dir,
+                                                     stdin=asyncio.subprocess.DEVNULL,
+                                                     stdout=asyncio.subprocess.PIPE,
+                                                     stderr=stderr)
+            communicate = asyncio.ensure_future(p.communicate())
+            try:
+                o, e = await asyncio.shield(communicate)
+            except asyncio.CancelledError:
+                if network:
+                    p.kill()
+                await communicate
+                raise
+            finally:
+                if network:
+                    self.logger.step(self.wrap.name, '')
+        mlog.setup_console()
+        encoding = locale.getpreferredencoding()
+        out = o.decode(encoding, errors='replace').replace('\r\n', '\n') if o is not None else ''
+        err = e.decode(encoding, errors='replace').replace('\r\n', '\n') if e is not None else ''
+        return p.returncode, out, err
+
     def update_wrapdb_file(self):
         try:
             patch_url = self.wrap.get('patch_url')
@@ -124,6 +216,11 @@ class Runner:
                 self.log('  ->', mlog.red(str(e)))
                 return False
         else:
+            # The wrap file might just have been updated from wrapdb.
+            stamp = PackageDefinition(self.wrap.filename).get_stamp()
+            if stamp is not None and stamp == read_stamp(self.repo_dir):
+                self.log('  -> Subproject has not changed.')
+                return True
             # The subproject has not changed, or the new source and/or patch
             # tarballs should be extracted in the same directory than previous
             # version.
@@ -131,29 +228,41 @@ class Runner:
             self.log('     Pass --reset option to delete directory and redownload.')
             return False
 
-    def git_output(self, cmd):
-        return quiet_git(cmd, self.repo_dir, check=True)[1]
+    async def git_output(self, cmd, network=False):
+        if not GIT:
+            raise GitException('Git program not found.')
+        cmd = [GIT] + cmd
+        returncode, out, err = await self.run_cmd(cmd, network=network)
+        if returncode != 0:
+            raise GitException('Git command failed: ' + str(cmd), err)
+        return out
+
+    async def git_succeeds(self, cmd):
+        if not GIT:
+            return False
+        returncode, _, _ = await self.run_cmd([GIT] + cmd)
+        return returncode == 0
 
-    def git_verbose(self, cmd):
-        self.log(self.git_output(cmd))
+    async def git_verbose(self, cmd):
+        self.log(await self.git_output(cmd))
 
-    def git_stash(self):
+    async def git_stash(self):
         # That git command return 1 (failure) when there is something to stash.
         # We don't want to stash when there is nothing to stash because that would
         # print spurious "No local changes to save".
-        if not quiet_git(['diff', '--quiet', 'HEAD'], self.repo_dir)[0]:
-            # Don't pipe stdout here because we want the user to see their changes have
+        if not await self.git_succeeds(['diff', '--quiet', 'HEAD']):
+            # Log the output because we want the user to see their changes have
             # been saved.
-            self.git_verbose(['stash'])
+            await self.git_verbose(['stash'])
 
-    def git_show(self):
-        commit_message = self.git_output(['show', '--quiet', '--pretty=format:%h%n%d%n%s%n[%an]'])
+    async def git_show(self):
+        commit_message = await self.git_output(['show', '--quiet', '--pretty=format:%h%n%d%n%s%n[%an]'])
         parts = [s.strip() for s in commit_message.split('\n')]
         self.log('  ->', mlog.yellow(parts[0]), mlog.red(parts[1]), parts[2], mlog.blue(parts[3]))
 
-    def git_rebase(self, revision):
+    async def git_rebase(self, revision):
         try:
-            self.git_output(['-c', 'rebase.autoStash=true', 'rebase', 'FETCH_HEAD'])
+            await self.git_output(['-c', 'rebase.autoStash=true', 'rebase', 'FETCH_HEAD'])
         except GitException as e:
             self.log('  -> Could not rebase', mlog.bold(self.repo_dir), 'onto', mlog.bold(revision))
             self.log(mlog.red(e.output))
@@ -161,13 +270,13 @@ class Runner:
             return False
         return True
 
-    def git_reset(self, revision):
+    async def git_reset(self, revision):
         try:
             # Stash local changes, commits can always be found back in reflog, to
             # avoid any data lost by mistake.
-            self.git_stash()
-            self.git_output(['reset', '--hard', 'FETCH_HEAD'])
-            self.wrap_resolver.apply_patch()
+            await self.git_stash()
+            await self.git_output(['reset', '--hard', 'FETCH_HEAD'])
+            await self.run_in_thread(self.wrap_resolver.apply_patch, network=True)
         except GitException as e:
             self.log('  -> Could not reset', mlog.bold(self.repo_dir), 'to', mlog.bold(revision))
             self.log(mlog.red(e.output))
@@ -175,15 +284,15 @@ class Runner:
             return False
         return True
 
-    def git_checkout(self, revision, create=False):
+    async def git_checkout(self, revision, create=False):
         cmd = ['checkout', '--ignore-other-worktrees', revision, '--']
         if create:
-            cmd.insert('-b', 1)
+            cmd.insert(1, '-b')
         try:
             # Stash local changes, commits can always be found back in reflog, to
             # avoid any data lost by mistake.
-            self.git_stash()
-            self.git_output(cmd)
+            await self.git_stash()
+            await self.git_output(cmd)
         except GitException as e:
             self.log('  -> Could not checkout', mlog.bold(revision), 'in', mlog.bold(self.repo_dir))
             self.log(mlog.red(e.output))
@@ -191,23 +300,23 @@ class Runner:
             return False
         return True
 
-    def git_checkout_and_reset(self, revision):
+    async def git_checkout_and_reset(self, revision):
         # revision could be a branch that already exists but is outdated, so we still
         # have to reset after the checkout.
-        success = self.git_checkout(revision)
+        success = await self.git_checkout(revision)
         if success:
-            success = self.git_reset(revision)
+            success = await self.git_reset(revision)
         return success
 
-    def git_checkout_and_rebase(self, revision):
+    async def git_checkout_and_rebase(self, revision):
         # revision could be a branch that already exists but is outdated, so we still
         # have to rebase after the checkout.
-        success = self.git_checkout(revision)
+        success = await self.git_checkout(revision)
         if success:
-            success = self.git_rebase(revision)
+            success = await self.git_rebase(revision)
         return success
 
-    def update_git(self):
+    async def update_git(self):
         if not os.path.isdir(self.repo_dir):
             self.log('  -> Not used.')
             return True
@@ -216,8 +325,8 @@ class Runner:
                 # Delete existing directory and redownload
                 windows_proof_rmtree(self.repo_dir)
                 try:
-                    self.wrap_resolver.resolve(self.wrap.name, 'meson')
-                    self.update_git_done()
+                    await self.run_in_thread(lambda: self.wrap_resolver.resolve(self.wrap.name, 'meson'), network=True)
+                    await self.update_git_done()
                     return True
                 except WrapException as e:
                     self.log('  ->', mlog.red(str(e)))
@@ -234,7 +343,7 @@ class Runner:
             self.log('  -> No revision or URL specified.')
             return True
         try:
-            origin_url = self.git_output(['remote', 'get-url', 'origin']).strip()
+            origin_url = (await self.git_output(['remote', 'get-url', 'origin'])).strip()
         except GitException as e:
             self.log('  -> Failed to determine current origin URL in', mlog.bold(self.repo_dir))
             self.log(mlog.red(e.output))
@@ -242,9 +351,9 @@ class Runner:
             return False
         if self.options.reset:
             try:
-                self.git_output(['remote', 'set-url', 'origin', url])
+                await self.git_output(['remote', 'set-url', 'origin', url])
                 if push_url:
-                    self.git_output(['remote', 'set-url', '--push', 'origin', push_url])
+                    await self.git_output(['remote', 'set-url', '--push', 'origin', push_url])
             except GitException as e:
                 self.log('  -> Failed to reset origin URL in', mlog.bold(self.repo_dir))
                 self.log(mlog.red(e.output))
@@ -255,7 +364,7 @@ class Runner:
             return False
         try:
             # Same as `git branch --show-current` but compatible with older git version
-            branch = self.git_output(['rev-parse', '--abbrev-ref', 'HEAD']).strip()
+            branch = (await self.git_output(['rev-parse', '--abbrev-ref', 'HEAD'])).strip()
             branch = branch if branch != 'HEAD' else ''
         except GitException as e:
             self.log('  -> Failed to determine current branch in', mlog.bold(self.repo_dir))
@@ -263,11 +372,11 @@ class Runner:
             self.log(mlog.red(str(e)))
             return False
         if self.wrap_resolver.is_git_full_commit_id(revision) and \
-                quiet_git(['rev-parse', '--verify', revision + '^{commit}'], self.repo_dir)[0]:
+                await self.git_succeeds(['rev-parse', '--verify', revision + '^{commit}']):
             # The revision we need is both a commit and available. So we do not
             # need to fetch it because it cannot be updated.  Instead, trick
             # git into setting FETCH_HEAD just in case, from the local commit.
-            self.git_output(['fetch', '.', revision])
+            await self.git_output(['fetch', '.', revision])
         else:
             try:
                 # Fetch only the revision we need, this avoids fetching useless branches.
@@ -278,7 +387,8 @@ class Runner:
                 # https://github.com/mesonbuild/meson/pull/7723#discussion_r488816189.
                 heads_refmap = '+refs/heads/*:refs/remotes/origin/*'
                 tags_refmap = '+refs/tags/*:refs/tags/*'
-                self.git_output(['fetch', '--refmap', heads_refmap, '--refmap', tags_refmap, 'origin', revision])
+                await self.git_output(['fetch', '--refmap', heads_refmap, '--refmap', tags_refmap, 'origin', revision],
+                                      network=True)
             except GitException as e:
                 self.log('  -> Could not fetch revision', mlog.bold(revision), 'in', mlog.bold(self.repo_dir))
                 self.log(mlog.red(e.output))
@@ -288,33 +398,39 @@ class Runner:
         if branch == '':
             # We are currently in detached mode
             if self.options.reset:
-                success = self.git_checkout_and_reset(revision)
+                success = await self.git_checkout_and_reset(revision)
             else:
-                success = self.git_checkout_and_rebase(revision)
+                success = await self.git_checkout_and_rebase(revision)
         elif branch == revision:
             # We are in the same branch. A reset could still be needed in the case
             # a force push happened on remote repository.
             if self.options.reset:
-                success = self.git_reset(revision)
+                success = await self.git_reset(revision)
             else:
-                success = self.git_rebase(revision)
+                success = await self.git_rebase(revision)
         else:
             # We are in another branch, either the user created their own branch and
             # we should rebase it, or revision changed in the wrap file and we need
             # to checkout the new branch.
             if self.options.reset:
-                success = self.git_checkout_and_reset(revision)
+                success = await self.git_checkout_and_reset(revision)
             else:
-                success = self.git_rebase(revision)
+                success = await self.git_rebase(revision)
         if success:
-            self.update_git_done()
+            await self.update_git_done()
         return success
 
-    def update_git_done(self):
-        self.git_output(['submodule', 'update', '--checkout', '--recursive'])
-        self.git_show()
+    async def update_git_done(self):
+        await self.git_output(['submodule', 'update', '--checkout', '--recursive'], network=True)
+        await self.git_show()
 
-    def update_hg(self):
+    async def vcs_call(self, cmd, network=False):
+        returncode, out, _ = await self.run_cmd(cmd, network=network, stderr=asyncio.subprocess.STDOUT)
+        if out:
+            self.log(out, end='')
+        return returncode == 0
+
+    async def update_hg(self):
         if not os.path.isdir(self.repo_dir):
             self.log('  -> Not used.')
             return True
@@ -323,19 +439,19 @@ class Runner:
             # Failure to do pull is not a fatal error,
             # because otherwise you can't develop without
             # a working net connection.
-            subprocess.call(['hg', 'pull'], cwd=self.repo_dir)
+            await self.vcs_call(['hg', 'pull'], network=True)
         else:
-            if subprocess.call(['hg', 'checkout', revno], cwd=self.repo_dir) != 0:
-                subprocess.check_call(['hg', 'pull'], cwd=self.repo_dir)
-                subprocess.check_call(['hg', 'checkout', revno], cwd=self.repo_dir)
+            if not await self.vcs_call(['hg', 'checkout', revno]):
+                return await self.vcs_call(['hg', 'pull'], network=True) and \
+                    await self.vcs_call(['hg', 'checkout', revno])
         return True
 
-    def update_svn(self):
+    async def update_svn(self):
         if not os.path.isdir(self.repo_dir):
             self.log('  -> Not used.')
             return True
         revno = self.wrap.get('revision')
-        p, out, _ = Popen_safe(['svn', 'info', '--show-item', 'revision', self.repo_dir])
+        _, out, _ = await self.run_cmd(['svn', 'info', '--show-item', 'revision', self.repo_dir])
         current_revno = out
         if current_revno == revno:
             return True
@@ -343,28 +459,28 @@ class Runner:
             # Failure to do pull is not a fatal error,
             # because otherwise you can't develop without
             # a working net connection.
-            subprocess.call(['svn', 'update'], cwd=self.repo_dir)
+            await self.vcs_call(['svn', 'update'], network=True)
         else:
-            subprocess.check_call(['svn', 'update', '-r', revno], cwd=self.repo_dir)
+            return await self.vcs_call(['svn', 'update', '-r', revno], network=True)
         return True
 
-    def update(self):
+    async def update(self):
         self.log(f'Updating {self.wrap.name}...')
         if self.wrap.type == 'file':
-            return self.update_file()
+            return await self.run_in_thread(self.update_file, network=True)
         elif self.wrap.type == 'git':
-            return self.update_git()
+            return await self.update_git()
         elif self.wrap.type == 'hg':
-            return self.update_hg()
+            return await self.update_hg()
         elif self.wrap.type == 'svn':
-            return self.update_svn()
+            return await self.update_svn()
         elif self.wrap.type is None:
             self.log('  -> Cannot update subproject with no wrap file')
         else:
             self.log('  -> Cannot update', self.wrap.type, 'subproject')
         return True
 
-    def checkout(self):
+    async def checkout(self):
         if self.wrap.type != 'git' or not os.path.isdir(self.repo_dir):
             return True
         branch_name = self.options.branch_name if self.options.branch_name else self.wrap.get('revision')
@@ -372,33 +488,33 @@ class Runner:
             # It could be a detached git submodule for example.
             return True
         self.log(f'Checkout {branch_name} in {self.wrap.name}...')
-        if self.git_checkout(branch_name, create=self.options.b):
-            self.git_show()
+        if await self.git_checkout(branch_name, create=self.options.b):
+            await self.git_show()
             return True
         return False
 
-    def download(self):
+    async def download(self):
         self.log(f'Download {self.wrap.name}...')
         if os.path.isdir(self.repo_dir):
             self.log('  -> Already downloaded')
             return True
         try:
-            self.wrap_resolver.resolve(self.wrap.name, 'meson')
+            await self.run_in_thread(lambda: self.wrap_resolver.resolve(self.wrap.name, 'meson'), network=True)
             self.log('  -> done')
         except WrapException as e:
             self.log('  ->', mlog.red(str(e)))
             return False
         return True
 
-    def foreach(self):
+    async def foreach(self):
         self.log(f'Executing command in {self.repo_dir}')
         if not os.path.isdir(self.repo_dir):
             self.log('  -> Not downloaded yet')
             return True
         cmd = [self.options.command] + self.options.args
-        p, out, _ = Popen_safe(cmd, stderr=subprocess.STDOUT, cwd=self.repo_dir)
-        if p.returncode != 0:
-            err_message = "Command '{}' returned non-zero exit status {}.".format(" ".join(cmd), p.returncode)
+        returncode, out, _ = await self.run_cmd(cmd, stderr=asyncio.subprocess.STDOUT)
+        if returncode != 0:
+            err_message = "Command '{}' returned non-zero exit status {}.".format(" ".join(cmd), returncode)
             self.log('  -> ', mlog.red(err_message))
             self.log(out, end='')
             return False
@@ -415,7 +531,7 @@ class Runner:
             redirect_file = Path(self.wrap.original_filename).resolve()
             if self.options.confirm:
                 redirect_file.unlink()
-            mlog.log(f'Deleting {redirect_file}')
+            self.log(f'Deleting {redirect_file}')
 
         if self.wrap.type == 'redirect':
             redirect_file = Path(self.wrap.filename).resolve()
@@ -528,7 +644,11 @@ def add_common_arguments(p):
     p.add_argument('--types', default='',
                    help=f'Comma-separated list of subproject types. Supported types are: {ALL_TYPES_STRING} (default: all)')
     p.add_argument('--num-processes', default=None, type=int,
-                   help='How many parallel processes to use (Since 0.59.0).')
+                   help='How many subprojects to process in parallel (Since 0.59.0).')
+    p.add_argument('--max-per-host', default=8, type=int,
+                   help='How many network operations to run in parallel on each remote host (default: %(default)s) (Since 0.61.0).')
+    p.add_argument('--fail-fast', default=False, action='store_true',
+                   help='Cancel all remaining work as soon as one subproject fails (Since 0.61.0).')
 
 def add_subprojects_argument(p):
     p.add_argument('subprojects', nargs='*',
@@ -606,27 +726,56 @@ def run(options):
     for t in types:
         if t not in ALL_TYPES:
             raise MesonException(f'Unknown subproject type {t!r}, supported types are: {ALL_TYPES_STRING}')
-    tasks = []
-    task_names = []
-    loop = asyncio.get_event_loop()
-    executor = ThreadPoolExecutor(options.num_processes)
     if types:
         wraps = [wrap for wrap in wraps if wrap.type in types]
+    if sys.platform == 'win32':
+        loop = asyncio.ProactorEventLoop()
+        asyncio.set_event_loop(loop)
+    # Replace with asyncio.run once we can require Python 3.7
+    loop = asyncio.get_event_loop()
+    executor = ThreadPoolExecutor(options.num_processes)
+    num_tasks = options.num_processes or 4 * (os.cpu_count() or 1)
+    limits = Limits(num_tasks, options.max_per_host, executor)
     logger = Logger(len(wraps))
+    runners = []
     for wrap in wraps:
         dirname = Path(subprojects_dir, wrap.directory).as_posix()
-        runner = Runner(logger, r, wrap, dirname, options)
-        task = loop.run_in_executor(executor, runner.run)
-        tasks.append(task)
-        task_names.append(wrap.name)
-    results = loop.run_until_complete(asyncio.gather(*tasks))
+        runners.append(Runner(logger, limits, r, wrap, dirname, options))
+    results = loop.run_until_complete(run_runners(runners, options.fail_fast))
+    executor.shutdown()
+    r.user_cache.prune_added()
     logger.flush()
     post_func = getattr(options, 'post_func', None)
     if post_func:
         post_func(options)
-    failures = [name for name, success in zip(task_names, results) if not success]
+    failures = [runner.wrap.name for runner, success in zip(runners, results) if success is False]
     if failures:
         m = 'Please check logs above as command failed in some subprojects which could have been left in conflict state: '
         m += ', '.join(failures)
         mlog.warning(m)
-    return len(failures)
+    cancelled = [runner.wrap.name for runner, success in zip(runners, results) if success is None]
+    if cancelled:
+        mlog.warning('Cancelled in subprojects:', ', '.join(cancelled))
+    return len(failures) + len(cancelled)
+
+async def run_runners(runners: T.List[Runner], fail_fast: bool) -> T.List[T.Optional[bool]]:
+    '''
+    Run all runners concurrently, returning None for the ones that got
+    cancelled because another one failed and fail_fast is set.
+    '''
+    async def run_runner(runner: Runner) -> bool:
+        result = await runner.run()
+        # Cancel right away, before another runner gets the slot this one
+        # just released.
+        if fail_fast and not result:
+            for r, t in zip(runners, tasks):
+                if r is not runner:
+                    t.cancel()
+        return result
+
+    tasks = [asyncio.ensure_future(run_runner(runner)) for runner in runners]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(result, asyncio.CancelledError):
+            raise result
+    return [None if isinstance(r, asyncio.CancelledError) else bool(r) for r in results]
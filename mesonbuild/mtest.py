@@ -39,6 +39,7 @@ import unicodedata
 import xml.etree.ElementTree as et
 
 from . import build
+from . import buildgraph
 from . import environment
 from . import mlog
 from .coredata import major_versions_differ, MesonVersionMismatchException
@@ -136,6 +137,10 @@ def add_arguments(parser: argparse.ArgumentParser) -> None:
                         help='Which test setup to use.')
     parser.add_argument('--test-args', default=[], type=split_args,
                         help='Arguments to pass to the specified test(s) or all tests')
+    parser.add_argument('--affected-by', default=None, dest='affected_by', nargs='+', metavar='FILE',
+                        type=os.path.abspath,
+                        help='Only run the tests affected by changes to the given files, '
+                             'which must come after the test names.')
     parser.add_argument('args', nargs='*',
                         help='Optional list of test names to run. "testname" to run all tests with that name, '
                         '"subprojname:testname" to specifically run "testname" from "subprojname", '
@@ -1777,6 +1782,13 @@ class TestHarness:
         tests = [t for t in self.tests if self.test_suitable(t)]
         if self.options.args:
             tests = list(self.tests_from_args(tests))
+        if self.options.affected_by:
+            graph = buildgraph.load_graph(self.options.wd)
+            affected = set(graph.affected_targets(self.options.affected_by))
+            kind = 'benchmarks' if self.options.benchmark else 'tests'
+            affected_tests = set(graph.affected_tests(self.options.affected_by, kind))
+            tests = [t for t in tests if affected.intersection(t.depends)
+                     or (t.project_name, t.name) in affected_tests]
 
         if not tests:
             print('No suitable tests defined.')
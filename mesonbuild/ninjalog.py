@@ -0,0 +1,99 @@
+# Copyright 2021 The Meson development team
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Reader of the build log ninja writes to .ninja_log.
+
+Every line of the log records when an output was built, relative to the
+start of the ninja run, in milliseconds. Ninja appends to the log, so an
+output can appear several times, the last entry is the most recent one.
+A command with several outputs has an entry for each of them.
+'''
+
+import os
+import typing as T
+
+def get_log_file(builddir: str) -> str:
+    return os.path.join(builddir, '.ninja_log')
+
+class NinjaLogEntry(T.NamedTuple):
+
+    start: int
+    end: int
+    mtime: int
+    output: str
+    cmdhash: str
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+def read_log(filename: str) -> T.List[NinjaLogEntry]:
+    """Entries of a ninja log in file order, an empty list if there is none."""
+    entries = []  # type: T.List[NinjaLogEntry]
+    try:
+        f = open(filename, encoding='utf-8', errors='replace')
+    except OSError:
+        return entries
+    with f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) != 5:
+                continue
+            try:
+                start, end, mtime = int(fields[0]), int(fields[1]), int(fields[2])
+            except ValueError:
+                continue
+            entries.append(NinjaLogEntry(start, end, mtime, fields[3], fields[4]))
+    return entries
+
+def last_durations(entries: T.Iterable[NinjaLogEntry]) -> T.Dict[str, int]:
+    """Milliseconds spent building every output the last time it was built."""
+    return {e.output: e.duration for e in entries}
+
+def last_build(entries: T.List[NinjaLogEntry]) -> T.List[NinjaLogEntry]:
+    """Entries of the last ninja run.
+
+    Ninja appends entries as the commands finish, so their end times only
+    decrease when a new run starts.
+    """
+    first = 0
+    for i in range(1, len(entries)):
+        if entries[i].end < entries[i - 1].end:
+            first = i
+    return entries[first:]
+
+class NinjaStep(T.NamedTuple):
+
+    """A command ninja ran, with all the outputs it built."""
+
+    start: int
+    end: int
+    outputs: T.List[str]
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+def get_steps(entries: T.Iterable[NinjaLogEntry]) -> T.List[NinjaStep]:
+    """Steps of a ninja run, the entries of a step are for its outputs."""
+    steps = {}  # type: T.Dict[T.Tuple[int, int, str], NinjaStep]
+    for e in entries:
+        key = (e.start, e.end, e.cmdhash)
+        if key in steps:
+            steps[key].outputs.append(e.output)
+        else:
+            steps[key] = NinjaStep(e.start, e.end, [e.output])
+    return list(steps.values())
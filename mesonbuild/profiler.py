@@ -0,0 +1,119 @@
+# Copyright 2021 The Meson development team
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Where the time of configuring a project went.
+
+While a profiler is running, the interpreter records a frame for every
+statement of a build file it evaluates, named after the file and line,
+and for every function and method it calls. Commands run with
+Popen_safe() get a frame of their own, so the time of a compiler check
+or a dependency lookup is attributed to the program it ran and to the
+line of the build file that asked for it.
+'''
+
+from contextlib import contextmanager
+import json
+import time
+import typing as T
+
+class Event(T.NamedTuple):
+
+    # Names of the frame and of the frames it was called from, outermost first
+    stack: T.Tuple[str, ...]
+    category: str
+    # Seconds since the profiler started
+    start: float
+    duration: float
+    args: T.Dict[str, str]
+
+class Profiler:
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stack = []  # type: T.List[str]
+        self.events = []  # type: T.List[Event]
+
+    @contextmanager
+    def frame(self, name: str, category: str, args: T.Optional[T.Dict[str, str]] = None) -> T.Iterator[None]:
+        self.stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.events.append(Event(tuple(self.stack), category, start - self.started, end - start, args or {}))
+            self.stack.pop()
+
+# The running profiler, None when configuring is not profiled
+current = None  # type: T.Optional[Profiler]
+
+def start() -> Profiler:
+    global current
+    current = Profiler()
+    return current
+
+def stop() -> T.Optional[Profiler]:
+    global current
+    profiler, current = current, None
+    return profiler
+
+def call_name(name: str, args: T.Sequence[object]) -> str:
+    """Name of the frame of a call, with its first argument if it is a string."""
+    if args and isinstance(args[0], str):
+        arg = args[0] if len(args[0]) <= 40 else args[0][:37] + '...'
+        return f'{name}({arg!r})'
+    return f'{name}()'
+
+def get_folded(events: T.Iterable[Event]) -> T.Dict[T.Tuple[str, ...], int]:
+    """Microseconds spent in every stack itself, not in the frames it called."""
+    totals = {}  # type: T.Dict[T.Tuple[str, ...], float]
+    children = {}  # type: T.Dict[T.Tuple[str, ...], float]
+    for e in events:
+        totals[e.stack] = totals.get(e.stack, 0) + e.duration
+        parent = e.stack[:-1]
+        children[parent] = children.get(parent, 0) + e.duration
+    return {stack: max(0, round((total - children.get(stack, 0)) * 1e6))
+            for stack, total in totals.items()}
+
+def write_folded(filename: str, events: T.Iterable[Event]) -> None:
+    """Write the stacks in the folded format of flamegraph.pl and compatible tools."""
+    with open(filename, 'w', encoding='utf-8') as f:
+        for stack, usec in sorted(get_folded(events).items()):
+            if usec:
+                f.write(';'.join(s.replace(';', ',') for s in stack) + f' {usec}\n')
+
+def get_trace(events: T.Iterable[Event]) -> T.Dict[str, T.Any]:
+    """The frames in the Chrome trace event format."""
+    trace = []  # type: T.List[T.Dict[str, T.Any]]
+    for e in sorted(events, key=lambda e: (e.start, -e.duration)):
+        trace.append({
+            'name': e.stack[-1],
+            'cat': e.category,
+            'ph': 'X',
+            'ts': round(e.start * 1e6),
+            'dur': round(e.duration * 1e6),
+            'pid': 0,
+            'tid': 0,
+            'args': e.args,
+        })
+    return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+def write_trace(filename: str, events: T.Iterable[Event]) -> None:
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(get_trace(events), f)
+
+def slowest_calls(events: T.Iterable[Event], top: int) -> T.List[Event]:
+    """The function and method calls that took the longest."""
+    calls = [e for e in events if e.category == 'call']
+    return sorted(calls, key=lambda e: -e.duration)[:top]
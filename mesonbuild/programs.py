@@ -20,6 +20,7 @@ import shutil
 import stat
 import sys
 import re
+import time
 import typing as T
 from pathlib import Path
 
@@ -32,6 +33,89 @@ if T.TYPE_CHECKING:
     from .interpreter import Interpreter
 
 
+class _DirectoryIndex:
+
+    """Names of the files in the directories searched for programs.
+
+    A find_program() call looks for several names in every directory of
+    PATH, this lets most of them be answered without touching the
+    filesystem. A listing is reused as long as the modification time of its
+    directory does not change. Like git does for its index, a listing taken
+    less than two seconds after the directory was last modified is not kept,
+    since a file added in the same timestamp tick would not be noticed on
+    filesystems with a coarse time resolution.
+
+    Names are compared case-insensitively, and a name found in a listing is
+    still checked with stat(), so that case-insensitive filesystems behave
+    as before.
+    """
+
+    RACY_INTERVAL = 2_000_000_000
+
+    def __init__(self) -> None:
+        self.listings: T.Dict[str, T.Tuple[int, T.FrozenSet[str]]] = {}
+
+    def listing(self, dirname: str) -> T.Optional[T.FrozenSet[str]]:
+        try:
+            mtime = os.stat(dirname).st_mtime_ns
+        except OSError:
+            self.listings.pop(dirname, None)
+            return None
+        cached = self.listings.get(dirname)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            names = frozenset(n.lower() for n in os.listdir(dirname))
+        except OSError:
+            return None
+        if int(time.time() * 1e9) - mtime > self.RACY_INTERVAL:
+            self.listings[dirname] = (mtime, names)
+        else:
+            self.listings.pop(dirname, None)
+        return names
+
+    def exists(self, path: str) -> bool:
+        dirname, basename = os.path.split(path)
+        if basename in {'', os.curdir, os.pardir}:
+            return os.path.exists(path)
+        names = self.listing(dirname or os.curdir)
+        if names is not None and basename.lower() not in names:
+            return False
+        return os.path.exists(path)
+
+    def which(self, name: str, path: T.Optional[str]) -> T.Optional[str]:
+        """shutil.which() that looks names up in the listings of PATH."""
+        if os.sep in name or '/' in name:
+            # Not looked up in PATH at all
+            return shutil.which(name, path=path)
+        if path is None:
+            path = os.environ.get('PATH', None)
+            if path is None:
+                try:
+                    path = os.confstr('CS_PATH')
+                except (AttributeError, ValueError):
+                    path = os.defpath
+        if not path:
+            return None
+        seen: T.Set[str] = set()
+        for d in path.split(os.pathsep):
+            if d in seen:
+                continue
+            seen.add(d)
+            trial = os.path.join(d, name)
+            if self.exists(trial) and os.access(trial, os.X_OK) and not os.path.isdir(trial):
+                return trial
+        return None
+
+_directory_index = _DirectoryIndex()
+
+# Interpreter of scripts, keyed by path, mtime and size of the script.
+_shebang_cache: T.Dict[T.Tuple[str, int, int], T.Optional[T.List[str]]] = {}
+
+# Version of programs, keyed by command and mtime and size of the program.
+_version_cache: T.Dict[T.Tuple[T.Tuple[str, ...], T.Tuple[int, int]], str] = {}
+
+
 class ExternalProgram(mesonlib.HoldableObject):
 
     """A program that is found on the system."""
@@ -100,8 +184,23 @@ class ExternalProgram(mesonlib.HoldableObject):
         '''Human friendly description of the command'''
         return ' '.join(self.command)
 
+    def _version_cache_key(self) -> T.Optional[T.Tuple[T.Tuple[str, ...], T.Tuple[int, int]]]:
+        try:
+            st = os.stat(self.path)
+        except (OSError, TypeError):
+            return None
+        return tuple(self.get_command()), (st.st_mtime_ns, st.st_size)
+
     def get_version(self, interpreter: 'Interpreter') -> str:
         if not self.cached_version:
+            # Many find_program() calls with a version requirement find the
+            # same program, only run it once per configure.
+            key = self._version_cache_key()
+            if key in _version_cache:
+                # Running it would have made it a build definition file
+                interpreter.add_build_def_file(self.get_path())
+                self.cached_version = _version_cache[key]
+                return self.cached_version
             raw_cmd = self.get_command() + ['--version']
             cmd: T.List[T.Union[str, ExternalProgram]] = [self, '--version']
             res = interpreter.run_command_impl(interpreter.current_node, cmd, {}, True)
@@ -114,6 +213,8 @@ class ExternalProgram(mesonlib.HoldableObject):
             if not match:
                 raise mesonlib.MesonException(f'Could not find a version number in output of {raw_cmd!r}')
             self.cached_version = match.group(1)
+            if key is not None:
+                _version_cache[key] = self.cached_version
         return self.cached_version
 
     @classmethod
@@ -173,6 +274,18 @@ class ExternalProgram(mesonlib.HoldableObject):
         the interpreter to use. This is useful if the script is not executable
         or if we're on Windows (which does not understand shebangs).
         """
+        try:
+            st = os.stat(script)
+        except OSError:
+            return ExternalProgram._parse_shebang(script)
+        key = (script, st.st_mtime_ns, st.st_size)
+        if key not in _shebang_cache:
+            _shebang_cache[key] = ExternalProgram._parse_shebang(script)
+        commands = _shebang_cache[key]
+        return None if commands is None else commands.copy()
+
+    @staticmethod
+    def _parse_shebang(script: str) -> T.Optional[T.List[str]]:
         try:
             with open(script, encoding='utf-8') as f:
                 first_line = f.readline().strip()
@@ -227,7 +340,7 @@ class ExternalProgram(mesonlib.HoldableObject):
         if search_dir is None:
             return None
         trial = os.path.join(search_dir, name)
-        if os.path.exists(trial):
+        if _directory_index.exists(trial):
             if self._is_executable(trial):
                 return [trial]
             # Now getting desperate. Maybe it is a script file that is
@@ -238,7 +351,7 @@ class ExternalProgram(mesonlib.HoldableObject):
             if mesonlib.is_windows():
                 for ext in self.windows_exts:
                     trial_ext = f'{trial}.{ext}'
-                    if os.path.exists(trial_ext):
+                    if _directory_index.exists(trial_ext):
                         return [trial_ext]
         return None
 
@@ -300,12 +413,14 @@ class ExternalProgram(mesonlib.HoldableObject):
         path = os.environ.get('PATH', None)
         if mesonlib.is_windows() and path:
             path = self._windows_sanitize_path(path)
-        command = shutil.which(name, path=path)
         if mesonlib.is_windows():
+            command = shutil.which(name, path=path)
             return self._search_windows_special_cases(name, command)
-        # On UNIX-like platforms, shutil.which() is enough to find
-        # all executables whether in PATH or with an absolute path
-        return [command]
+        # On UNIX-like platforms, a shutil.which() search is enough to find
+        # all executables whether in PATH or with a directory component
+        if os.sep in name or '/' in name:
+            return [shutil.which(name, path=path)]
+        return [_directory_index.which(name, path)]
 
     def found(self) -> bool:
         return self.command[0] is not None
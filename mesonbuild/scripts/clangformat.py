@@ -13,10 +13,11 @@
 # limitations under the License.
 
 import argparse
+import hashlib
 import subprocess
 from pathlib import Path
 
-from .run_tool import run_tool
+from .run_tool import run_tool, add_arguments, ToolCache, config_hash, file_hash, program_stamp
 from ..environment import detect_clangformat
 import typing as T
 
@@ -34,11 +35,24 @@ def run_clang_format(fname: Path, exelist: T.List[str], check: bool) -> subproce
             ret.returncode = 1
     return ret
 
+def clang_format_key(exelist: T.List[str]) -> T.Callable[[Path], str]:
+    """A file that was formatted stays formatted until it or the style changes."""
+    program = program_stamp(exelist)
+
+    def key(fname: Path) -> str:
+        h = hashlib.sha256()
+        h.update(program.encode())
+        h.update(config_hash(fname, ['.clang-format', '_clang-format']).encode())
+        h.update(file_hash(fname).encode())
+        return h.hexdigest()
+    return key
+
 def run(args: T.List[str]) -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument('--check', action='store_true')
     parser.add_argument('sourcedir')
     parser.add_argument('builddir')
+    add_arguments(parser)
     options = parser.parse_args(args)
 
     srcdir = Path(options.sourcedir)
@@ -49,4 +63,11 @@ def run(args: T.List[str]) -> int:
         print('Could not execute clang-format "%s"' % ' '.join(exelist))
         return 1
 
-    return run_tool('clang-format', srcdir, builddir, run_clang_format, exelist, options.check)
+    cache = None
+    if options.cache:
+        # Shared by clang-format and clang-format-check, both only record
+        # files that are already formatted.
+        cache = ToolCache(builddir / 'meson-private' / 'clang-format-cache.json', clang_format_key(exelist))
+
+    return run_tool('clang-format', srcdir, builddir, run_clang_format, exelist, options.check,
+                    jobs=options.jobs, changed_since=options.changed_since, cache=cache)
@@ -13,22 +13,75 @@
 # limitations under the License.
 
 import argparse
+import hashlib
+import json
+import os
 import subprocess
 from pathlib import Path
 
-from .run_tool import run_tool
+from .run_tool import run_tool, add_arguments, ToolCache, config_hash, file_hash, program_stamp
+from ..buildgraph import load_ninja_deps
 import typing as T
 
 def run_clang_tidy(fname: Path, builddir: Path) -> subprocess.CompletedProcess:
-    return subprocess.run(['clang-tidy', '-p', str(builddir), str(fname)])
+    # The output is printed by run_tool() once the file is done, so that
+    # the diagnostics of files processed in parallel are not interleaved.
+    return subprocess.run(['clang-tidy', '-p', str(builddir), str(fname)],
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                          universal_newlines=True, errors='replace')
+
+def load_compile_commands(builddir: Path) -> T.Dict[str, T.Dict[str, T.Any]]:
+    try:
+        with (builddir / 'compile_commands.json').open(encoding='utf-8') as f:
+            commands = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {os.path.normpath(os.path.join(c['directory'], c['file'])): c for c in commands}
+
+class ClangTidyKey:
+
+    """Everything the diagnostics for a translation unit depend on.
+
+    Files without a compile command, such as headers, or whose object file
+    has no dependency information because it was not built yet, cannot be
+    cached.
+    """
+
+    def __init__(self, builddir: Path) -> None:
+        self.commands = load_compile_commands(builddir)
+        self.deps = load_ninja_deps(str(builddir))
+        self.program = program_stamp(['clang-tidy'])
+
+    def __call__(self, fname: Path) -> T.Optional[str]:
+        command = self.commands.get(os.path.normpath(os.path.abspath(fname)))
+        if command is None:
+            return None
+        deps = self.deps.get(command.get('output', ''))
+        if deps is None:
+            return None
+        h = hashlib.sha256()
+        h.update(self.program.encode())
+        h.update(json.dumps([command['directory'], command.get('arguments', command.get('command'))]).encode())
+        h.update(config_hash(fname, ['.clang-tidy', '_clang-tidy']).encode())
+        h.update(file_hash(fname).encode())
+        for dep in deps:
+            h.update(dep.encode())
+            h.update(file_hash(dep).encode())
+        return h.hexdigest()
 
 def run(args: T.List[str]) -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument('sourcedir')
     parser.add_argument('builddir')
+    add_arguments(parser)
     options = parser.parse_args(args)
 
     srcdir = Path(options.sourcedir)
     builddir = Path(options.builddir)
 
-    return run_tool('clang-tidy', srcdir, builddir, run_clang_tidy, builddir)
+    cache = None
+    if options.cache:
+        cache = ToolCache(builddir / 'meson-private' / 'clang-tidy-cache.json', ClangTidyKey(builddir))
+
+    return run_tool('clang-tidy', srcdir, builddir, run_clang_tidy, builddir,
+                    jobs=options.jobs, changed_since=options.changed_since, cache=cache)
@@ -12,6 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+import json
+import os
+import shutil
 import subprocess
 import itertools
 import fnmatch
@@ -22,6 +26,11 @@ from ..compilers import lang_suffixes
 from ..mesonlib import Popen_safe
 import typing as T
 
+if T.TYPE_CHECKING:
+    import argparse
+
+_file_hashes = {}  # type: T.Dict[T.Tuple[str, int, int], str]
+
 def parse_pattern_file(fname: Path) -> T.List[str]:
     patterns = []
     try:
@@ -34,7 +43,102 @@ def parse_pattern_file(fname: Path) -> T.List[str]:
         pass
     return patterns
 
-def run_tool(name: str, srcdir: Path, builddir: Path, fn: T.Callable[..., subprocess.CompletedProcess], *args: T.Any) -> int:
+def file_hash(fname: T.Union[str, Path]) -> str:
+    """sha256 of a file, only computed again if its mtime or size change."""
+    try:
+        st = os.stat(fname)
+    except OSError:
+        return 'missing'
+    key = (str(fname), st.st_mtime_ns, st.st_size)
+    if key not in _file_hashes:
+        h = hashlib.sha256()
+        with open(fname, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(block)
+        _file_hashes[key] = h.hexdigest()
+    return _file_hashes[key]
+
+def config_hash(fname: Path, config_names: T.Sequence[str]) -> str:
+    """Hash of the configuration files a tool would use for fname.
+
+    Clang tools use the configuration file found in the closest parent
+    directory, all of them are hashed to keep this simple.
+    """
+    h = hashlib.sha256()
+    for parent in fname.resolve().parents:
+        for name in config_names:
+            config = parent / name
+            if config.is_file():
+                h.update(str(config).encode())
+                h.update(file_hash(config).encode())
+    return h.hexdigest()
+
+def program_stamp(exelist: T.List[str]) -> str:
+    """Identify the installed version of a program without running it."""
+    path = shutil.which(exelist[0])
+    if path is None:
+        return ' '.join(exelist)
+    st = os.stat(path)
+    cmd = ' '.join(exelist)
+    return f'{cmd} {path} {st.st_mtime_ns} {st.st_size}'
+
+class ToolCache:
+
+    """Output of a tool for files whose inputs did not change since it last ran.
+
+    key_fn returns a key covering everything the result depends on, or None
+    when it cannot tell, in which case the tool is always run. A result is
+    only stored when the tool succeeded and left the file untouched.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Path, key_fn: T.Callable[[Path], T.Optional[str]]) -> None:
+        self.path = path
+        self.key_fn = key_fn
+        self.entries = {}  # type: T.Dict[str, T.Tuple[str, str]]
+        try:
+            with path.open(encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.entries = {k: (v[0], v[1]) for k, v in data['entries'].items()}
+        except (OSError, ValueError, KeyError, TypeError, IndexError):
+            pass
+
+    def key(self, fname: Path) -> T.Optional[str]:
+        return self.key_fn(fname)
+
+    def get(self, fname: Path, key: str) -> T.Optional[str]:
+        entry = self.entries.get(str(fname))
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        return None
+
+    def set(self, fname: Path, key: str, output: str) -> None:
+        self.entries[str(fname)] = (key, output)
+
+    def save(self) -> None:
+        tmp = self.path.with_name(self.path.name + '~')
+        try:
+            with tmp.open('w', encoding='utf-8') as f:
+                json.dump({'version': self.VERSION, 'entries': self.entries}, f)
+            os.replace(str(tmp), str(self.path))
+        except OSError:
+            pass
+
+def get_changed_files(srcdir: Path, rev: str) -> T.Set[Path]:
+    """Files of the working tree that differ from rev, and untracked files."""
+    p, o, e = Popen_safe(['git', 'diff', '--name-only', '--relative', rev, '--'], cwd=srcdir)
+    if p.returncode != 0:
+        raise ValueError(f'Could not list files changed since {rev}: {e.strip()}')
+    files = o.splitlines()
+    p, o, e = Popen_safe(['git', 'ls-files', '--others', '--exclude-standard'], cwd=srcdir)
+    if p.returncode == 0:
+        files += o.splitlines()
+    return {Path(srcdir, f) for f in files}
+
+def run_tool(name: str, srcdir: Path, builddir: Path, fn: T.Callable[..., subprocess.CompletedProcess], *args: T.Any,
+             jobs: int = 0, changed_since: T.Optional[str] = None, cache: T.Optional[ToolCache] = None) -> int:
     patterns = parse_pattern_file(srcdir / f'.{name}-include')
     globs: T.Union[T.List[T.List[Path]], T.List[T.Generator[Path, None, None]]]
     if patterns:
@@ -51,15 +155,46 @@ def run_tool(name: str, srcdir: Path, builddir: Path, fn: T.Callable[..., subpro
     suffixes = set(lang_suffixes['c']).union(set(lang_suffixes['cpp']))
     suffixes.add('h')
     suffixes = {f'.{s}' for s in suffixes}
+    changed = None  # type: T.Optional[T.Set[Path]]
+    if changed_since is not None:
+        try:
+            changed = get_changed_files(srcdir, changed_since)
+        except ValueError as e:
+            print(e)
+            return 1
     futures = []
     returncode = 0
-    with ThreadPoolExecutor() as e:
+    # Subprocesses do the work, one thread per job is enough
+    with ThreadPoolExecutor(max_workers=jobs if jobs > 0 else os.cpu_count()) as executor:
         for f in itertools.chain(*globs):
             strf = str(f)
             if f.is_dir() or f.suffix not in suffixes or \
                 any(fnmatch.fnmatch(strf, i) for i in ignore):
                 continue
-            futures.append(e.submit(fn, f, *args))
-        if futures:
-            returncode = max(x.result().returncode for x in futures)
+            if changed is not None and f not in changed:
+                continue
+            key = cache.key(f) if cache else None
+            if cache and key is not None:
+                output = cache.get(f, key)
+                if output is not None:
+                    print(output, end='')
+                    continue
+            futures.append((f, key, executor.submit(fn, f, *args)))
+        for f, key, future in futures:
+            ret = future.result()
+            if isinstance(ret.stdout, str):
+                print(ret.stdout, end='')
+            returncode = max(returncode, ret.returncode)
+            if cache and key is not None and ret.returncode == 0 and cache.key(f) == key:
+                cache.set(f, key, ret.stdout if isinstance(ret.stdout, str) else '')
+    if cache:
+        cache.save()
     return returncode
+
+def add_arguments(parser: 'argparse.ArgumentParser') -> None:
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='number of files to process in parallel (default: number of processors)')
+    parser.add_argument('--changed-since', metavar='REV', default=None,
+                        help='only process files that differ from this git revision, or are untracked')
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help='process files again even if they did not change since the last run')
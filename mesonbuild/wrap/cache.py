@@ -0,0 +1,171 @@
+# Copyright 2021 The Meson development team
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''User-wide, content-addressed cache of downloaded wrap files.
+
+Every file downloaded for a wrap with a `*_url` and `*_hash` is stored once
+under its sha256 in the user cache directory, and shared by all projects
+and build directories of that user. The least recently used entries are
+removed when the cache grows over its size limit.
+'''
+
+import hashlib
+import os
+import re
+import time
+import typing as T
+import uuid
+
+from .. import mesonlib
+
+DEFAULT_MAX_SIZE = 4 * 1024 ** 3
+
+_HASH_RE = re.compile('^[0-9a-f]{64}$')
+
+class CacheEntry(T.NamedTuple):
+    sha256: str
+    path: str
+    size: int
+    last_used: float
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def parse_size(value: str) -> int:
+    '''Parse a size such as 500M or 2G into a number of bytes.'''
+    m = re.fullmatch(r'(\d+)([KMG]?)i?B?', value.strip(), re.IGNORECASE)
+    if not m:
+        raise ValueError(f'invalid size {value!r}')
+    return int(int(m.group(1)) * 1024 ** 'BKMG'.index(m.group(2).upper() or 'B'))
+
+class WrapCache:
+    def __init__(self, cachedir: T.Optional[str] = None, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.cachedir = cachedir or os.path.join(mesonlib.user_cache_dir(), 'wraps')
+        self.max_size = max_size
+        # Files were added since the cache was last pruned
+        self.added = False
+
+    def entry_path(self, sha256: str) -> str:
+        return os.path.join(self.cachedir, sha256.lower())
+
+    def get(self, sha256: str, dest: str) -> bool:
+        '''
+        Place the cached file with the given hash at dest, sharing its data
+        whenever the filesystem allows. Returns False if it is not cached.
+        '''
+        path = self.entry_path(sha256)
+        if not os.path.isfile(path):
+            return False
+        if file_sha256(path) != sha256.lower():
+            mesonlib.windows_proof_rm(path)
+            return False
+        try:
+            if os.path.exists(dest):
+                os.unlink(dest)
+            try:
+                os.link(path, dest)
+            except OSError:
+                mesonlib.copyfile_cow(path, dest)
+            # The modification time records when the entry was last used,
+            # atime is not reliable on filesystems mounted with noatime.
+            os.utime(path)
+        except OSError:
+            return False
+        return True
+
+    def add(self, path: str, sha256: str) -> None:
+        '''
+        Store a copy of the file at path, whose content has already been
+        verified to match sha256. Failures are ignored, the cache is only an
+        optimization.
+        '''
+        entry = self.entry_path(sha256)
+        if os.path.exists(entry):
+            return
+        tmpname = os.path.join(self.cachedir, f'.tmp-{uuid.uuid4().hex}')
+        try:
+            os.makedirs(self.cachedir, exist_ok=True)
+            try:
+                os.link(path, tmpname)
+            except OSError:
+                mesonlib.copyfile_cow(path, tmpname)
+            os.utime(tmpname)
+            os.replace(tmpname, entry)
+        except OSError:
+            if os.path.exists(tmpname):
+                os.unlink(tmpname)
+            return
+        self.added = True
+
+    def prune_added(self) -> None:
+        '''
+        Bring the cache back to its size limit if files were added to it.
+        Called once all the files of a command have been added, rather than
+        walking the whole cache after each one.
+        '''
+        if self.added:
+            self.added = False
+            self.prune(self.max_size)
+
+    def entries(self) -> T.List[CacheEntry]:
+        '''All entries, least recently used first.'''
+        result = []  # type: T.List[CacheEntry]
+        try:
+            names = os.listdir(self.cachedir)
+        except FileNotFoundError:
+            return result
+        for name in names:
+            if not _HASH_RE.match(name):
+                continue
+            path = os.path.join(self.cachedir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            result.append(CacheEntry(name, path, st.st_size, st.st_mtime))
+        result.sort(key=lambda e: e.last_used)
+        return result
+
+    def verify(self) -> T.List[CacheEntry]:
+        '''Remove and return the entries whose content does not match their hash.'''
+        corrupted = []
+        for e in self.entries():
+            if file_sha256(e.path) != e.sha256:
+                mesonlib.windows_proof_rm(e.path)
+                corrupted.append(e)
+        return corrupted
+
+    def prune(self, max_size: int) -> T.List[CacheEntry]:
+        '''Remove least recently used entries until the cache fits in max_size bytes.'''
+        entries = self.entries()
+        total = sum(e.size for e in entries)
+        removed = []
+        for e in entries:
+            if total <= max_size:
+                break
+            try:
+                os.unlink(e.path)
+            except FileNotFoundError:
+                pass
+            total -= e.size
+            removed.append(e)
+        return removed
+
+def format_entry(e: CacheEntry) -> str:
+    last_used = time.strftime('%Y-%m-%d %H:%M', time.localtime(e.last_used))
+    return f'{e.sha256}  {e.size:>12}  {last_used}'
@@ -14,6 +14,7 @@
 
 from .. import mlog
 import contextlib
+import copy
 import urllib.request
 import urllib.error
 import urllib.parse
@@ -25,11 +26,16 @@ import stat
 import subprocess
 import sys
 import configparser
+import threading
 import typing as T
 import textwrap
+import zipfile
 
+from concurrent.futures import wait
+from concurrent.futures.thread import ThreadPoolExecutor
 from pathlib import Path
 from . import WrapMode
+from .cache import WrapCache
 from .. import coredata
 from ..mesonlib import quiet_git, GIT, ProgressBar, MesonException
 from ..interpreterbase import FeatureNew
@@ -37,6 +43,7 @@ from .. import mesonlib
 
 if T.TYPE_CHECKING:
     import http.client
+    from concurrent.futures import Future
 
 try:
     # Importing is just done to check if SSL exists, so all warnings
@@ -52,6 +59,19 @@ WHITELIST_SUBDOMAIN = 'wrapdb.mesonbuild.com'
 
 ALL_TYPES = ['file', 'git', 'hg', 'svn']
 
+# Serialize updates of each git reference repository between threads, see
+# Resolver.update_git_reference().
+_git_reference_locks = {}  # type: T.Dict[str, threading.Lock]
+_git_reference_locks_lock = threading.Lock()
+
+# Written in the directory of a wrap-file subproject once its source and patch
+# archives have been extracted.
+STAMP_FILENAME = '.meson-wrap-stamp'
+
+# Prefix of the temporary directories subprojects are fetched into, in the
+# subprojects directory.
+FETCH_TMP_PREFIX = '.meson-fetch-'
+
 def whitelist_wrapdb(urlstr: str) -> urllib.parse.ParseResult:
     """ raises WrapException if not whitelisted subdomain """
     url = urllib.parse.urlparse(urlstr)
@@ -187,6 +207,76 @@ class PackageDefinition:
         except KeyError:
             raise WrapException(f'Missing key {key!r} in {self.basename}')
 
+    def get_stamp(self) -> T.Optional[str]:
+        '''
+        Identifies the content of a wrap-file subproject by the hashes of its
+        archives. Returns None when that content is not fully determined by
+        hashes, for example when a patch_directory is overlaid.
+        '''
+        if self.type != 'file' or 'patch_directory' in self.values:
+            return None
+        lines = []
+        for what in ['source', 'patch']:
+            if what + '_filename' not in self.values:
+                continue
+            if what + '_hash' not in self.values:
+                return None
+            lines.append(f'{what}_hash = {self.values[what + "_hash"].lower()}\n')
+        return ''.join(lines)
+
+def read_stamp(dirname: str) -> T.Optional[str]:
+    try:
+        with open(os.path.join(dirname, STAMP_FILENAME), encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def unpack_archive(path: str, extract_dir: str) -> None:
+    '''
+    Like shutil.unpack_archive(), but zip members are decompressed and
+    written by several threads. A zip archive, unlike a compressed tarball,
+    can be decoded from multiple positions at once and zlib releases the GIL.
+    '''
+    if not path.lower().endswith('.zip'):
+        shutil.unpack_archive(path, extract_dir)
+        return
+    with zipfile.ZipFile(path) as zf:
+        members = []  # type: T.List[T.Tuple[zipfile.ZipInfo, str]]
+        for info in zf.infolist():
+            name = info.filename
+            # don't extract absolute paths or ones with .. in them, like shutil does
+            if name.startswith('/') or '..' in name:
+                continue
+            targetpath = os.path.join(extract_dir, *name.split('/'))
+            # Create all directories upfront, the workers only write files.
+            if name.endswith('/'):
+                os.makedirs(targetpath, exist_ok=True)
+            else:
+                os.makedirs(os.path.dirname(targetpath), exist_ok=True)
+                members.append((info, targetpath))
+    if not members:
+        return
+    # Balance the compressed bytes each worker has to decode, each one
+    # reads from its own file handle.
+    num_workers = min(os.cpu_count() or 1, len(members))
+    buckets = [[] for _ in range(num_workers)]  # type: T.List[T.List[T.Tuple[zipfile.ZipInfo, str]]]
+    sizes = [0] * num_workers
+    for member in sorted(members, key=lambda m: m[0].compress_size, reverse=True):
+        i = sizes.index(min(sizes))
+        buckets[i].append(member)
+        sizes[i] += member[0].compress_size
+
+    def extract_members(bucket: T.List[T.Tuple[zipfile.ZipInfo, str]]) -> None:
+        with zipfile.ZipFile(path) as zf:
+            for info, targetpath in bucket:
+                with open(targetpath, 'wb') as target:
+                    with zf.open(info) as source: # [ignore encoding]
+                        shutil.copyfileobj(source, target)
+
+    with ThreadPoolExecutor(num_workers) as executor:
+        # Consume the results to re-raise exceptions from the workers
+        list(executor.map(extract_members, buckets))
+
 def get_directory(subdir_root: str, packagename: str) -> str:
     fname = os.path.join(subdir_root, packagename + '.wrap')
     if os.path.isfile(fname):
@@ -211,9 +301,16 @@ class Resolver:
         self.wrap_mode = wrap_mode
         self.subdir_root = os.path.join(source_dir, subdir)
         self.cachedir = os.path.join(self.subdir_root, 'packagecache')
+        self.user_cache = WrapCache()
         self.wraps = {} # type: T.Dict[str, PackageDefinition]
         self.provided_deps = {} # type: T.Dict[str, PackageDefinition]
         self.provided_programs = {} # type: T.Dict[str, PackageDefinition]
+        # Fetches started by prefetch(), by directory and by the name in the
+        # package cache of the files they download
+        self.prefetched = {} # type: T.Dict[str, Future[None]]
+        self.prefetched_files = {} # type: T.Dict[str, Future[None]]
+        self.prefetch_executor = None # type: T.Optional[ThreadPoolExecutor]
+        self.show_progress = True
         self.load_wraps()
 
     def load_wraps(self) -> None:
@@ -230,7 +327,7 @@ class Resolver:
                 dirs.remove(wrap.directory)
         # Add dummy package definition for directories not associated with a wrap file.
         for i in dirs:
-            if i in ['packagecache', 'packagefiles']:
+            if i in ['packagecache', 'packagefiles'] or i.startswith(FETCH_TMP_PREFIX):
                 continue
             fname = os.path.join(self.subdir_root, i)
             wrap = PackageDefinition(fname, self.subproject)
@@ -250,6 +347,61 @@ class Resolver:
                     raise WrapException(m)
                 self.provided_programs[k] = wrap
 
+    def prefetch(self, num_workers: int) -> None:
+        '''
+        Start fetching every wrap that is not on disk yet, using a pool of
+        worker threads for downloads, clones and archive extraction.
+        resolve() then waits for the matching job instead of fetching the
+        subproject itself. Errors are only reported if the subproject is
+        actually used.
+        '''
+        if self.wrap_mode is WrapMode.nodownload:
+            return
+        for wrap in self.wraps.values():
+            # Wraps can share a directory, it is only fetched once
+            if not wrap.has_wrap or wrap.directory in self.prefetched:
+                continue
+            dirname = os.path.join(self.subdir_root, wrap.directory)
+            if os.path.exists(dirname):
+                continue
+            if self.prefetch_executor is None:
+                self.prefetch_executor = ThreadPoolExecutor(num_workers)
+            r = copy.copy(self)
+            r.packagename = wrap.name
+            r.directory = wrap.directory
+            r.wrap = wrap
+            r.dirname = dirname
+            # Progress bars of concurrent downloads would be interleaved
+            r.show_progress = False
+            # Wraps that download the same file fetch one after the other, the
+            # later ones find it in the package cache.
+            files = [wrap.values[what + '_filename'] for what in ['source', 'patch']
+                     if what + '_url' in wrap.values and what + '_filename' in wrap.values]
+            waits = [self.prefetched_files[f] for f in files if f in self.prefetched_files]
+            future = self.prefetch_executor.submit(self._prefetch_one, r, waits)
+            self.prefetched[wrap.directory] = future
+            for f in files:
+                self.prefetched_files[f] = future
+
+    @staticmethod
+    def _prefetch_one(r: 'Resolver', waits: T.List['Future[None]']) -> None:
+        # Errors of the fetches waited on are reported by their own wraps
+        wait(waits)
+        r.fetch()
+
+    def finish_prefetch(self) -> None:
+        '''
+        Wait for fetches started by prefetch() that were never waited on by
+        resolve(), so the subprojects directory is left in a consistent state,
+        then prune the user cache of the files they added.
+        '''
+        if self.prefetch_executor is not None:
+            self.prefetch_executor.shutdown(wait=True)
+            self.prefetch_executor = None
+        self.prefetched = {}
+        self.prefetched_files = {}
+        self.user_cache.prune_added()
+
     def merge_wraps(self, other_resolver: 'Resolver') -> None:
         for k, v in other_resolver.wraps.items():
             self.wraps.setdefault(k, v)
@@ -311,6 +463,22 @@ class Resolver:
             self.dirname = self.wrap.filename
         rel_path = os.path.relpath(self.dirname, self.source_dir)
 
+        # The subproject is being fetched by prefetch(), maybe for another wrap
+        # with the same directory, wait for it to be ready. This re-raises any
+        # error that happened in the worker.
+        future = self.prefetched.get(self.directory) if self.wrap.has_wrap else None
+        if future is not None:
+            future.result()
+
+        # An extracted wrap-file subproject is never extracted again, but
+        # tell the user when the wrap file now points to other archives.
+        stamp = self.wrap.get_stamp() if self.wrap.has_wrap else None
+        if stamp is not None and os.path.isdir(self.dirname):
+            previous = read_stamp(self.dirname)
+            if previous is not None and previous != stamp:
+                mlog.warning(f'Subproject {self.packagename!r} was extracted from other archives than '
+                             f'the ones in {self.wrap.basename}, run "meson subprojects update --reset" to update it.')
+
         meson_file = os.path.join(self.dirname, 'meson.build')
         cmake_file = os.path.join(self.dirname, 'CMakeLists.txt')
 
@@ -323,26 +491,7 @@ class Resolver:
         if method == 'cmake' and os.path.exists(cmake_file):
             return rel_path
 
-        # Check if the subproject is a git submodule
-        self.resolve_git_submodule()
-
-        if os.path.exists(self.dirname):
-            if not os.path.isdir(self.dirname):
-                raise WrapException('Path already exists but is not a directory')
-        else:
-            if self.wrap.type == 'file':
-                self.get_file()
-            else:
-                self.check_can_download()
-                if self.wrap.type == 'git':
-                    self.get_git()
-                elif self.wrap.type == "hg":
-                    self.get_hg()
-                elif self.wrap.type == "svn":
-                    self.get_svn()
-                else:
-                    raise WrapException(f'Unknown wrap type {self.wrap.type!r}')
-            self.apply_patch()
+        self.fetch()
 
         # A meson.build or CMakeLists.txt file is required in the directory
         if method == 'meson' and not os.path.exists(meson_file):
@@ -352,6 +501,49 @@ class Resolver:
 
         return rel_path
 
+    def fetch(self) -> None:
+        # Check if the subproject is a git submodule
+        self.resolve_git_submodule()
+
+        if os.path.exists(self.dirname):
+            if not os.path.isdir(self.dirname):
+                raise WrapException('Path already exists but is not a directory')
+            return
+        # Fetch into a temporary directory and only move the subproject in
+        # place once complete, a failed or interrupted fetch must not leave
+        # a partial subproject that later configures would use.
+        dirname, subdir_root = self.dirname, self.subdir_root
+        self.subdir_root = tempfile.mkdtemp(prefix=FETCH_TMP_PREFIX, dir=subdir_root)
+        self.dirname = os.path.join(self.subdir_root, self.directory)
+        try:
+            self.fetch_new()
+            if not os.path.isdir(self.dirname):
+                raise WrapException(f'{self.wrap.basename} did not create directory {self.directory!r}')
+            os.makedirs(os.path.dirname(dirname), exist_ok=True)
+            os.rename(self.dirname, dirname)
+        finally:
+            mesonlib.windows_proof_rmtree(self.subdir_root)
+            self.dirname, self.subdir_root = dirname, subdir_root
+
+    def fetch_new(self) -> None:
+        if self.wrap.type == 'file':
+            self.get_file()
+        else:
+            self.check_can_download()
+            if self.wrap.type == 'git':
+                self.get_git()
+            elif self.wrap.type == "hg":
+                self.get_hg()
+            elif self.wrap.type == "svn":
+                self.get_svn()
+            else:
+                raise WrapException(f'Unknown wrap type {self.wrap.type!r}')
+        self.apply_patch()
+        stamp = self.wrap.get_stamp()
+        if stamp is not None:
+            with open(os.path.join(self.dirname, STAMP_FILENAME), 'w', encoding='utf-8') as f:
+                f.write(stamp)
+
     def check_can_download(self) -> None:
         # Don't download subproject data based on wrap file if requested.
         # Git submodules are ok (see above)!
@@ -402,7 +594,7 @@ class Resolver:
         if 'lead_directory_missing' in self.wrap.values:
             os.mkdir(self.dirname)
             extract_dir = self.dirname
-        shutil.unpack_archive(path, extract_dir)
+        unpack_archive(path, extract_dir)
 
     def get_git(self) -> None:
         if not GIT:
@@ -414,6 +606,9 @@ class Resolver:
         if self.wrap.values.get('depth', '') != '':
             is_shallow = True
             depth_option = ['--depth', self.wrap.values.get('depth')]
+        filter_option = []   # type: T.List[str]
+        if self.wrap.values.get('clone-filter', '') != '':
+            filter_option = ['--filter', self.wrap.values.get('clone-filter')]
         # for some reason git only allows commit ids to be shallowly fetched by fetch not with clone
         if is_shallow and self.is_git_full_commit_id(revno):
             # git doesn't support directly cloning shallowly for commits,
@@ -421,7 +616,7 @@ class Resolver:
             verbose_git(['-c', 'init.defaultBranch=meson-dummy-branch', 'init', self.directory], self.subdir_root, check=True)
             verbose_git(['remote', 'add', 'origin', self.wrap.get('url')], self.dirname, check=True)
             revno = self.wrap.get('revision')
-            verbose_git(['fetch', *depth_option, 'origin', revno], self.dirname, check=True)
+            verbose_git(['fetch', *depth_option, *filter_option, 'origin', revno], self.dirname, check=True)
             verbose_git(checkout_cmd, self.dirname, check=True)
             if self.wrap.values.get('clone-recursive', '').lower() == 'true':
                 verbose_git(['submodule', 'update', '--init', '--checkout',
@@ -431,13 +626,20 @@ class Resolver:
                 verbose_git(['remote', 'set-url', '--push', 'origin', push_url], self.dirname, check=True)
         else:
             if not is_shallow:
-                verbose_git(['clone', self.wrap.get('url'), self.directory], self.subdir_root, check=True)
+                reference_option = []  # type: T.List[str]
+                reference = self.update_git_reference(self.wrap.get('url'))
+                if reference:
+                    # The checkout copies the objects it borrowed, it must
+                    # not break when the mirror is pruned or deleted.
+                    reference_option = ['--reference-if-able', reference, '--dissociate']
+                verbose_git(['clone', *filter_option, *reference_option, self.wrap.get('url'), self.directory],
+                            self.subdir_root, check=True)
                 if revno.lower() != 'head':
                     if not verbose_git(checkout_cmd, self.dirname):
                         verbose_git(['fetch', self.wrap.get('url'), revno], self.dirname, check=True)
                         verbose_git(checkout_cmd, self.dirname, check=True)
             else:
-                verbose_git(['clone', *depth_option, '--branch', revno, self.wrap.get('url'),
+                verbose_git(['clone', *depth_option, *filter_option, '--branch', revno, self.wrap.get('url'),
                              self.directory], self.subdir_root, check=True)
             if self.wrap.values.get('clone-recursive', '').lower() == 'true':
                 verbose_git(['submodule', 'update', '--init', '--checkout', '--recursive', *depth_option],
@@ -446,6 +648,36 @@ class Resolver:
             if push_url:
                 verbose_git(['remote', 'set-url', '--push', 'origin', push_url], self.dirname, check=True)
 
+    def update_git_reference(self, url: str) -> T.Optional[str]:
+        '''
+        When the MESON_WRAP_GIT_REFERENCE environment variable names a
+        directory, keep there a bare mirror of every git repository cloned
+        for a wrap, and return the mirror for url after fetching its new
+        objects. Clones copy their objects from it, so each object is only
+        downloaded once per machine. Returns None when not enabled or the
+        mirror could not be updated.
+        '''
+        reference_dir = os.environ.get('MESON_WRAP_GIT_REFERENCE')
+        if not reference_dir:
+            return None
+        name = os.path.basename(url.rstrip('/'))
+        if name.endswith('.git'):
+            name = name[:-4]
+        digest = hashlib.sha256(url.encode()).hexdigest()[:12]
+        mirror = os.path.join(os.path.abspath(reference_dir), f'{name}-{digest}.git')
+        with _git_reference_locks_lock:
+            lock = _git_reference_locks.setdefault(mirror, threading.Lock())
+        with lock:
+            if os.path.isdir(mirror):
+                ok, out = quiet_git(['fetch', '--prune', '--quiet'], mirror)
+            else:
+                os.makedirs(reference_dir, exist_ok=True)
+                ok, out = quiet_git(['clone', '--mirror', '--quiet', url, mirror], reference_dir)
+        if not ok:
+            mlog.warning(f'Could not update git reference repository {mirror}:\n{out}')
+            return None
+        return mirror
+
     def is_git_full_commit_id(self, revno: str) -> bool:
         result = False
         if len(revno) in (40, 64): # 40 for sha1, 64 for upcoming sha256
@@ -492,8 +724,9 @@ class Resolver:
                 dlsize = int(resp.info()['Content-Length'])
             except TypeError:
                 dlsize = None
-            if dlsize is None:
-                print('Downloading file of unknown size.')
+            if dlsize is None or not self.show_progress:
+                if dlsize is None:
+                    print('Downloading file of unknown size.')
                 while True:
                     block = resp.read(blocksize)
                     if block == b'':
@@ -557,7 +790,12 @@ class Resolver:
                 return cache_path
 
             os.makedirs(self.cachedir, exist_ok=True)
+            dhash = self.wrap.get(what + '_hash').lower()
+            if self.user_cache.get(dhash, cache_path):
+                mlog.log('Using', mlog.bold(self.packagename), what, 'from user cache.')
+                return cache_path
             self.download(what, cache_path)
+            self.user_cache.add(cache_path, dhash)
             return cache_path
         else:
             path = Path(self.wrap.filesdir) / filename
@@ -575,10 +813,10 @@ class Resolver:
         if 'patch_filename' in self.wrap.values:
             path = self.get_file_internal('patch')
             try:
-                shutil.unpack_archive(path, self.subdir_root)
+                unpack_archive(path, self.subdir_root)
             except Exception:
                 with tempfile.TemporaryDirectory() as workdir:
-                    shutil.unpack_archive(path, workdir)
+                    unpack_archive(path, workdir)
                     self.copy_tree(workdir, self.subdir_root)
         elif 'patch_directory' in self.wrap.values:
             patch_dir = self.wrap.values['patch_directory']
@@ -589,7 +827,8 @@ class Resolver:
 
     def copy_tree(self, root_src_dir: str, root_dst_dir: str) -> None:
         """
-        Copy directory tree. Overwrites also read only files.
+        Copy directory tree. Overwrites also read only files. Files share
+        their data blocks with the source when the filesystem supports it.
         """
         for src_dir, _, files in os.walk(root_src_dir):
             dst_dir = src_dir.replace(root_src_dir, root_dst_dir, 1)
@@ -604,4 +843,4 @@ class Resolver:
                     except PermissionError:
                         os.chmod(dst_file, stat.S_IWUSR)
                         os.remove(dst_file)
-                shutil.copy2(src_file, dst_dir)
+                mesonlib.copyfile_cow(src_file, dst_file)
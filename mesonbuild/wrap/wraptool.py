@@ -22,6 +22,7 @@ from glob import glob
 from urllib.parse import urlparse
 from urllib.request import urlopen
 from .wrap import WrapException
+from .cache import WrapCache, DEFAULT_MAX_SIZE, format_entry, parse_size
 
 from .. import mesonlib
 
@@ -58,6 +59,21 @@ def add_arguments(parser: 'argparse.ArgumentParser') -> None:
     p.add_argument('project_path')
     p.set_defaults(wrap_func=promote)
 
+    p = subparsers.add_parser('cache', help='manage the user-wide cache of downloaded wrap files')
+    cache_parsers = p.add_subparsers(title='Cache commands', dest='cache_command')
+    cache_parsers.required = True
+
+    p = cache_parsers.add_parser('list', help='list cached files, least recently used first')
+    p.set_defaults(wrap_func=cache_list)
+
+    p = cache_parsers.add_parser('verify', help='remove cached files whose content does not match their hash')
+    p.set_defaults(wrap_func=cache_verify)
+
+    p = cache_parsers.add_parser('prune', help='remove least recently used files until the cache fits in the given size')
+    p.add_argument('--max-size', default=DEFAULT_MAX_SIZE, type=parse_size,
+                   help='maximum size of the cache, for example 500M or 2G (default: 4G)')
+    p.set_defaults(wrap_func=cache_prune)
+
 def get_releases() -> T.Dict[str, T.Any]:
     url = urlopen('https://wrapdb.mesonbuild.com/v2/releases.json')
     return T.cast(T.Dict[str, T.Any], json.loads(url.read().decode()))
@@ -219,6 +235,28 @@ def status(options: 'argparse.Namespace') -> None:
         else:
             print('', name, f'not up to date. Have {current_branch} {current_revision}, but {latest_branch} {latest_revision} is available.')
 
+def cache_list(options: 'argparse.Namespace') -> None:
+    cache = WrapCache()
+    entries = cache.entries()
+    for e in entries:
+        print(format_entry(e))
+    print(f'{len(entries)} files, {sum(e.size for e in entries)} bytes in {cache.cachedir}')
+
+def cache_verify(options: 'argparse.Namespace') -> None:
+    cache = WrapCache()
+    corrupted = cache.verify()
+    for e in corrupted:
+        print('Removed corrupted file', e.sha256)
+    if corrupted:
+        raise SystemExit(1)
+    print('All cached files are valid.')
+
+def cache_prune(options: 'argparse.Namespace') -> None:
+    removed = WrapCache().prune(options.max_size)
+    for e in removed:
+        print('Removed', e.sha256)
+    print(f'Freed {sum(e.size for e in removed)} bytes.')
+
 def run(options: 'argparse.Namespace') -> int:
     options.wrap_func(options)
     return 0
@@ -0,0 +1,11 @@
+#ifdef PREV
+int PREV(void);
+#endif
+
+int FUNC(void) {
+#ifdef PREV
+    return PREV() + 1;
+#else
+    return 1;
+#endif
+}
@@ -0,0 +1,5 @@
+int LAST(void);
+
+int main(void) {
+    return LAST() == DEPTH ? 0 : 1;
+}
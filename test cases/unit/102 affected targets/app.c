@@ -0,0 +1,5 @@
+int libf(void);
+
+int main(void) {
+    return libf();
+}
@@ -0,0 +1,6 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+sys.exit(0 if os.path.isfile(sys.argv[1]) else 1)
@@ -0,0 +1,6 @@
+#!/usr/bin/env python3
+
+import sys
+
+with open(sys.argv[1], "w") as f:
+    f.write("int main(void) { return 0; }\n")
@@ -0,0 +1 @@
+int libf(void);
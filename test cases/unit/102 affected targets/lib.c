@@ -0,0 +1,5 @@
+#include "lib.h"
+
+int libf(void) {
+    return 0;
+}
@@ -0,0 +1,208 @@
+struct entry { int id; const char *name; };
+
+static const struct entry table[] = {
+  { 0, "entry 0" },
+  { 1, "entry 1" },
+  { 2, "entry 2" },
+  { 3, "entry 3" },
+  { 4, "entry 4" },
+  { 5, "entry 5" },
+  { 6, "entry 6" },
+  { 7, "entry 7" },
+  { 8, "entry 8" },
+  { 9, "entry 9" },
+  { 10, "entry 10" },
+  { 11, "entry 11" },
+  { 12, "entry 12" },
+  { 13, "entry 13" },
+  { 14, "entry 14" },
+  { 15, "entry 15" },
+  { 16, "entry 16" },
+  { 17, "entry 17" },
+  { 18, "entry 18" },
+  { 19, "entry 19" },
+  { 20, "entry 20" },
+  { 21, "entry 21" },
+  { 22, "entry 22" },
+  { 23, "entry 23" },
+  { 24, "entry 24" },
+  { 25, "entry 25" },
+  { 26, "entry 26" },
+  { 27, "entry 27" },
+  { 28, "entry 28" },
+  { 29, "entry 29" },
+  { 30, "entry 30" },
+  { 31, "entry 31" },
+  { 32, "entry 32" },
+  { 33, "entry 33" },
+  { 34, "entry 34" },
+  { 35, "entry 35" },
+  { 36, "entry 36" },
+  { 37, "entry 37" },
+  { 38, "entry 38" },
+  { 39, "entry 39" },
+  { 40, "entry 40" },
+  { 41, "entry 41" },
+  { 42, "entry 42" },
+  { 43, "entry 43" },
+  { 44, "entry 44" },
+  { 45, "entry 45" },
+  { 46, "entry 46" },
+  { 47, "entry 47" },
+  { 48, "entry 48" },
+  { 49, "entry 49" },
+  { 50, "entry 50" },
+  { 51, "entry 51" },
+  { 52, "entry 52" },
+  { 53, "entry 53" },
+  { 54, "entry 54" },
+  { 55, "entry 55" },
+  { 56, "entry 56" },
+  { 57, "entry 57" },
+  { 58, "entry 58" },
+  { 59, "entry 59" },
+  { 60, "entry 60" },
+  { 61, "entry 61" },
+  { 62, "entry 62" },
+  { 63, "entry 63" },
+  { 64, "entry 64" },
+  { 65, "entry 65" },
+  { 66, "entry 66" },
+  { 67, "entry 67" },
+  { 68, "entry 68" },
+  { 69, "entry 69" },
+  { 70, "entry 70" },
+  { 71, "entry 71" },
+  { 72, "entry 72" },
+  { 73, "entry 73" },
+  { 74, "entry 74" },
+  { 75, "entry 75" },
+  { 76, "entry 76" },
+  { 77, "entry 77" },
+  { 78, "entry 78" },
+  { 79, "entry 79" },
+  { 80, "entry 80" },
+  { 81, "entry 81" },
+  { 82, "entry 82" },
+  { 83, "entry 83" },
+  { 84, "entry 84" },
+  { 85, "entry 85" },
+  { 86, "entry 86" },
+  { 87, "entry 87" },
+  { 88, "entry 88" },
+  { 89, "entry 89" },
+  { 90, "entry 90" },
+  { 91, "entry 91" },
+  { 92, "entry 92" },
+  { 93, "entry 93" },
+  { 94, "entry 94" },
+  { 95, "entry 95" },
+  { 96, "entry 96" },
+  { 97, "entry 97" },
+  { 98, "entry 98" },
+  { 99, "entry 99" },
+  { 100, "entry 100" },
+  { 101, "entry 101" },
+  { 102, "entry 102" },
+  { 103, "entry 103" },
+  { 104, "entry 104" },
+  { 105, "entry 105" },
+  { 106, "entry 106" },
+  { 107, "entry 107" },
+  { 108, "entry 108" },
+  { 109, "entry 109" },
+  { 110, "entry 110" },
+  { 111, "entry 111" },
+  { 112, "entry 112" },
+  { 113, "entry 113" },
+  { 114, "entry 114" },
+  { 115, "entry 115" },
+  { 116, "entry 116" },
+  { 117, "entry 117" },
+  { 118, "entry 118" },
+  { 119, "entry 119" },
+  { 120, "entry 120" },
+  { 121, "entry 121" },
+  { 122, "entry 122" },
+  { 123, "entry 123" },
+  { 124, "entry 124" },
+  { 125, "entry 125" },
+  { 126, "entry 126" },
+  { 127, "entry 127" },
+  { 128, "entry 128" },
+  { 129, "entry 129" },
+  { 130, "entry 130" },
+  { 131, "entry 131" },
+  { 132, "entry 132" },
+  { 133, "entry 133" },
+  { 134, "entry 134" },
+  { 135, "entry 135" },
+  { 136, "entry 136" },
+  { 137, "entry 137" },
+  { 138, "entry 138" },
+  { 139, "entry 139" },
+  { 140, "entry 140" },
+  { 141, "entry 141" },
+  { 142, "entry 142" },
+  { 143, "entry 143" },
+  { 144, "entry 144" },
+  { 145, "entry 145" },
+  { 146, "entry 146" },
+  { 147, "entry 147" },
+  { 148, "entry 148" },
+  { 149, "entry 149" },
+  { 150, "entry 150" },
+  { 151, "entry 151" },
+  { 152, "entry 152" },
+  { 153, "entry 153" },
+  { 154, "entry 154" },
+  { 155, "entry 155" },
+  { 156, "entry 156" },
+  { 157, "entry 157" },
+  { 158, "entry 158" },
+  { 159, "entry 159" },
+  { 160, "entry 160" },
+  { 161, "entry 161" },
+  { 162, "entry 162" },
+  { 163, "entry 163" },
+  { 164, "entry 164" },
+  { 165, "entry 165" },
+  { 166, "entry 166" },
+  { 167, "entry 167" },
+  { 168, "entry 168" },
+  { 169, "entry 169" },
+  { 170, "entry 170" },
+  { 171, "entry 171" },
+  { 172, "entry 172" },
+  { 173, "entry 173" },
+  { 174, "entry 174" },
+  { 175, "entry 175" },
+  { 176, "entry 176" },
+  { 177, "entry 177" },
+  { 178, "entry 178" },
+  { 179, "entry 179" },
+  { 180, "entry 180" },
+  { 181, "entry 181" },
+  { 182, "entry 182" },
+  { 183, "entry 183" },
+  { 184, "entry 184" },
+  { 185, "entry 185" },
+  { 186, "entry 186" },
+  { 187, "entry 187" },
+  { 188, "entry 188" },
+  { 189, "entry 189" },
+  { 190, "entry 190" },
+  { 191, "entry 191" },
+  { 192, "entry 192" },
+  { 193, "entry 193" },
+  { 194, "entry 194" },
+  { 195, "entry 195" },
+  { 196, "entry 196" },
+  { 197, "entry 197" },
+  { 198, "entry 198" },
+  { 199, "entry 199" },
+};
+
+int big(void) {
+  return (int)(sizeof(table) / sizeof(table[0]));
+}
@@ -0,0 +1,3 @@
+int func_d(void) {
+  return 1;
+}
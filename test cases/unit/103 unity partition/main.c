@@ -0,0 +1,9 @@
+int big(void);
+int func_a(void);
+int func_b(void);
+int func_c(void);
+int func_d(void);
+
+int main(void) {
+  return big() + func_a() + func_b() + func_c() + func_d() == 204 ? 0 : 1;
+}
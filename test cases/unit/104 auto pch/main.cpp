@@ -0,0 +1,13 @@
+#include <map>
+#include <string>
+#include <vector>
+#include <iostream>
+
+int one(const std::vector<std::string> &words);
+int two(const std::vector<std::string> &words);
+int three(const std::vector<std::string> &words);
+
+int main(void) {
+    std::vector<std::string> words = {"a", "b", "a"};
+    return one(words) + two(words) + three(words) == 6 ? 0 : 1;
+}
@@ -0,0 +1,12 @@
+#include <map>
+#include <string>
+#include <vector>
+#include <iostream>
+
+int one(const std::vector<std::string> &words) {
+    std::map<std::string, int> counts;
+    for (const auto &w : words)
+        counts[w]++;
+    std::cout << "one: " << counts.size() << std::endl;
+    return (int)counts.size();
+}
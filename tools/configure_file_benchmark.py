@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# Copyright 2021 The Meson development team
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Measure configure_file() substitution on large templates.
+
+Generates a config.h.in made of #mesondefine lines and a source template
+where most lines use @VAR@ substitutions, both LINES lines long, and times
+do_conf_file() on them. The first run writes the output, the following ones
+find it unchanged.
+
+Run from the source root:
+
+    ./tools/configure_file_benchmark.py --lines 50000
+'''
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import typing as T
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mesonbuild import build, mesonlib  # noqa: E402
+
+def make_confdata(count: int) -> build.ConfigurationData:
+    conf = build.ConfigurationData()
+    for i in range(count):
+        value = f'"value{i}"'  # type: T.Union[str, int, bool]
+        if i % 3 == 1:
+            value = i
+        elif i % 3 == 2:
+            value = i % 2 == 0
+        conf.values[f'VAR{i}'] = (value, None)
+    return conf
+
+def config_h_template(lines: int, variables: int) -> str:
+    return ''.join(f'#mesondefine VAR{i % variables}\n' if i % 4 else f'/* Option {i} */\n'
+                   for i in range(lines))
+
+def source_template(lines: int, variables: int) -> str:
+    return ''.join(f'static const char *opt{i} = "@VAR{i % variables}@"; /* \\@ @VAR{(i * 7) % variables}@ */\n'
+                   if i % 3 else f'int unused{i};\n'
+                   for i in range(lines))
+
+TEMPLATES = {
+    'config.h': config_h_template,
+    'source': source_template,
+}
+
+def run(template: str, conf: build.ConfigurationData, repeat: int) -> T.Tuple[float, float]:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = os.path.join(tmpdir, 'template.in')
+        dst = os.path.join(tmpdir, 'output')
+        with open(src, 'w', encoding='utf-8') as f:
+            f.write(template)
+        start = time.perf_counter()
+        mesonlib.do_conf_file(src, dst, conf, 'meson')
+        first = time.perf_counter() - start
+        unchanged = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            mesonlib.do_conf_file(src, dst, conf, 'meson')
+            unchanged.append(time.perf_counter() - start)
+    return first, min(unchanged)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('templates', nargs='*', metavar='TEMPLATE',
+                        help='templates to measure, among {} (default: all)'.format(', '.join(TEMPLATES)))
+    parser.add_argument('--lines', type=int, default=20000,
+                        help='number of lines of each template (default: %(default)s)')
+    parser.add_argument('--variables', type=int, default=2000,
+                        help='number of configuration variables (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of runs on an unchanged output, the fastest one is reported (default: %(default)s)')
+    args = parser.parse_args()
+    for name in args.templates:
+        if name not in TEMPLATES:
+            parser.error(f'unknown template {name!r}')
+
+    conf = make_confdata(args.variables)
+    for name in args.templates or TEMPLATES:
+        first, unchanged = run(TEMPLATES[name](args.lines, args.variables), conf, args.repeat)
+        print(f'{name:<10} {first * 1e3:10.1f} ms (written) {unchanged * 1e3:10.1f} ms (unchanged)')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# Copyright 2021 The Meson development team
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Measure the per-call overhead of interpreter functions.
+
+Evaluates a generated meson.build calling files() or executable() COUNT
+times in a foreach loop, and prints the average cost of one call. Only the
+evaluation of the loop is timed: parsing, project() and compiler detection
+happen before the timer starts, the backend is never run.
+
+Run from the source root:
+
+    ./tools/interpreter_call_benchmark.py --count 5000 files executable
+'''
+
+import argparse
+import os
+import sys
+import tempfile
+import textwrap
+import time
+import typing as T
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mesonbuild import build, coredata, environment, interpreter, mlog, msetup  # noqa: E402
+
+CALLS = {
+    'empty': '',
+    'files': "files('main.c')",
+    'executable': "executable('exe@0@'.format(i), src, c_args: ['-DBENCH'], build_by_default: false)",
+}
+
+def write_project(srcdir: str, call: str, count: int) -> None:
+    with open(os.path.join(srcdir, 'main.c'), 'w', encoding='utf-8') as f:
+        f.write('int main(void) { return 0; }\n')
+    with open(os.path.join(srcdir, 'meson.build'), 'w', encoding='utf-8') as f:
+        f.write(textwrap.dedent(f'''\
+            project('bench', 'c')
+            src = files('main.c')
+            foreach i : range({count})
+              {call}
+            endforeach
+            '''))
+
+def run_once(call: str, count: int) -> float:
+    with tempfile.TemporaryDirectory() as srcdir, tempfile.TemporaryDirectory() as builddir:
+        write_project(srcdir, call, count)
+        parser = argparse.ArgumentParser()
+        msetup.add_arguments(parser)
+        options = parser.parse_args([builddir, srcdir])
+        coredata.parse_cmd_line_options(options)
+        env = environment.Environment(srcdir, builddir, options)
+        intr = interpreter.Interpreter(build.Build(env), user_defined_options=options)
+        start = time.perf_counter()
+        intr.run()
+        return time.perf_counter() - start
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    functions = sorted(set(CALLS) - {'empty'})
+    parser.add_argument('functions', nargs='*', metavar='FUNCTION',
+                        help='functions to measure, among {} (default: all)'.format(', '.join(functions)))
+    parser.add_argument('--count', type=int, default=2000,
+                        help='number of calls per run (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of runs, the fastest one is reported (default: %(default)s)')
+    args = parser.parse_args()
+    for func in args.functions:
+        if func not in functions:
+            parser.error(f'unknown function {func!r}')
+
+    mlog.disable()
+    # The cost of the loop itself is subtracted from every measurement.
+    baseline = min(run_once(CALLS['empty'], args.count) for _ in range(args.repeat))
+    results = []  # type: T.List[T.Tuple[str, float]]
+    for func in args.functions or functions:
+        best = min(run_once(CALLS[func], args.count) for _ in range(args.repeat))
+        results.append((func, (best - baseline) / args.count))
+    mlog.enable()
+
+    for func, per_call in results:
+        print(f'{func + "()":<14} {per_call * 1e6:10.1f} us/call')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
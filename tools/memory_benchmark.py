@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# Copyright 2021 The Meson development team
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Measure the memory used by meson setup and the size of its pickled data.
+
+Generates a project of TARGETS static libraries of SOURCES C files each,
+every one with an executable, a test and installed headers, configures it
+with the Meson of this source tree and reports the peak RSS of
+`meson setup`, then the size and loading time of the data files it
+pickled in meson-private.
+
+Run from the source root:
+
+    ./tools/memory_benchmark.py --targets 2000
+'''
+
+import argparse
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+import typing as T
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+DATA_FILES = ['build.dat', 'install.dat', 'meson_test_setup.dat']
+
+def generate_project(srcdir: str, targets: int, sources: int) -> None:
+    with open(os.path.join(srcdir, 'meson.build'), 'w', encoding='utf-8') as f:
+        f.write("project('memory', 'c')\n")
+        for i in range(targets):
+            f.write(f"subdir('t{i}')\n")
+    for i in range(targets):
+        subdir = os.path.join(srcdir, f't{i}')
+        os.mkdir(subdir)
+        names = [f's{j}.c' for j in range(sources)]
+        for j, name in enumerate(names):
+            with open(os.path.join(subdir, name), 'w', encoding='utf-8') as f:
+                f.write(f'int t{i}_s{j}(void) {{ return {j}; }}\n')
+        with open(os.path.join(subdir, f't{i}.h'), 'w', encoding='utf-8') as f:
+            f.write(f'int t{i}_s0(void);\n')
+        with open(os.path.join(subdir, 'main.c'), 'w', encoding='utf-8') as f:
+            f.write(f'#include "t{i}.h"\nint main(void) {{ return t{i}_s0(); }}\n')
+        with open(os.path.join(subdir, 'meson.build'), 'w', encoding='utf-8') as f:
+            f.write(f"lib = static_library('t{i}', {names!r}, install: true)\n"
+                    f"exe = executable('e{i}', 'main.c', link_with: lib)\n"
+                    f"test('t{i}', exe, args: ['--case', '{i}'], suite: ['s{i % 10}'])\n"
+                    f"install_headers('t{i}.h', subdir: 't{i}')\n")
+
+def setup(srcdir: str, builddir: str) -> T.Optional[int]:
+    '''Configure the project, returning the peak RSS in KiB if known.'''
+    subprocess.run([sys.executable, os.path.join(ROOT, 'meson.py'), 'setup', srcdir, builddir],
+                   stdout=subprocess.DEVNULL, check=True)
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Bytes on macOS, KiB everywhere else
+    return maxrss // 1024 if sys.platform == 'darwin' else maxrss
+
+def load_time(filename: str, repeat: int) -> float:
+    with open(filename, 'rb') as f:
+        data = f.read()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pickle.loads(data)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--targets', type=int, default=1000,
+                        help='number of libraries of the project (default: %(default)s)')
+    parser.add_argument('--sources', type=int, default=10,
+                        help='number of sources of each library (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of times the data files are loaded, the fastest one is reported (default: %(default)s)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        srcdir = os.path.join(tmpdir, 'src')
+        builddir = os.path.join(tmpdir, 'build')
+        os.mkdir(srcdir)
+        generate_project(srcdir, args.targets, args.sources)
+        maxrss = setup(srcdir, builddir)
+        print('meson setup peak RSS: {}'.format(f'{maxrss / 1024:.1f} MiB' if maxrss is not None else 'unknown'))
+        for name in DATA_FILES:
+            filename = os.path.join(builddir, 'meson-private', name)
+            size = os.path.getsize(filename)
+            seconds = load_time(filename, args.repeat)
+            print(f'{name:<22} {size / 1024:10.1f} KiB {seconds * 1e3:10.1f} ms to load')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -14,6 +14,7 @@
 
 from mesonbuild.mesonlib.universal import windows_proof_rm
 import subprocess
+import hashlib
 import re
 import json
 import tempfile
@@ -138,9 +139,63 @@ class AllPlatformTests(BasePlatformTests):
                     with open(fout, 'rb') as fobj:
                         return fobj.read().decode('utf-8')
 
-        confdata = {'VAR': ('foo', 'bar')}
+        confdata = ConfigurationData()
+        confdata.values = {'VAR': ('foo', 'bar')}
         self.assertEqual(conf_file('@VAR@\n@VAR@\n', confdata), 'foo\nfoo\n')
         self.assertEqual(conf_file('@VAR@\r\n@VAR@\r\n', confdata), 'foo\r\nfoo\r\n')
+        self.assertEqual(conf_file('@VAR@\r#mesondefine VAR\r', confdata), 'foo\r#define VAR foo\n')
+
+    def test_do_conf_file_substitution(self):
+        confdata = ConfigurationData()
+        confdata.values = {'STR': ('value', None), 'INT': (3, None), 'YES': (True, None), 'NO': (False, None)}
+
+        def conf_file(in_data, vformat):
+            with tempfile.TemporaryDirectory() as d:
+                fin = os.path.join(d, 'in')
+                fout = os.path.join(d, 'out')
+                with open(fin, 'w', encoding='utf-8', newline='') as f:
+                    f.write(in_data)
+                (missing_variables, _) = do_conf_file(fin, fout, confdata, vformat)
+                with open(fout, encoding='utf-8', newline='') as f:
+                    return f.read(), missing_variables
+
+        self.assertEqual(conf_file('@STR@ @INT@ @MISSING@ ${STR}\n', 'meson'), ('value 3  ${STR}\n', {'MISSING'}))
+        self.assertEqual(conf_file('${STR} ${INT} ${MISSING} @STR@\n', 'cmake'), ('value 3  @STR@\n', {'MISSING'}))
+        self.assertEqual(conf_file('@STR@ ${STR}\n', 'cmake@'), ('value ${STR}\n', set()))
+        # Escapes
+        self.assertEqual(conf_file('\\@STR@ \\\\@STR@ \\\\\\@STR@ \\\\ \\x\n', 'meson'),
+                         ('@STR@ \\value \\@STR@ \\\\ \\x\n', set()))
+        self.assertEqual(conf_file('\\${STR} \\\\${STR}\n', 'cmake'), ('${STR} \\value\n', set()))
+        # Defines
+        self.assertEqual(conf_file('#mesondefine STR\n#mesondefine INT\n#mesondefine YES\n'
+                                   '#mesondefine NO\n#mesondefine MISSING\n', 'meson'),
+                         ('#define STR value\n#define INT 3\n#define YES\n'
+                          '#undef NO\n/* #undef MISSING */\n', set()))
+        self.assertEqual(conf_file('#cmakedefine01 YES\n#cmakedefine01 NO\n#cmakedefine01 MISSING\n'
+                                   '#cmakedefine STR ${INT}\n', 'cmake'),
+                         ('#define YES\n#undef NO\n/* #undef MISSING */\n#define STR 3\n', set()))
+        self.assertRaises(MesonException, conf_file, 'x\n#cmakedefine STR\n', 'meson')
+        # Templates larger than a chunk are substituted as a whole
+        lines = 20000
+        (output, _) = conf_file('@STR@ @INT@\n#mesondefine YES\n' * lines, 'meson')
+        self.assertEqual(output, 'value 3\n#define YES\n' * lines)
+
+    @skipIf(is_windows(), 'POSIX file modes')
+    def test_do_conf_file_mode(self):
+        confdata = ConfigurationData()
+        with tempfile.TemporaryDirectory() as d:
+            fin = os.path.join(d, 'in')
+            fout = os.path.join(d, 'out')
+            with open(fin, 'w', encoding='utf-8') as f:
+                f.write('text\n')
+            os.chmod(fin, 0o755)
+            do_conf_file(fin, fout, confdata, 'meson')
+            self.assertEqual(os.stat(fout).st_mode & 0o777, 0o755)
+            # The mode is copied even when the content is unchanged
+            os.chmod(fin, 0o644)
+            do_conf_file(fin, fout, confdata, 'meson')
+            self.assertEqual(os.stat(fout).st_mode & 0o777, 0o644)
+            self.assertEqual(sorted(os.listdir(d)), ['in', 'out'])
 
     def test_do_conf_file_by_format(self):
         def conf_str(in_data, confdata, vformat):
@@ -2881,6 +2936,118 @@ class AllPlatformTests(BasePlatformTests):
         self.assertEqual(res1['error'], False)
         self.assertEqual(res1['build_files_updated'], True)
 
+    def test_introspect_unchanged_files_not_rewritten(self):
+        testdir = os.path.join(self.unit_test_dir, '57 introspection')
+        self.init(testdir)
+        infodir = os.path.join(self.builddir, 'meson-info')
+        targets = os.path.join(infodir, 'intro-targets.json')
+        os.utime(targets, (0, 0))
+        self.init(testdir, extra_args=['--reconfigure'])
+        self.assertEqual(os.stat(targets).st_mtime, 0)
+        with open(os.path.join(infodir, 'meson-info.json'), encoding='utf-8') as fp:
+            info = json.load(fp)
+        self.assertFalse(info['introspection']['information']['targets']['updated'])
+
+    def test_introspect_targets_query(self):
+        testdir = os.path.join(self.unit_test_dir, '57 introspection')
+        self.init(testdir)
+        all_targets = self.introspect('--targets')
+        self.assertPathExists(os.path.join(self.privatedir, 'intro-targets-index.json'))
+        # --target is still an abbreviation of --targets
+        self.assertEqual(self.introspect('--target'), all_targets)
+
+        res = self.introspect(['--name', 'test1'])
+        self.assertEqual(res, [t for t in all_targets if t['name'] == 'test1'])
+        res = self.introspect(['--type', 'shared_library', '--subproject', ''])
+        self.assertEqual(res, [t for t in all_targets if t['type'] == 'shared library'])
+        self.assertEqual(self.introspect(['--name', 'nonexisting']), [])
+        res = self.introspect(['--type', 'executable', '--fields', 'name,type'])
+        self.assertEqual(sorted(t['name'] for t in res), ['test1', 'test2', 'test3'])
+        for t in res:
+            self.assertEqual(set(t), {'name', 'type'})
+
+        # A stale index is ignored
+        targets_file = os.path.join(self.builddir, 'meson-info', 'intro-targets.json')
+        with open(targets_file, 'w', encoding='utf-8') as f:
+            json.dump(all_targets[::-1], f)
+        res = self.introspect(['--name', 'test1'])
+        self.assertEqual(res, [t for t in all_targets if t['name'] == 'test1'])
+
+    def test_introspect_affected(self):
+        testdir = os.path.join(self.unit_test_dir, '102 affected targets')
+        self.init(testdir)
+        self.assertPathExists(os.path.join(self.privatedir, 'build-graph.json'))
+
+        def affected(*files):
+            paths = [os.path.join(testdir, f) for f in files]
+            out = subprocess.check_output(self.mintro_command + [self.builddir, '--affected'] + paths,
+                                          universal_newlines=True)
+            res = json.loads(out)
+            return sorted(t['name'] for t in res['targets']), sorted(res['tests'])
+
+        self.assertEqual(affected('lib.c'), (['app', 'lib'], ['app']))
+        self.assertEqual(affected('gen.py', 'other.c'), (['gen', 'genexe', 'other'], ['gen', 'other']))
+        self.assertEqual(affected('unrelated.txt'), ([], []))
+        self.assertEqual(affected('meson.build'), (['app', 'gen', 'genexe', 'lib', 'other'],
+                                                   ['app', 'gen', 'other', 'script']))
+        # Tests running a script or given a file, without any target
+        self.assertEqual(affected('check.py'), ([], ['script']))
+        self.assertEqual(affected('data.txt'), ([], ['script']))
+        # Headers are only known once the objects using them were built
+        self.assertEqual(affected(os.path.join('inc', 'lib.h')), ([], []))
+        self.build()
+        self.assertEqual(affected(os.path.join('inc', 'lib.h')), (['app', 'lib'], ['app']))
+
+        out = self._run(self.mtest_command + ['--affected-by', os.path.join(testdir, 'app.c')])
+        self.assertRegex(out, r'1/1 app\s+OK')
+        self.assertNotIn('other', out)
+        out = self._run(self.mtest_command + ['--affected-by', os.path.join(testdir, 'data.txt')])
+        self.assertRegex(out, r'1/1 script\s+OK')
+
+    def test_analyze_build(self):
+        if self.backend is not Backend.ninja:
+            raise SkipTest(f'{self.backend.name!r} backend does not write a ninja log')
+        testdir = os.path.join(self.unit_test_dir, '102 affected targets')
+        self.init(testdir)
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            self._run(self.meson_command + ['analyze-build', '-C', self.builddir])
+        self.assertIn('build the project first', cm.exception.stdout)
+        self.build()
+        out = self._run(self.meson_command + ['analyze-build', '-C', self.builddir, '--json'])
+        res = json.loads(out)
+        self.assertEqual(sorted(t['name'] for t in res['targets']), ['app', 'gen', 'genexe', 'lib', 'other'])
+        self.assertEqual(sum(t['steps'] for t in res['targets']), res['steps'])
+        # The build ends with linking an executable
+        self.assertIn(res['critical_path'][-1]['outputs'][0], {'app', 'genexe', 'other'})
+
+        trace = os.path.join(self.builddir, 'trace.json')
+        out = self._run(self.meson_command + ['analyze-build', '-C', self.builddir, '--trace', trace])
+        self.assertIn('Critical path', out)
+        with open(trace, encoding='utf-8') as f:
+            events = json.load(f)['traceEvents']
+        self.assertEqual(len(events), res['steps'])
+        self.assertEqual({e['ph'] for e in events}, {'X'})
+
+    def test_profile_build_files(self):
+        testdir = os.path.join(self.unit_test_dir, '105 profile build files')
+        out = self.init(testdir, extra_args=['--profile-build-files'])
+        self.assertIn('Slowest calls in build files:', out)
+        logdir = os.path.join(self.builddir, 'meson-logs')
+        with open(os.path.join(logdir, 'profile-build-files.folded'), encoding='utf-8') as f:
+            stacks = [l.rsplit(' ', 1)[0].split(';') for l in f.read().splitlines()]
+        # Compiler checks run commands, attributed to the line asking for them
+        self.assertTrue(any(s[:2] == ['meson.build:4', "cc.has_function('printf')"] and len(s) == 3 for s in stacks))
+        self.assertIn(['meson.build:6', "subdir('sub')", os.path.join('sub', 'meson.build') + ':1',
+                       "cc.has_header('stdio.h')"], [s[:4] for s in stacks])
+        helper = os.path.join('subprojects', 'helper', 'meson.build')
+        self.assertIn(['meson.build:7', "subproject('helper')", helper + ':1', "project('helper')"], stacks)
+        with open(os.path.join(logdir, 'profile-build-files.json'), encoding='utf-8') as f:
+            events = json.load(f)['traceEvents']
+        self.assertEqual({e['cat'] for e in events}, {'line', 'call', 'command'})
+        calls = [e for e in events if e['name'] == "cc.has_function('printf')"]
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]['args'], {'location': 'meson.build:4'})
+
     def test_introspect_config_update(self):
         testdir = os.path.join(self.unit_test_dir, '57 introspection')
         introfile = os.path.join(self.builddir, 'meson-info', 'intro-buildoptions.json')
@@ -3313,6 +3480,24 @@ class AllPlatformTests(BasePlatformTests):
         self.assertRegex(contents, r'build main(\.exe)?.*: c_LINKER')
         self.assertRegex(contents, r'build (lib|cyg)?mylib.*: c_LINKER')
 
+    def test_backend_generate_jobs(self):
+        '''
+        Test that generating the targets in several processes gives the
+        same build file as generating them one after the other.
+        '''
+        if self.backend is not Backend.ninja:
+            raise SkipTest('This test reads the ninja file')
+
+        testdir = os.path.join(self.common_test_dir, '51 run target')
+        build_ninja = os.path.join(self.builddir, 'build.ninja')
+        self.init(testdir)
+        with open(build_ninja, encoding='utf-8') as f:
+            serial = f.read()
+        self.init(testdir, extra_args=['--wipe', '-Dbackend_generate_jobs=4'])
+        with open(build_ninja, encoding='utf-8') as f:
+            self.assertEqual(f.read(), serial)
+        self.build()
+
     def test_commands_documented(self):
         '''
         Test that all listed meson commands are documented in Commands.md.
@@ -3342,7 +3527,7 @@ class AllPlatformTests(BasePlatformTests):
         md_commands = {k for k,v in md_command_sections.items()}
 
         help_output = self._run(self.meson_command + ['--help'])
-        help_commands = {c.strip() for c in re.findall(r'usage:(?:.+)?{((?:[a-z]+,*)+?)}', help_output, re.MULTILINE|re.DOTALL)[0].split(',')}
+        help_commands = {c.strip() for c in re.findall(r'usage:(?:.+)?{((?:[a-z-]+,*)+?)}', help_output, re.MULTILINE|re.DOTALL)[0].split(',')}
 
         self.assertEqual(md_commands | {'help'}, help_commands, f'Doc file: `{doc_path}`')
 
@@ -3540,6 +3725,133 @@ class AllPlatformTests(BasePlatformTests):
             self.build()
             self.run_tests()
 
+    FILE_URL_WRAP = textwrap.dedent('''\
+        [wrap-file]
+        directory = foo
+        source_url = {url}/foo.tar.xz
+        source_filename = foo.tar.xz
+        source_hash = {source_hash}
+        patch_url = {url}/foo-patch.tar.xz
+        patch_filename = foo-patch.tar.xz
+        patch_hash = {patch_hash}
+        ''')
+
+    def _write_file_url_wraps(self, srcdir: str, url: str, wraps: T.Dict[str, str]) -> None:
+        testdir = os.path.join(self.unit_test_dir, '73 wrap file url')
+        os.makedirs(os.path.join(srcdir, 'subprojects'), exist_ok=True)
+        shutil.copy(os.path.join(testdir, 'meson.build'), srcdir)
+        for name, contents in wraps.items():
+            with open(os.path.join(srcdir, 'subprojects', name + '.wrap'), 'w', encoding='utf-8') as f:
+                f.write(contents.format(
+                    url=url,
+                    source_hash=self.compute_sha256(os.path.join(testdir, 'subprojects', 'foo.tar.xz')),
+                    patch_hash=self.compute_sha256(os.path.join(testdir, 'subprojects', 'foo-patch.tar.xz'))))
+
+    def test_wrap_prefetch(self):
+        testdir = os.path.join(self.unit_test_dir, '73 wrap file url')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            srcdir = os.path.join(tmpdir, 'src')
+            with serve_directory(os.path.join(testdir, 'subprojects')) as (url, requests):
+                self._write_file_url_wraps(srcdir, url, {
+                    'foo': self.FILE_URL_WRAP,
+                    # Never used by the project, but fetched ahead of time anyway
+                    'unused': textwrap.dedent('''\
+                        [wrap-file]
+                        directory = unused
+                        lead_directory_missing = true
+                        source_url = {url}/foo.tar.xz
+                        source_filename = unused.tar.xz
+                        source_hash = {source_hash}
+                        '''),
+                })
+                self.init(srcdir, extra_args=['-Dwrap_prefetch=4'])
+                # Configure waits for prefetches of unused wraps to finish
+                self.assertTrue(os.path.isdir(os.path.join(srcdir, 'subprojects', 'unused', 'foo')))
+            self.assertEqual(len(requests), 3)
+            self.build()
+            self.run_tests()
+
+    def test_wrap_prefetch_failure(self):
+        testdir = os.path.join(self.unit_test_dir, '73 wrap file url')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            srcdir = os.path.join(tmpdir, 'src')
+            subprojects = os.path.join(srcdir, 'subprojects')
+            with serve_directory(os.path.join(testdir, 'subprojects')) as (url, requests):
+                self._write_file_url_wraps(srcdir, url, {
+                    'foo': self.FILE_URL_WRAP,
+                    # Unused wraps downloading the same source as foo
+                    'shared': textwrap.dedent('''\
+                        [wrap-file]
+                        directory = shared
+                        lead_directory_missing = true
+                        source_url = {url}/foo.tar.xz
+                        source_filename = foo.tar.xz
+                        source_hash = {source_hash}
+                        '''),
+                    'broken': textwrap.dedent('''\
+                        [wrap-file]
+                        directory = broken
+                        lead_directory_missing = true
+                        source_url = {url}/foo.tar.xz
+                        source_filename = foo.tar.xz
+                        source_hash = {source_hash}
+                        patch_url = {url}/foo-patch.tar.xz
+                        patch_filename = broken-patch.tar.xz
+                        patch_hash = 0000000000000000000000000000000000000000000000000000000000000000
+                        '''),
+                })
+                self.init(srcdir, extra_args=['-Dwrap_prefetch=4'])
+            # The source is downloaded once, the other wraps wait for it
+            self.assertEqual(sorted(requests), ['/foo-patch.tar.xz', '/foo-patch.tar.xz', '/foo.tar.xz'])
+            self.assertTrue(os.path.isdir(os.path.join(subprojects, 'shared', 'foo')))
+            # The source of broken was extracted before its patch failed, but
+            # not in the subprojects directory
+            self.assertPathDoesNotExist(os.path.join(subprojects, 'broken'))
+            self.assertEqual([d for d in os.listdir(subprojects) if d.startswith('.')], [])
+
+    def test_wrap_user_cache(self):
+        testdir = os.path.join(self.unit_test_dir, '73 wrap file url')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            srcdir = os.path.join(tmpdir, 'src')
+            with serve_directory(os.path.join(testdir, 'subprojects')) as (url, requests):
+                self._write_file_url_wraps(srcdir, url, {'foo': self.FILE_URL_WRAP})
+                self.init(srcdir)
+                self.assertEqual(sorted(requests), ['/foo-patch.tar.xz', '/foo.tar.xz'])
+
+                # The extracted subproject is known to match its wrap file
+                out = self._run(self.meson_command + ['subprojects', 'update'], workdir=srcdir)
+                self.assertIn('Subproject has not changed.', out)
+
+                # A fresh checkout gets the files from the user cache
+                windows_proof_rmtree(os.path.join(srcdir, 'subprojects', 'foo'))
+                windows_proof_rmtree(os.path.join(srcdir, 'subprojects', 'packagecache'))
+                self.new_builddir()
+                out = self.init(srcdir)
+                self.assertIn('Using foo source from user cache.', out)
+                self.assertEqual(len(requests), 2)
+
+                # Files in the user cache don't need to be downloaded
+                windows_proof_rmtree(os.path.join(srcdir, 'subprojects', 'foo'))
+                windows_proof_rmtree(os.path.join(srcdir, 'subprojects', 'packagecache'))
+                self.new_builddir()
+                out = self.init(srcdir, extra_args=['--wrap-mode=nodownload'])
+                self.assertIn('Using foo source from user cache.', out)
+                self.assertEqual(len(requests), 2)
+
+            cachedir = os.path.join(self.cachedir, 'wraps')
+            self.assertEqual(sorted(os.listdir(cachedir)),
+                             sorted([self.compute_sha256(os.path.join(testdir, 'subprojects', f))
+                                     for f in ['foo.tar.xz', 'foo-patch.tar.xz']]))
+            out = self._run(self.wrap_command + ['cache', 'list'])
+            self.assertIn('2 files', out)
+            self._run(self.wrap_command + ['cache', 'verify'])
+            self._run(self.wrap_command + ['cache', 'prune', '--max-size', '0'])
+            self.assertEqual(os.listdir(cachedir), [])
+
+    def compute_sha256(self, filename):
+        with open(filename, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
     def test_multi_output_custom_target_no_warning(self):
         testdir = os.path.join(self.common_test_dir, '228 custom_target source')
 
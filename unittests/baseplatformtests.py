@@ -80,6 +80,9 @@ class BasePlatformTests(TestCase):
 
         # Misc stuff
         self.orig_env = os.environ.copy()
+        # Don't share downloads and detected compilers with the user's cache
+        self.cachedir = tempfile.mkdtemp()
+        os.environ['MESON_CACHE_DIR'] = self.cachedir
         if self.backend is Backend.ninja:
             self.no_rebuild_stdout = ['ninja: no work to do.', 'samu: nothing to do']
         else:
@@ -139,6 +142,7 @@ class BasePlatformTests(TestCase):
                 windows_proof_rmtree(path)
             except FileNotFoundError:
                 pass
+        windows_proof_rmtree(self.cachedir)
         os.environ.clear()
         os.environ.update(self.orig_env)
         super().tearDown()
@@ -4,6 +4,11 @@ import shutil
 import unittest
 import functools
 import re
+import threading
+import http.server
+import posixpath
+import socketserver
+import urllib.parse
 import typing as T
 from contextlib import contextmanager
 
@@ -141,6 +146,40 @@ def chdir(path: str):
     finally:
         os.chdir(curdir)
 
+@contextmanager
+def serve_directory(path: str) -> T.Iterator[T.Tuple[str, T.List[str]]]:
+    '''
+    Serve the content of path over HTTP on localhost from a background thread.
+
+    Yields the base URL and the list of request paths received so far.
+    '''
+    requests = []  # type: T.List[str]
+
+    # The directory argument of the handler and ThreadingHTTPServer are only
+    # available since Python 3.7.
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def translate_path(self, url_path: str) -> str:
+            url_path = urllib.parse.unquote(url_path.split('?', 1)[0].split('#', 1)[0])
+            parts = [p for p in posixpath.normpath(url_path).split('/')
+                     if p and p not in {os.curdir, os.pardir} and not os.path.dirname(p)]
+            return os.path.join(path, *parts)
+
+        def log_message(self, *args: T.Any) -> None:
+            requests.append(self.path)
+
+    class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+        daemon_threads = True
+
+    server = Server(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}', requests
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
 def get_dynamic_section_entry(fname: str, entry: str) -> T.Optional[str]:
     if is_cygwin() or is_osx():
         raise unittest.SkipTest('Test only applicable to ELF platforms')
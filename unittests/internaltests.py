@@ -24,6 +24,7 @@ import pickle
 import stat
 import subprocess
 import tempfile
+import textwrap
 import typing as T
 import unittest
 
@@ -1458,6 +1459,23 @@ class InternalTests(unittest.TestCase):
         _(None, mock.Mock(), [['']], {'input': ['']})
         self.assertRaises(InvalidArguments, _, None, mock.Mock(), [], {'input': 42})
 
+    def test_typed_kwarg_repeated_calls(self) -> None:
+        @typed_kwargs(
+            'testfunc',
+            KwargInfo('input', ContainerTypeInfo(list, str), listify=True, default=[]),
+        )
+        def _(obj, node, args: T.Tuple, kwargs: T.Dict[str, T.List[str]]) -> T.List[str]:
+            kwargs['input'].append('added')
+            return kwargs['input']
+
+        # The signature is compiled once, but each call gets its own copy of
+        # the default value and is validated independently.
+        self.assertEqual(_(None, mock.Mock(), [], {}), ['added'])
+        self.assertEqual(_(None, mock.Mock(), [], {}), ['added'])
+        self.assertEqual(_(None, mock.Mock(), [], {'input': 'a'}), ['a', 'added'])
+        self.assertRaises(InvalidArguments, _, None, mock.Mock(), [], {'input': [1]})
+        self.assertRaises(InvalidArguments, _, None, mock.Mock(), [], {'other': 'a'})
+
     def test_detect_cpu_family(self) -> None:
         """Test the various cpu families that we detect and normalize.
 
@@ -1574,3 +1592,437 @@ class InternalTests(unittest.TestCase):
         self.assertFalse(coredata.major_versions_differ('0.60.0', '0.60.1'))
         self.assertFalse(coredata.major_versions_differ('0.59.99', '0.59.99'))
         self.assertFalse(coredata.major_versions_differ('0.60.0.rc1', '0.60.0.rc2'))
+
+    def test_wrap_unpack_zip(self) -> None:
+        from mesonbuild.wrap.wrap import unpack_archive
+        import zipfile
+        files = {f'foo/dir{i % 3}/file{i}.txt': f'content {i}\n' * i for i in range(20)}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive = os.path.join(tmpdir, 'foo.zip')
+            with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr('foo/', '')
+                zf.writestr('../evil.txt', 'outside')
+                for name, content in files.items():
+                    zf.writestr(name, content)
+            extract_dir = os.path.join(tmpdir, 'out')
+            os.mkdir(extract_dir)
+            unpack_archive(archive, extract_dir)
+            for name, content in files.items():
+                with open(os.path.join(extract_dir, name), encoding='utf-8') as f:
+                    self.assertEqual(f.read(), content)
+            self.assertFalse(os.path.exists(os.path.join(tmpdir, 'evil.txt')))
+
+    def test_wrap_cache_prune(self) -> None:
+        from mesonbuild.wrap.cache import WrapCache, file_sha256, parse_size
+        self.assertEqual(parse_size('2K'), 2048)
+        self.assertEqual(parse_size('1GiB'), 1024 ** 3)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = WrapCache(os.path.join(tmpdir, 'cache'), max_size=10)
+            hashes = []
+            for i in range(3):
+                path = os.path.join(tmpdir, f'file{i}')
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(f'content{i}')
+                hashes.append(file_sha256(path))
+                cache.add(path, hashes[-1])
+            # Adding files does not prune the cache, the command does once
+            self.assertEqual(len(cache.entries()), 3)
+            cache.prune_added()
+            self.assertEqual(len(cache.entries()), 1)
+
+    def test_wrap_stamp(self) -> None:
+        from mesonbuild.wrap import wrap
+        import hashlib
+        import tarfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            subprojects = os.path.join(tmpdir, 'subprojects')
+            os.makedirs(os.path.join(subprojects, 'packagefiles'))
+            with open(os.path.join(tmpdir, 'meson.build'), 'w', encoding='utf-8') as f:
+                f.write("project('foo')\n")
+            archive = os.path.join(subprojects, 'packagefiles', 'foo.tar.gz')
+            with tarfile.open(archive, 'w:gz') as tf:
+                tf.add(os.path.join(tmpdir, 'meson.build'), 'foo/meson.build')
+            with open(archive, 'rb') as f:
+                source_hash = hashlib.sha256(f.read()).hexdigest()
+
+            def write_wrap(source_hash: str) -> None:
+                with open(os.path.join(subprojects, 'foo.wrap'), 'w', encoding='utf-8') as f:
+                    f.write(f'[wrap-file]\ndirectory = foo\nsource_filename = foo.tar.gz\nsource_hash = {source_hash}\n')
+
+            write_wrap(source_hash)
+            wrap.Resolver(tmpdir, 'subprojects').resolve('foo', 'meson')
+            self.assertEqual(wrap.read_stamp(os.path.join(subprojects, 'foo')), f'source_hash = {source_hash}\n')
+
+            # A second resolve uses the extracted subproject
+            with mock.patch.object(wrap, 'unpack_archive') as unpack, \
+                    mock.patch.object(mesonbuild.mlog, 'warning') as warning:
+                self.assertEqual(wrap.Resolver(tmpdir, 'subprojects').resolve('foo', 'meson'),
+                                 os.path.join('subprojects', 'foo'))
+                unpack.assert_not_called()
+                warning.assert_not_called()
+
+                # The wrap now points to another archive
+                write_wrap('0' * 64)
+                wrap.Resolver(tmpdir, 'subprojects').resolve('foo', 'meson')
+                unpack.assert_not_called()
+                self.assertIn('meson subprojects update --reset', warning.call_args[0][0])
+
+    def test_wrap_prefetch_shared_directory(self) -> None:
+        from mesonbuild.wrap.wrap import Resolver
+        import threading
+        import time
+        fetched = []  # type: T.List[str]
+        lock = threading.Lock()
+
+        def fetch(r: Resolver) -> None:
+            with lock:
+                fetched.append(r.packagename)
+            time.sleep(0.2)
+            os.makedirs(r.dirname, exist_ok=True)
+            with open(os.path.join(r.dirname, 'meson.build'), 'w', encoding='utf-8') as f:
+                f.write("project('shared')\n")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.mkdir(os.path.join(tmpdir, 'subprojects'))
+            for name in ['a', 'b']:
+                with open(os.path.join(tmpdir, 'subprojects', f'{name}.wrap'), 'w', encoding='utf-8') as f:
+                    f.write('[wrap-file]\ndirectory = shared\nsource_url = http://invalid/shared.tar.gz\n'
+                            'source_filename = shared.tar.gz\nsource_hash = 0\n')
+            with mock.patch.object(Resolver, 'fetch', fetch):
+                r = Resolver(tmpdir, 'subprojects')
+                r.prefetch(2)
+                # Both wraps wait for the single fetch of their directory,
+                # even the one resolved first that did not start it
+                for name in reversed(list(r.wraps)):
+                    self.assertEqual(r.resolve(name, 'meson'), os.path.join('subprojects', 'shared'))
+                r.finish_prefetch()
+            self.assertEqual(len(fetched), 1)
+
+    def test_fold_constants(self) -> None:
+        from mesonbuild import mparser
+        from mesonbuild.interpreterbase import fold_constants
+        from mesonbuild.interpreterbase.folding import FoldedArrayNode, FoldedStringNode
+        code = textwrap.dedent('''\
+            a = 'foo' / 'bar' + '.c'
+            b = ['x', 1, true, 'y' + 'z']
+            c = [a, 'x']
+            d = 'foo' / a
+            e = 1 + 2
+            ''')
+        ast = mparser.Parser(code, 'meson.build').parse()
+        fold_constants(ast)
+        a, b, c, d, e = (line.value for line in ast.lines)
+        self.assertIsInstance(a, FoldedStringNode)
+        self.assertEqual(a.value, 'foo/bar.c')
+        self.assertEqual(a.features, (('/ with string arguments', '0.49.0'),))
+        self.assertIsInstance(b, FoldedArrayNode)
+        self.assertEqual(b.value, ['x', 1, True, 'yz'])
+        self.assertEqual(b.features, ())
+        # Anything involving variables, or operations that can fail on
+        # other types, is left to the interpreter.
+        self.assertNotIsInstance(c, FoldedArrayNode)
+        self.assertIsInstance(d, mparser.ArithmeticNode)
+        self.assertIsInstance(e, mparser.ArithmeticNode)
+
+    def test_parse_gresource_manifest(self) -> None:
+        from mesonbuild.modules.gnome import parse_gresource_manifest
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manifest = os.path.join(tmpdir, 'app.gresource.xml')
+            with open(manifest, 'w', encoding='utf-8') as f:
+                f.write(textwrap.dedent('''\
+                    <?xml version="1.0" encoding="UTF-8"?>
+                    <gresources>
+                      <gresource prefix="/org/example">
+                        <file preprocess="xml-stripblanks">ui/window.ui</file>
+                        <file alias="style.css">data/style.css</file>
+                      </gresource>
+                      <gresource prefix="/org/example/extra">
+                        <file compressed="true"> data/style.css </file>
+                        <file>icon.png</file>
+                      </gresource>
+                    </gresources>
+                    '''))
+            self.assertEqual(parse_gresource_manifest(manifest),
+                             ['ui/window.ui', 'data/style.css', 'icon.png'])
+
+            # Rewriting the manifest invalidates the cached result
+            with open(manifest, 'w', encoding='utf-8') as f:
+                f.write('<gresources><gresource><file preprocess="unknown">a.txt</file></gresource></gresources>')
+            os.utime(manifest, ns=(0, 0))
+            self.assertIsNone(parse_gresource_manifest(manifest))
+
+            with open(manifest, 'w', encoding='utf-8') as f:
+                f.write('<gresources>')
+            with self.assertRaises(MesonException):
+                parse_gresource_manifest(manifest)
+
+    @unittest.skipIf(is_windows(), 'PATH lookups use shutil.which() on Windows')
+    def test_program_directory_index(self) -> None:
+        from mesonbuild.programs import _directory_index
+        with tempfile.TemporaryDirectory() as tmpdir:
+            bindir = os.path.join(tmpdir, 'bin')
+            os.mkdir(bindir)
+            os.utime(bindir, (0, 0))
+            with mock.patch.dict(os.environ, {'PATH': bindir}):
+                self.assertFalse(ExternalProgram('meson-test-prog', silent=True).found())
+                # The listing of a directory that was modified long ago is kept
+                self.assertIn(bindir, _directory_index.listings)
+
+                prog = os.path.join(bindir, 'meson-test-prog')
+                with open(prog, 'w', encoding='utf-8') as f:
+                    f.write('#!/bin/sh\n')
+                os.chmod(prog, 0o755)
+                found = ExternalProgram('meson-test-prog', silent=True)
+                self.assertTrue(found.found())
+                self.assertEqual(found.get_command(), [prog])
+
+                os.unlink(prog)
+                self.assertFalse(ExternalProgram('meson-test-prog', silent=True).found())
+
+                # Names with a directory component are not looked up in PATH
+                os.mkdir(os.path.join(bindir, 'sub'))
+                prog = os.path.join(bindir, 'sub', 'meson-test-prog')
+                with open(prog, 'w', encoding='utf-8') as f:
+                    f.write('#!/bin/sh\n')
+                os.chmod(prog, 0o755)
+                self.assertIsNone(_directory_index.which('sub/meson-test-prog', bindir))
+                self.assertFalse(ExternalProgram('sub/meson-test-prog', silent=True).found())
+                self.assertEqual(_directory_index.which(prog, bindir), prog)
+                self.assertEqual(ExternalProgram(prog, silent=True).get_command(), [prog])
+
+    def test_intro_write_if_changed(self) -> None:
+        from mesonbuild.mintro import encode_intro_data, write_if_changed
+        items = [{'name': 'a', 'sources': ['a.c']}, {'name': 'bé', 'sources': []}]
+        self.assertEqual(''.join(encode_intro_data(iter(items))), json.dumps(items))
+        self.assertEqual(''.join(encode_intro_data(iter([]))), json.dumps([]))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            out = os.path.join(tmpdir, 'intro-targets.json')
+            tmp = os.path.join(tmpdir, 'tmp_dump.json')
+            self.assertTrue(write_if_changed(out, tmp, encode_intro_data(iter(items))))
+            os.utime(out, (0, 0))
+            self.assertFalse(write_if_changed(out, tmp, encode_intro_data(iter(items))))
+            self.assertEqual(os.stat(out).st_mtime, 0)
+            self.assertFalse(os.path.exists(tmp))
+            # A longer, a shorter and a different content all replace the file
+            for new in (items + [{'name': 'c'}], items[:1], items[::-1]):
+                self.assertTrue(write_if_changed(out, tmp, encode_intro_data(iter(new))))
+                with open(out, encoding='utf-8') as f:
+                    self.assertEqual(json.load(f), new)
+
+    def test_run_tool_cache(self) -> None:
+        from mesonbuild.scripts.run_tool import run_tool, ToolCache, file_hash
+        calls = []  # type: T.List[str]
+
+        def fake_tool(fname: Path) -> subprocess.CompletedProcess:
+            calls.append(fname.name)
+            return subprocess.CompletedProcess([], 0, stdout=f'checked {fname.name}\n')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            srcdir = Path(tmpdir, 'src')
+            builddir = Path(tmpdir, 'build')
+            srcdir.mkdir()
+            builddir.mkdir()
+            (srcdir / '.fake-include').write_text('*\n', encoding='utf-8')
+            (srcdir / 'a.c').write_text('int a;\n', encoding='utf-8')
+            (srcdir / 'b.h').write_text('int b;\n', encoding='utf-8')
+            cache_file = builddir / 'fake-cache.json'
+
+            def run() -> str:
+                calls.clear()
+                cache = ToolCache(cache_file, lambda f: file_hash(f) if f.suffix == '.c' else None)
+                with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+                    self.assertEqual(run_tool('fake', srcdir, builddir, fake_tool, jobs=2, cache=cache), 0)
+                return stdout.getvalue()
+
+            self.assertIn('checked a.c', run())
+            self.assertEqual(sorted(calls), ['a.c', 'b.h'])
+            # Files without a key are always processed, the output of the
+            # others is printed again.
+            self.assertIn('checked a.c', run())
+            self.assertEqual(calls, ['b.h'])
+            (srcdir / 'a.c').write_text('int a = 1;\n', encoding='utf-8')
+            run()
+            self.assertEqual(sorted(calls), ['a.c', 'b.h'])
+
+    @unittest.skipIf(is_windows(), 'uses a shell script as fake compiler')
+    def test_detection_cache(self) -> None:
+        from mesonbuild.detectcache import Popen_detect
+        with tempfile.TemporaryDirectory() as tmpdir:
+            compiler = os.path.join(tmpdir, 'fakecc')
+            counter = os.path.join(tmpdir, 'runs')
+
+            def write_compiler(version: str) -> None:
+                with open(compiler, 'w', encoding='utf-8') as f:
+                    f.write(f'#!/bin/sh\necho run >> {counter}\necho "fakecc {version}"\n')
+                os.chmod(compiler, 0o755)
+
+            def runs() -> int:
+                with open(counter, encoding='utf-8') as f:
+                    return len(f.readlines())
+
+            write_compiler('1.0')
+            env = {'MESON_CACHE_DIR': os.path.join(tmpdir, 'cache'), 'LC_ALL': 'C'}
+            with mock.patch.dict(os.environ, env):
+                os.environ.pop('MESON_NO_DETECTION_CACHE', None)
+                for _ in range(2):
+                    p, out, _ = Popen_detect([compiler, '--version'])
+                    self.assertEqual((p.returncode, out), (0, 'fakecc 1.0\n'))
+                self.assertEqual(runs(), 1)
+                # Another command line, or environment, is another probe
+                Popen_detect([compiler, '-v'])
+                self.assertEqual(runs(), 2)
+                with mock.patch.dict(os.environ, {'LC_ALL': 'fr_FR.UTF-8'}):
+                    Popen_detect([compiler, '--version'])
+                self.assertEqual(runs(), 3)
+                # Replacing the compiler invalidates its entries
+                write_compiler('2.0.1')
+                self.assertEqual(Popen_detect([compiler, '--version'])[1], 'fakecc 2.0.1\n')
+                self.assertEqual(runs(), 4)
+
+                # So does replacing the compiler behind a wrapper like ccache
+                wrapper = os.path.join(tmpdir, 'fakeccache')
+                with open(wrapper, 'w', encoding='utf-8') as f:
+                    f.write('#!/bin/sh\nexec "$@"\n')
+                os.chmod(wrapper, 0o755)
+                self.assertEqual(Popen_detect([wrapper, compiler, '--version'])[1], 'fakecc 2.0.1\n')
+                self.assertEqual(Popen_detect([wrapper, compiler, '--version'])[1], 'fakecc 2.0.1\n')
+                self.assertEqual(runs(), 5)
+                write_compiler('3.0')
+                self.assertEqual(Popen_detect([wrapper, compiler, '--version'])[1], 'fakecc 3.0\n')
+                self.assertEqual(runs(), 6)
+
+                # and replacing the linker the compiler runs, even if it is
+                # not in PATH
+                linker = os.path.join(tmpdir, 'cross', 'aarch64-fake-ld')
+                os.mkdir(os.path.dirname(linker))
+
+                def write_linker(version: str) -> None:
+                    with open(linker, 'w', encoding='utf-8') as f:
+                        f.write(f'#!/bin/sh\necho "fake ld {version}"\n')
+                    os.chmod(linker, 0o755)
+
+                with open(compiler, 'w', encoding='utf-8') as f:
+                    f.write(textwrap.dedent(f'''\
+                        #!/bin/sh
+                        echo run >> {counter}
+                        case "$1" in
+                          -print-prog-name=ld) echo {linker};;
+                          *) exec {linker};;
+                        esac
+                        '''))
+                write_linker('1.0')
+                linker_probe = [compiler, '-Wl,--version']
+                for _ in range(2):
+                    out = Popen_detect(linker_probe, linker_of=[compiler])[1]
+                    self.assertEqual(out, 'fake ld 1.0\n')
+                # The probe and asking the compiler for its linker
+                self.assertEqual(runs(), 8)
+                write_linker('2.10')
+                self.assertEqual(Popen_detect(linker_probe, linker_of=[compiler])[1], 'fake ld 2.10\n')
+                self.assertEqual(runs(), 9)
+
+    def test_slotted_records_pickle(self) -> None:
+        from mesonbuild.backend.backends import InstallDataBase, SubdirInstallData
+        f = mesonbuild.mesonlib.File(True, 'sub', 'file.c')
+        self.assertFalse(hasattr(f, '__dict__'))
+        # The hash of a File is not pickled, a stale one would come from
+        # another process
+        f.hash = 0
+        g = pickle.loads(pickle.dumps(f))
+        self.assertEqual((g.is_built, g.subdir, g.fname), (True, 'sub', 'file.c'))
+        self.assertEqual(hash(g), hash((True, 'sub', 'file.c')))
+        # Pickled before File had __slots__
+        g = mesonbuild.mesonlib.File.__new__(mesonbuild.mesonlib.File)
+        g.__setstate__({'is_built': True, 'subdir': 'sub', 'fname': 'file.c', 'hash': 0})
+        self.assertEqual(g, mesonbuild.mesonlib.File(True, 'sub', 'file.c'))
+
+        d = SubdirInstallData('sub', '/usr/share/sub', '{datadir}/sub', None, (set(), {'x'}), 'proj', 'devel')
+        self.assertFalse(hasattr(d, '__dict__'))
+        e = pickle.loads(pickle.dumps(d))
+        self.assertEqual((e.path, e.install_path, e.exclude, e.subproject, e.tag, e.data_type),
+                         ('sub', '/usr/share/sub', (set(), {'x'}), 'proj', 'devel', None))
+        # Pickled before InstallDataBase had __slots__
+        e = InstallDataBase.__new__(InstallDataBase)
+        e.__setstate__({'path': 'a', 'install_path': 'b', 'install_path_name': 'c', 'install_mode': None,
+                        'subproject': '', 'tag': None, 'data_type': 'data'})
+        self.assertEqual(e.data_type, 'data')
+
+    def test_ninja_log(self) -> None:
+        from mesonbuild import ninjalog
+        with tempfile.TemporaryDirectory() as d:
+            with open(ninjalog.get_log_file(d), 'w', encoding='utf-8') as f:
+                f.write('# ninja log v5\n'
+                        '0\t10\t1\ta.o\t1a\n'
+                        '10\t30\t1\tprog\t2b\n'
+                        '0\t5\t2\ta.o\t1a\n'
+                        '5\t20\t2\tgen.c\t3c\n'
+                        '5\t20\t2\tgen.h\t3c\n'
+                        'garbage\n')
+            entries = ninjalog.read_log(ninjalog.get_log_file(d))
+        self.assertEqual(len(entries), 5)
+        self.assertEqual(ninjalog.last_durations(entries), {'a.o': 5, 'prog': 20, 'gen.c': 15, 'gen.h': 15})
+        self.assertEqual(ninjalog.get_steps(ninjalog.last_build(entries)),
+                         [ninjalog.NinjaStep(0, 5, ['a.o']), ninjalog.NinjaStep(5, 20, ['gen.c', 'gen.h'])])
+        self.assertEqual(ninjalog.read_log(os.path.join(d, 'missing')), [])
+
+    def test_profiler(self) -> None:
+        from mesonbuild import profiler
+        Event = profiler.Event
+        events = [
+            Event(('meson.build:1', "project('p')", 'cc'), 'command', 0.1, 0.5, {'command': 'cc -v'}),
+            Event(('meson.build:1', "project('p')"), 'call', 0.0, 1.0, {'location': 'meson.build:1'}),
+            Event(('meson.build:1',), 'line', 0.0, 1.25, {}),
+            Event(('meson.build:3', "cc.has_function('f;g')"), 'call', 1.5, 1.75, {'location': 'meson.build:3'}),
+            Event(('meson.build:3',), 'line', 1.5, 2.0, {}),
+        ]
+        self.assertEqual(profiler.get_folded(events), {
+            ('meson.build:1', "project('p')", 'cc'): 500000,
+            ('meson.build:1', "project('p')"): 500000,
+            ('meson.build:1',): 250000,
+            ('meson.build:3', "cc.has_function('f;g')"): 1750000,
+            ('meson.build:3',): 250000,
+        })
+        with tempfile.TemporaryDirectory() as d:
+            folded = os.path.join(d, 'profile.folded')
+            profiler.write_folded(folded, events)
+            with open(folded, encoding='utf-8') as f:
+                self.assertEqual(f.read().splitlines(), [
+                    'meson.build:1 250000',
+                    "meson.build:1;project('p') 500000",
+                    "meson.build:1;project('p');cc 500000",
+                    'meson.build:3 250000',
+                    "meson.build:3;cc.has_function('f,g') 1750000",
+                ])
+        trace = profiler.get_trace(events)['traceEvents']
+        self.assertEqual([e['name'] for e in trace],
+                         ['meson.build:1', "project('p')", 'cc', 'meson.build:3', "cc.has_function('f;g')"])
+        self.assertEqual(trace[2]['ts'], 100000)
+        self.assertEqual(trace[2]['args'], {'command': 'cc -v'})
+        self.assertEqual([e.stack[-1] for e in profiler.slowest_calls(events, 1)], ["cc.has_function('f;g')"])
+        self.assertEqual(profiler.call_name('dependency', ['zlib', 'z']), "dependency('zlib')")
+        self.assertEqual(profiler.call_name('files', []), 'files()')
+        self.assertEqual(profiler.call_name('message', ['x' * 50]), "message('{}...')".format('x' * 37))
+
+    def test_partition_unity_sources(self) -> None:
+        from mesonbuild.backend.backends import partition_unity_sources
+        sources = ['big.c', 'a.c', 'b.c', 'c.c', 'd.c', 'main.c']
+        costs = [4000, 30, 30, 30, 30, 200]
+        self.assertEqual(partition_unity_sources(sources, costs, 3),
+                         [['big.c'], ['a.c', 'b.c', 'c.c', 'd.c'], ['main.c']])
+        self.assertEqual(partition_unity_sources(list('abcdefgh'), [1] * 8, 3),
+                         [['a', 'b', 'c'], ['d', 'e', 'f'], ['g', 'h']])
+        self.assertEqual(partition_unity_sources(['a', 'b'], [1, 1], 4), [['a'], ['b']])
+        self.assertEqual(partition_unity_sources([], [], 2), [])
+
+        # The previous partition is kept while it is not much worse than a
+        # new one, new sources go with the source before them
+        previous = [['a', 'b', 'c'], ['d', 'e', 'f'], ['g', 'h']]
+        self.assertEqual(partition_unity_sources(list('abcdefgh'), [1, 1, 1, 1, 1, 1, 1, 2], 3, previous),
+                         previous)
+        self.assertEqual(partition_unity_sources(list('abcdefghi'), [2, 2, 2, 2, 2, 2, 1, 1, 1], 3, previous),
+                         [['a', 'b', 'c'], ['d', 'e', 'f'], ['g', 'h', 'i']])
+        self.assertEqual(partition_unity_sources(list('abcdefgh'), [5, 5, 5, 1, 1, 1, 1, 1], 3, previous),
+                         [['a'], ['b', 'c'], ['d', 'e', 'f', 'g', 'h']])
+        # Not the same number of unity files
+        self.assertEqual(partition_unity_sources(list('abcdefgh'), [1] * 8, 2, previous),
+                         [['a', 'b', 'c', 'd'], ['e', 'f', 'g', 'h']])
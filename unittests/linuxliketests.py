@@ -569,6 +569,34 @@ class LinuxlikeTests(BasePlatformTests):
         self.assertPathDoesNotExist(os.path.join(self.builddir, 'user@exe/user-unity.c'))
         self.build()
 
+    def test_unity_partition_cost(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            testdir = os.path.join(tmpdir, 'src')
+            shutil.copytree(os.path.join(self.unit_test_dir, '103 unity partition'), testdir)
+            self.init(testdir, extra_args=['-Dunity=on', '-Dunity_size=4', '-Dunity_partition=cost'])
+            pdir = os.path.join(self.builddir, 'prog.p')
+
+            def unity_files():
+                files = sorted(glob(os.path.join(pdir, 'prog-unity*.c')))
+                return [[os.path.basename(line[:-1]) for line in Path(f).read_text(encoding='utf-8').splitlines()]
+                        for f in files]
+
+            # The largest source gets a unity file of its own
+            self.assertEqual(unity_files(), [['big.c'], ['a.c', 'b.c', 'c.c', 'd.c', 'main.c']])
+            self.build()
+            self.run_tests()
+
+            # Editing and adding sources keeps the unity files of the others
+            with open(os.path.join(testdir, 'a.c'), 'a', encoding='utf-8') as f:
+                f.write('int func_a2(void) {\n  return 2;\n}\n')
+            with open(os.path.join(testdir, 'e.c'), 'w', encoding='utf-8') as f:
+                f.write('int func_e(void) {\n  return 1;\n}\n')
+            with open(os.path.join(testdir, 'meson.build'), 'w', encoding='utf-8') as f:
+                f.write("project('unity partition', 'c')\n\n"
+                        "executable('prog', 'big.c', 'a.c', 'b.c', 'c.c', 'd.c', 'e.c', 'main.c')\n")
+            self.build()
+            self.assertEqual(unity_files(), [['big.c'], ['a.c', 'b.c', 'c.c', 'd.c', 'e.c', 'main.c']])
+
     def test_installed_modes(self):
         '''
         Test that files installed by these tests have the correct permissions.
@@ -988,6 +1016,27 @@ class LinuxlikeTests(BasePlatformTests):
         for i in compdb:
             self.assertIn("-fsanitize=address", i["command"])
 
+    def test_backend_auto_pch(self):
+        testdir = os.path.join(self.unit_test_dir, '104 auto pch')
+        env = get_fake_env(testdir, self.builddir, self.prefix)
+        if detect_cpp_compiler(env, MachineChoice.HOST).get_id() not in {'gcc', 'clang'}:
+            raise SkipTest('Automatic precompiled headers need GCC or Clang')
+        self.init(testdir)
+        self.build()
+        # The headers are chosen from the dependencies of the previous build
+        self.setconf('-Dbackend_auto_pch=true')
+        self.build()
+        header = os.path.join(self.builddir, 'prog.p', 'meson-auto-pch-cpp.h')
+        self.assertEqual(Path(header).read_text(encoding='utf-8').splitlines(),
+                         ['#include <map>', '#include <string>', '#include <vector>', '#include <iostream>'])
+        for i in self.get_compdb():
+            self.assertIn('meson-auto-pch-cpp.h', i['command'])
+        self.run_tests()
+        # Objects built with the precompiled header keep it
+        self.init(testdir, extra_args=['--reconfigure'])
+        self.assertPathExists(header + '.gch')
+        self.assertBuildIsNoop()
+
     def test_cross_find_program(self):
         testdir = os.path.join(self.unit_test_dir, '11 cross prog')
         crossfile = tempfile.NamedTemporaryFile(mode='w')
@@ -14,11 +14,15 @@
 
 import os
 import unittest
+from unittest import mock
 
 from run_tests import (
     Backend
 )
 
+from mesonbuild import mesonlib
+from mesonbuild.modules import python
+
 from .baseplatformtests import BasePlatformTests
 
 class PythonTests(BasePlatformTests):
@@ -80,3 +84,23 @@ class PythonTests(BasePlatformTests):
         with self.assertRaises(unittest.SkipTest):
             self.init(testdir, extra_args=['-Dpython=dir'])
         self.wipe()
+
+    def test_introspection_cache(self):
+        python._INTROSPECTION_CACHE.clear()
+        with mock.patch.object(python.mesonlib, 'Popen_safe', wraps=mesonlib.Popen_safe) as popen:
+            first = python.PythonExternalProgram('python3', mesonlib.python_command)
+            self.assertTrue(first.sanity())
+            second = python.PythonExternalProgram('python3', mesonlib.python_command)
+            self.assertTrue(second.sanity())
+            self.assertEqual(second.info, first.info)
+            self.assertIsNot(second.info, first.info)
+            self.assertEqual(popen.call_count, 1)
+
+            # Cross builds choose the sysconfig data through the environment
+            native_key = python.introspection_key(mesonlib.python_command)
+            with mock.patch.dict(os.environ, {'_PYTHON_SYSCONFIGDATA_NAME': '_sysconfigdata__linux_aarch64-linux-gnu'}):
+                self.assertNotEqual(python.introspection_key(mesonlib.python_command), native_key)
+
+            # All modules are checked by a single process
+            self.assertEqual(first.find_modules(['os', 'not_a_python_module', 'json']), ['os', 'json'])
+            self.assertEqual(popen.call_count, 2)
@@ -20,7 +20,7 @@ from pathlib import Path
 import typing as T
 
 from mesonbuild.mesonlib import (
-    version_compare, git, search_version
+    version_compare, git, search_version, windows_proof_rmtree
 )
 
 
@@ -103,7 +103,7 @@ class SubprojectsCommandTests(BasePlatformTests):
         self._git_remote(['commit', '--no-gpg-sign', '--allow-empty', '-m', f'tag {tag} commit'], name)
         self._git_remote(['tag', '--no-sign', tag], name)
 
-    def _wrap_create_git(self, name, revision='master'):
+    def _wrap_create_git(self, name, revision='master', extra=''):
         path = self.root_dir / name
         with open(str((self.subprojects_dir / name).with_suffix('.wrap')), 'w', encoding='utf-8') as f:
             f.write(textwrap.dedent(
@@ -111,7 +111,7 @@ class SubprojectsCommandTests(BasePlatformTests):
                 [wrap-git]
                 url={}
                 revision={}
-                '''.format(os.path.abspath(str(path)), revision)))
+                '''.format(os.path.abspath(str(path)), revision)) + extra)
 
     def _wrap_create_file(self, name, tarball='dummy.tar.gz'):
         path = self.root_dir / tarball
@@ -124,8 +124,9 @@ class SubprojectsCommandTests(BasePlatformTests):
                 '''))
         Path(self.packagecache_dir / tarball).touch()
 
-    def _subprojects_cmd(self, args):
-        return self._run(self.meson_command + ['subprojects'] + args, workdir=str(self.project_dir))
+    def _subprojects_cmd(self, args, override_envvars=None):
+        return self._run(self.meson_command + ['subprojects'] + args, workdir=str(self.project_dir),
+                         override_envvars=override_envvars)
 
     def test_git_update(self):
         subp_name = 'sub1'
@@ -205,6 +206,39 @@ class SubprojectsCommandTests(BasePlatformTests):
         self._subprojects_cmd(['update', '--reset'])
         self.assertEqual(self._git_local_commit(subp_name), self._git_remote_commit(subp_name))
 
+    def test_git_reference(self):
+        reference_dir = self.root_dir / 'reference'
+        env = {'MESON_WRAP_GIT_REFERENCE': str(reference_dir)}
+        for name in ['sub1', 'sub2']:
+            self._git_create_remote_repo(name)
+            self._git_remote(['config', 'uploadpack.allowFilter', 'true'], name)
+        self._wrap_create_git('sub1')
+        self._wrap_create_git('sub2', extra='clone-filter=blob:none\n')
+        self._subprojects_cmd(['download'], override_envvars=env)
+
+        mirrors = sorted(os.listdir(str(reference_dir)))
+        self.assertEqual(len(mirrors), 2)
+        for name, mirror in zip(['sub1', 'sub2'], mirrors):
+            self.assertTrue(mirror.startswith(name + '-'))
+            self.assertEqual(self._git(['rev-parse', 'HEAD'], reference_dir / mirror),
+                             self._git_remote_commit(name))
+            # Checkouts don't borrow objects from the mirror, which can be
+            # pruned or deleted
+            alternates = self.subprojects_dir / name / '.git' / 'objects' / 'info' / 'alternates'
+            self.assertFalse(alternates.exists())
+            self.assertEqual(self._git_local_commit(name), self._git_remote_commit(name))
+
+        # A new commit is fetched into the reference repository first
+        self._git_create_remote_commit('sub1', 'master')
+        self._subprojects_cmd(['purge', '--confirm'])
+        self._subprojects_cmd(['download'], override_envvars=env)
+        self.assertEqual(self._git(['rev-parse', 'HEAD'], reference_dir / mirrors[0]),
+                         self._git_remote_commit('sub1'))
+        self.assertEqual(self._git_local_commit('sub1'), self._git_remote_commit('sub1'))
+
+        windows_proof_rmtree(str(reference_dir))
+        self._git(['fsck'], self.subprojects_dir / 'sub1')
+
     @skipIfNoExecutable('true')
     def test_foreach(self):
         self._create_project(self.subprojects_dir / 'sub_file')
@@ -231,6 +265,22 @@ class SubprojectsCommandTests(BasePlatformTests):
         out = self._subprojects_cmd(['foreach', '--types', 'git'] + dummy_cmd)
         self.assertEqual(ran_in(out), ['subprojects/sub_git'])
 
+    def test_foreach_fail_fast(self):
+        self._git_create_local_repo('sub1')
+        self._git_create_local_repo('sub2')
+        self._git_create_local_repo('sub3')
+
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            self._subprojects_cmd(['foreach', '--num-processes', '1', '--fail-fast', 'false'])
+        out = cm.exception.stdout
+        self.assertEqual(out.count('Executing command in '), 1)
+        self.assertIn('Cancelled in subprojects:', out)
+
+        # Without --fail-fast the command runs in all subprojects.
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            self._subprojects_cmd(['foreach', '--num-processes', '1', 'false'])
+        self.assertEqual(cm.exception.stdout.count('Executing command in '), 3)
+
     def test_purge(self):
         self._create_project(self.subprojects_dir / 'sub_file')
         self._wrap_create_file('sub_file')